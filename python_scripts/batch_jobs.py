@@ -0,0 +1,786 @@
+# This module runs the read, fetch, transform, diff, backup and post loop that most repeatable scripts share. A script
+# supplies its input rows and a transform that takes a record's JSON and returns the updated JSON, and BatchJob
+# fetches, diffs, backs up and posts the records with bounded pools of worker threads. ShardedBatchJob runs the same
+# job in several worker processes for transforms that need more than one CPU core, and BatchJob.run_queue() shares a
+# job between hosts by claiming chunks of rows from a WorkQueue. JobScheduler runs several jobs at once in one process,
+# sharing a budget of in-flight API calls between them.
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+
+from collections import Counter, namedtuple
+from loguru import logger
+
+from python_scripts.utilities import (ASpaceAPI, BackupWriter, ChangeLedger, OutcomeLog, ProgressJournal,
+                                      ProgressReporter, echo, merge_backups, record_error, row_hash)
+
+# An input row waiting to be fetched, with its row_hash() for the journal and its change fingerprint for the ledger
+QueuedRow = namedtuple('QueuedRow', 'row_number row row_key fingerprint')
+
+# Row outcomes counted as errors in progress reports
+error_statuses = ('failed', 'not found', 'invalid')
+
+
+def default_row_uri(row):
+    """
+    Gets the URI of the record to update from an input row with a uri column
+
+    Args:
+        row (dict): the input row
+
+    Returns:
+        object_uri (str): the record's URI
+    """
+    return row['uri']
+
+
+def fetch_record(local_aspace, object_uri):
+    """
+    Gets the JSON data of a record from its URI
+
+    Args:
+        local_aspace (ASpaceAPI): an instance of the ASpace API for connecting to the client
+        object_uri (str): the record's URI, ex. /repositories/2/archival_objects/5 or /locations/5
+
+    Returns:
+        record_json (dict): the record's JSON data, or None if it could not be fetched
+    """
+    parent_uri, object_id = object_uri.rstrip('/').rsplit('/', 1)
+    repo_uri, _, record_type = parent_uri.rpartition('/')
+    return local_aspace.get_object(record_type, object_id, repo_uri)
+
+
+def ledger_uri(object_uri):
+    """
+    Gets the URI a record is kept under in the ledger, with one leading slash whether or not the input had one
+
+    Args:
+        object_uri (str): the record's URI from an input row
+
+    Returns:
+        ledger_uri (str): the record's URI starting with a slash
+    """
+    return f'/{object_uri.strip("/")}'
+
+
+def last_status_code(local_aspace):
+    """
+    Gets the HTTP status code of the last response the calling thread got from ArchivesSpace, if the client keeps track
+
+    Args:
+        local_aspace (ASpaceAPI): an instance of the ASpace API for connecting to the client
+
+    Returns:
+        status_code (int): the HTTP status code, or None if it is not known
+    """
+    return getattr(getattr(local_aspace, 'response_status', None), 'code', None)
+
+
+class BatchJob:
+
+    def __init__(self, local_aspace, transform, backup_path=None, row_uri=default_row_uri, after_post=None,
+                 fetch_workers=4, post_workers=4, queue_size=100, dry_run=False, name='Batch job', journal=None,
+                 ledger=None, change_parameters=None, outcome_log=None, row_weight=None):
+        """
+        Runs a script's transform over the records listed in its input rows. Rows are read by the calling thread and
+        handed to a pool of fetch workers, which get each record and run the transform on it. Records the transform
+        changed are handed to a pool of post workers, which write the original JSON to the backup and post the updated
+        JSON. The queues between stages are bounded, so reading waits for fetching and fetching waits for posting
+        instead of holding the whole input in memory.
+
+        Args:
+            local_aspace (ASpaceAPI): an instance of the ASpace API for connecting to the client
+            transform (function): called with a record's JSON data and its input row, returns the updated JSON data or
+                None to skip the record. It must return a changed copy and leave the JSON data it is given unchanged
+            backup_path (str): the path of the jsonl backup file for the original JSON data of each changed record,
+                default is None (no backup)
+            row_uri (function): called with an input row, returns the URI of the record to update or None if the row
+                is not valid, default reads the uri column
+            after_post (function): called with the ASpace API, the posted JSON data and the input row after each
+                successful post, returns None if it failed, default is None
+            fetch_workers (int): the number of records to fetch and transform at once, default is 4
+            post_workers (int): the number of records to post at once, default is 4
+            queue_size (int): the number of records waiting between stages at most, default is 100
+            dry_run (bool): if True, print the updated JSON data instead of posting it and writing the backup
+            name (str): the name of the job used in the summary and change fingerprints, default is 'Batch job'
+            journal (ProgressJournal): the journal to record the status of each row in, rows it has as finished are
+                skipped without fetching their records, default is None
+            ledger (ChangeLedger): the ledger of applied changes, rows whose change it has as applied are skipped
+                without fetching their records, default is None
+            change_parameters (dict): the script arguments that change what the transform does, added to each row's
+                change fingerprint, default is None
+            outcome_log (OutcomeLog): the structured log to write each row's outcome to, default is None
+            row_weight (function): called with an input row, returns the number of CSV rows it stands for in progress
+                reports, for rows that group several CSV rows, default counts each row once
+        """
+        self.local_aspace = local_aspace
+        self.transform = transform
+        self.backup_path = backup_path
+        self.row_uri = row_uri
+        self.after_post = after_post
+        self.fetch_workers = fetch_workers
+        self.post_workers = post_workers
+        self.queue_size = queue_size
+        self.dry_run = dry_run
+        self.name = name
+        self.journal = journal
+        self.ledger = ledger
+        self.change_parameters = change_parameters
+        self.outcome_log = outcome_log
+        self.row_weight = row_weight
+        self.status_counts = Counter()
+        self.lock = threading.Lock()
+        self.backup_writer = None
+        self.ledger_refreshed = False
+        self.progress = None
+
+    def change_fingerprint(self, row):
+        """
+        Gets the fingerprint of the change a row asks for, from the job name, its change parameters and the row
+
+        Args:
+            row (dict): the input row
+
+        Returns:
+            fingerprint (str): the SHA-256 hex digest of the change
+        """
+        return row_hash({'job': self.name, 'parameters': self.change_parameters, 'row': row})
+
+    def log_outcome(self, row_number, object_uri, stage, status, started=None, error_class=None):
+        """
+        Writes the outcome of one input row to the outcome log, if the job has one
+
+        Args:
+            row_number (int): the number of the row in the input
+            object_uri (str): the URI of the row's record, or None if the row is not valid
+            stage (str): 'queue', 'fetch' or 'post', the stage the row finished at
+            status (str): the row's outcome
+            started (float): the time.monotonic() time the row's record was fetched, default is None
+            error_class (str): the class of the error the row failed with, default is None
+        """
+        if self.outcome_log is not None:
+            self.outcome_log.record(object_uri, stage, status,
+                                    latency=None if started is None else time.monotonic() - started,
+                                    http_status=None if started is None else last_status_code(self.local_aspace),
+                                    error_class=error_class, job=self.name, row=row_number)
+
+    def record_outcome(self, queued_row, object_uri, status, lock_version=None, stage='fetch', started=None,
+                       error_class=None):
+        """
+        Counts and logs the outcome of one input row, and records it in the journal, ledger and outcome log
+
+        Args:
+            queued_row (QueuedRow): the input row
+            object_uri (str): the URI of the row's record, or None if the row is not valid
+            status (str): 'posted', 'dry run', 'unchanged', 'already applied', 'skipped', 'not found', 'invalid' or
+                'failed'
+            lock_version (int): the record's lock_version with the change applied, for 'posted' and 'unchanged' rows
+            stage (str): 'fetch' or 'post', the stage the row finished at, default is 'fetch'
+            started (float): the time.monotonic() time the row's record was fetched, default is None
+            error_class (str): the class of the error the row failed with, default is None
+        """
+        with self.lock:
+            self.status_counts[status] += 1
+        rows = self.row_weight(queued_row.row) if self.row_weight is not None else 1
+        self.progress.update(rows, errors=rows if status in error_statuses else 0)
+        self.log_outcome(queued_row.row_number, object_uri, stage, status, started, error_class)
+        if not self.dry_run:
+            if self.journal is not None:
+                self.journal.mark(queued_row.row_key, object_uri,
+                                  'unchanged' if status == 'already applied' else status)
+            if self.ledger is not None and status in ('posted', 'unchanged') and lock_version is not None:
+                self.ledger.record(ledger_uri(object_uri), queued_row.fingerprint, lock_version)
+        logger.info(f'{self.name} row {queued_row.row_number} - {object_uri}: {status}')
+
+    def fetch_stage(self, fetch_queue, post_queue):
+        """
+        Fetches and transforms the records of the rows in fetch_queue until it gets None, handing changed records to
+        post_queue
+
+        Args:
+            fetch_queue (queue.Queue): the QueuedRow input rows, ending with None
+            post_queue (queue.Queue): the (QueuedRow, URI, original JSON, updated JSON, fetch time) records to post
+        """
+        while (queued_row := fetch_queue.get()) is not None:
+            object_uri = None
+            started = time.monotonic()
+            try:
+                object_uri = self.row_uri(queued_row.row)
+                if not object_uri:
+                    self.record_outcome(queued_row, object_uri, 'invalid', started=started, error_class='InvalidRow')
+                    continue
+                record_json = fetch_record(self.local_aspace, object_uri)
+                if record_json is None:
+                    self.record_outcome(queued_row, object_uri, 'not found', started=started, error_class='NotFound')
+                    continue
+                if self.ledger is not None and self.ledger.is_applied(ledger_uri(object_uri), queued_row.fingerprint,
+                                                                      record_json.get('lock_version')):
+                    self.record_outcome(queued_row, object_uri, 'already applied', started=started)
+                    continue
+                updated_json = self.transform(record_json, queued_row.row)
+            except Exception as fetch_error:  # noqa: BLE001 - a caller's transform error fails only its row
+                record_error(f'BatchJob.fetch_stage() - Unable to fetch and transform row {queued_row.row_number}',
+                             fetch_error)
+                self.record_outcome(queued_row, object_uri, 'failed', started=started,
+                                    error_class=type(fetch_error).__name__)
+                continue
+            if updated_json is None:
+                self.record_outcome(queued_row, object_uri, 'skipped', started=started)
+            elif updated_json == record_json:
+                self.record_outcome(queued_row, object_uri, 'unchanged', record_json.get('lock_version'),
+                                    started=started)
+            else:
+                post_queue.put((queued_row, object_uri, record_json, updated_json, started))
+
+    def post_stage(self, post_queue):
+        """
+        Backs up and posts the records in post_queue until it gets None
+
+        Args:
+            post_queue (queue.Queue): the (QueuedRow, URI, original JSON, updated JSON, fetch time) records to post,
+                ending with None
+        """
+        while (queued_record := post_queue.get()) is not None:
+            queued_row, object_uri, record_json, updated_json, started = queued_record
+            if self.dry_run:
+                # Logged whole, in the form updates_from_logs.py replays
+                message = (f'Object {object_uri} would be updated with the following data:\n'
+                           f'    {json.dumps(updated_json)}')
+                logger.bind(full_payload=True).info(message)
+                echo(message)
+                self.record_outcome(queued_row, object_uri, 'dry run', stage='post', started=started)
+                continue
+            lock_version = None
+            error_class = None
+            try:
+                # The writer flushes every record, so the backup is on disk before the row is journaled as fetched
+                # and posted, and a backup that cannot be written fails the row instead of posting it
+                if self.backup_writer is not None:
+                    self.backup_writer.write(record_json)
+                if self.journal is not None:
+                    self.journal.mark(queued_row.row_key, object_uri, 'fetched')
+                post_uri = updated_json.get('uri', object_uri)
+                update_message = self.local_aspace.update_object(post_uri, updated_json)
+                if update_message is not None:
+                    lock_version = update_message.get('lock_version')
+                    if self.after_post is not None:
+                        update_message = self.after_post(self.local_aspace, updated_json, queued_row.row)
+                if update_message is None:
+                    error_class = 'APIError'
+            except Exception as post_error:  # noqa: BLE001 - after_post is the caller's, any error fails only this row
+                record_error(f'BatchJob.post_stage() - Unable to post row {queued_row.row_number}', post_error)
+                update_message = None
+                error_class = type(post_error).__name__
+            self.record_outcome(queued_row, object_uri, 'failed' if update_message is None else 'posted',
+                                lock_version, stage='post', started=started, error_class=error_class)
+
+    def queue_row(self, row_number, row):
+        """
+        Prepares an input row for the fetch workers, or counts it as done if the journal or ledger show a previous run
+        already finished it
+
+        Args:
+            row_number (int): the number of the row in the input, starting at 1
+            row (dict): the input row
+
+        Returns:
+            queued_row (QueuedRow): the row to fetch, or None if it is already done
+        """
+        row_key = row_hash(row) if self.journal is not None else None
+        if row_key is not None and self.journal.is_finished(row_key):
+            with self.lock:
+                self.status_counts['already finished'] += 1
+            self.progress.update(self.row_weight(row) if self.row_weight is not None else 1)
+            self.log_outcome(row_number, None, 'queue', 'already finished')
+            return None
+        fingerprint = None
+        if self.ledger is not None:
+            fingerprint = self.change_fingerprint(row)
+            try:
+                object_uri = self.row_uri(row)
+            except Exception:  # noqa: BLE001 - left for the fetch workers to record as failed
+                object_uri = None
+            if object_uri and self.ledger.is_applied(ledger_uri(object_uri), fingerprint):
+                with self.lock:
+                    self.status_counts['already applied'] += 1
+                self.progress.update(self.row_weight(row) if self.row_weight is not None else 1)
+                self.log_outcome(row_number, object_uri, 'queue', 'already applied')
+                return None
+        return QueuedRow(row_number, row, row_key, fingerprint)
+
+    def run(self, rows, total_rows=None):
+        """
+        Runs the job over the input rows, reporting its progress as it goes and a summary of the outcomes when it
+        finishes
+
+        Args:
+            rows (iterable): the input rows, such as the rows returned by read_csv() or read_validated_csv()
+            total_rows (int): the number of input rows, for the time left in progress reports, default is the length
+                of rows if it has one
+
+        Returns:
+            status_counts (Counter): the number of rows with each outcome
+        """
+        fetch_queue = queue.Queue(maxsize=self.queue_size)
+        post_queue = queue.Queue(maxsize=self.queue_size)
+        if total_rows is None and hasattr(rows, '__len__'):
+            total_rows = len(rows)
+        self.progress = ProgressReporter(self.name, total_rows, stages={'fetch': fetch_queue, 'post': post_queue})
+        if self.ledger is not None and not self.ledger_refreshed:
+            self.ledger.refresh(self.local_aspace)
+            self.ledger_refreshed = True
+        if self.backup_path and not self.dry_run:
+            self.backup_writer = BackupWriter(self.backup_path, flush_records=1)
+            self.backup_writer.open()
+        fetch_threads = [threading.Thread(target=self.fetch_stage, args=(fetch_queue, post_queue))
+                         for _ in range(self.fetch_workers)]
+        post_threads = [threading.Thread(target=self.post_stage, args=(post_queue,))
+                        for _ in range(self.post_workers)]
+        for worker_thread in fetch_threads + post_threads:
+            worker_thread.start()
+        try:
+            for row_number, row in enumerate(rows, start=1):
+                queued_row = self.queue_row(row_number, row)
+                if queued_row is not None:
+                    fetch_queue.put(queued_row)
+        finally:
+            for _ in fetch_threads:
+                fetch_queue.put(None)
+            for fetch_thread in fetch_threads:
+                fetch_thread.join()
+            for _ in post_threads:
+                post_queue.put(None)
+            for post_thread in post_threads:
+                post_thread.join()
+            if self.backup_writer is not None:
+                self.backup_writer.close()
+                self.backup_writer = None
+        self.progress.finish(dict(self.status_counts))
+        return self.status_counts
+
+    def renew_lease(self, work_queue, chunk_id, worker_id, attempt, chunk_finished):
+        """
+        Renews a worker's lease on a chunk every third of the lease time until the chunk is finished
+
+        Args:
+            work_queue (WorkQueue): the queue the chunk was claimed from
+            chunk_id (int): the ID of the chunk
+            worker_id (str): the name of the worker
+            attempt (int): the lease attempt number returned by WorkQueue.claim()
+            chunk_finished (threading.Event): set when the chunk is finished
+        """
+        while not chunk_finished.wait(work_queue.lease_seconds / 3):
+            if not work_queue.renew(chunk_id, worker_id, attempt):
+                record_error(f'BatchJob.renew_lease() - Lease on chunk {chunk_id} ran out and passed to another '
+                             f'worker', worker_id)
+                return
+
+    def run_queue(self, work_queue, worker_id):
+        """
+        Claims chunks of rows from a WorkQueue shared with workers on other hosts and runs the job over them until no
+        chunks are left, renewing each chunk's lease while it runs and recording its status counts when it is done
+
+        Args:
+            work_queue (WorkQueue): the queue holding the job's input rows
+            worker_id (str): the name of this worker, such as its hostname and process ID
+
+        Returns:
+            status_counts (Counter): the number of rows with each outcome in the chunks this worker completed
+        """
+        worker_counts = Counter()
+        while (claimed_chunk := work_queue.claim(worker_id)) is not None:
+            chunk_id, attempt, chunk_rows = claimed_chunk
+            counts_before = Counter(self.status_counts)
+            chunk_finished = threading.Event()
+            renew_thread = threading.Thread(target=self.renew_lease,
+                                            args=(work_queue, chunk_id, worker_id, attempt, chunk_finished))
+            renew_thread.start()
+            try:
+                self.run(chunk_rows)
+            except BaseException:
+                work_queue.release(chunk_id, worker_id, attempt)
+                raise
+            finally:
+                chunk_finished.set()
+                renew_thread.join()
+            chunk_counts = self.status_counts - counts_before
+            if work_queue.complete(chunk_id, worker_id, attempt, dict(chunk_counts)):
+                worker_counts.update(chunk_counts)
+            else:
+                record_error(f'BatchJob.run_queue() - Chunk {chunk_id} was claimed by another worker before it '
+                             f'finished, its completion was not recorded', worker_id)
+        logger.info(f'{self.name} worker {worker_id} found no more chunks: {dict(worker_counts)}, queue: '
+                    f'{work_queue.status_counts()}')
+        print(f'{self.name} worker {worker_id} found no more chunks: {dict(worker_counts)}, queue: '
+              f'{work_queue.status_counts()}')
+        return worker_counts
+
+
+def shard_backup_path(backup_path, shard_number):
+    """
+    Gets the path of the backup file one worker process of a ShardedBatchJob writes, keeping the backup's compression
+    extension so the shard's backup is compressed the same way
+
+    Args:
+        backup_path (str): the path of the job's backup file
+        shard_number (int): the number of the shard, starting at 0
+
+    Returns:
+        shard_path (str): the path of the shard's backup file, ex. original_data.jsonl.shard0.gz
+    """
+    root, extension = os.path.splitext(backup_path)
+    if extension.lower() in ('.gz', '.zst'):
+        return f'{root}.shard{shard_number}{extension}'
+    return f'{backup_path}.shard{shard_number}'
+
+
+def run_shard(shard_number, row_queue, result_queue, job_settings):
+    """
+    Runs one shard of a ShardedBatchJob in a worker process, with its own ArchivesSpace session, backup file, outcome
+    log, journal and ledger connections, and puts the shard's status counts on result_queue when its rows run out
+
+    Args:
+        shard_number (int): the number of the shard, starting at 0
+        row_queue (multiprocessing.Queue): the shard's input rows, ending with None
+        result_queue (multiprocessing.Queue): the (shard number, status counts) results of every shard
+        job_settings (dict): the ShardedBatchJob settings for the shard's BatchJob
+    """
+    try:
+        local_aspace = job_settings['api_class'](*job_settings['aspace_credentials'])
+    except Exception as login_error:  # noqa: BLE001 - api_class is the caller's, any error fails only this shard
+        record_error(f'run_shard() - Shard {shard_number} could not log in to ArchivesSpace', login_error)
+        failed_rows = 0
+        while row_queue.get() is not None:  # Take the shard's rows so the main process is not left waiting
+            failed_rows += 1
+        result_queue.put((shard_number, {'failed': failed_rows}))
+        return
+    journal = ledger = outcome_log = None
+    if job_settings['shard_outcome_paths'][shard_number]:
+        outcome_log = OutcomeLog(job_settings['shard_outcome_paths'][shard_number])
+        outcome_log.open()
+    if job_settings['journal_path'] and not job_settings['dry_run']:
+        journal = ProgressJournal(job_settings['journal_path'], job_settings['resume'])
+    if job_settings['ledger_path']:
+        ledger = ChangeLedger(job_settings['ledger_path'], job_settings['aspace_credentials'][0])
+    try:
+        batch_job = BatchJob(local_aspace, job_settings['transform'], job_settings['shard_backup_paths'][shard_number],
+                             job_settings['row_uri'], job_settings['after_post'],
+                             fetch_workers=job_settings['threads'], post_workers=job_settings['threads'],
+                             dry_run=job_settings['dry_run'], name=job_settings['name'], journal=journal,
+                             ledger=ledger, change_parameters=job_settings['change_parameters'],
+                             outcome_log=outcome_log)
+        status_counts = batch_job.run(iter(row_queue.get, None))
+    finally:
+        for connection in (journal, ledger, outcome_log):
+            if connection is not None:
+                connection.close()
+    result_queue.put((shard_number, dict(status_counts)))
+
+
+class ShardedBatchJob:
+
+    def __init__(self, aspace_credentials, transform, backup_path=None, row_uri=default_row_uri, after_post=None,
+                 processes=4, threads=2, queue_size=100, dry_run=False, name='Batch job', journal_path=None,
+                 resume=False, ledger_path=None, change_parameters=None, api_class=ASpaceAPI, outcome_path=None):
+        """
+        Runs a BatchJob in several worker processes, so CPU-heavy transforms are not held back by running in one
+        Python process. Input rows are split between the processes by a hash of their record URI, so every row for a
+        record goes to the same process. Each process logs in to ArchivesSpace with its own session and writes its own
+        backup file, and the backups and status counts of all processes are merged when the job finishes. The
+        transform, row_uri and after_post functions are sent to the worker processes, so they must be defined at the
+        top level of a module - use functools.partial() instead of a lambda to give them arguments.
+
+        Args:
+            aspace_credentials (tuple): the ArchivesSpace API URL, username and password each process logs in with
+            transform (function): the BatchJob transform
+            backup_path (str): the path of the jsonl backup file, default is None (no backup)
+            row_uri (function): the BatchJob row_uri function, default reads the uri column
+            after_post (function): the BatchJob after_post function, default is None
+            processes (int): the number of worker processes, default is 4
+            threads (int): the number of fetch and post threads in each process, default is 2
+            queue_size (int): the number of rows waiting for each process at most, default is 100
+            dry_run (bool): if True, print the updated JSON data instead of posting it and writing the backup
+            name (str): the name of the job used in the summary and change fingerprints, default is 'Batch job'
+            journal_path (str): the path of the ProgressJournal file shared by the processes, default is None
+            resume (bool): if True, skip the rows the journal has as finished by a previous run
+            ledger_path (str): the path of the ChangeLedger file shared by the processes, default is None
+            change_parameters (dict): the script arguments that change what the transform does, default is None
+            api_class (class): the class each process connects to ArchivesSpace with, default is ASpaceAPI
+            outcome_path (str): the path of the OutcomeLog, written by each process to its own file and merged when
+                the job finishes, default is None (no outcome log)
+        """
+        self.job_settings = {'aspace_credentials': aspace_credentials, 'api_class': api_class,
+                             'transform': transform, 'row_uri': row_uri, 'after_post': after_post,
+                             'threads': threads, 'dry_run': dry_run, 'name': name,
+                             'journal_path': journal_path, 'resume': resume, 'ledger_path': ledger_path,
+                             'change_parameters': change_parameters,
+                             'shard_backup_paths': [shard_backup_path(backup_path, shard_number) if backup_path
+                                                    else None for shard_number in range(processes)],
+                             'shard_outcome_paths': [shard_backup_path(outcome_path, shard_number) if outcome_path
+                                                     else None for shard_number in range(processes)]}
+        self.backup_path = backup_path
+        self.outcome_path = outcome_path
+        self.row_uri = row_uri
+        self.processes = processes
+        self.queue_size = queue_size
+        self.name = name
+
+    def shard_number(self, row):
+        """
+        Gets the number of the process a row is sent to, from a hash of its record URI
+
+        Args:
+            row (dict): the input row
+
+        Returns:
+            shard_number (int): the number of the process, starting at 0
+        """
+        try:
+            object_uri = self.row_uri(row) or ''
+        except Exception:  # noqa: BLE001 - left for the worker to record as failed
+            object_uri = ''
+        return zlib.crc32(ledger_uri(object_uri).encode('utf-8')) % self.processes
+
+    def run(self, rows):
+        """
+        Runs the job over the input rows in the worker processes and prints a summary of the outcomes of all
+        processes when they finish. Rows sent to a process that stopped are counted as failed
+
+        Args:
+            rows (iterable): the input rows, such as the rows returned by read_csv() or read_validated_csv()
+
+        Returns:
+            status_counts (Counter): the number of rows with each outcome
+        """
+        start_time = time.perf_counter()
+        row_queues = [multiprocessing.Queue(maxsize=self.queue_size) for _ in range(self.processes)]
+        result_queue = multiprocessing.Queue()
+        shard_processes = [multiprocessing.Process(target=run_shard,
+                                                   args=(shard_number, row_queue, result_queue, self.job_settings))
+                           for shard_number, row_queue in enumerate(row_queues)]
+        for shard_process in shard_processes:
+            shard_process.start()
+        status_counts = Counter()
+
+        def put_row(shard_number, row):
+            # Wait for room in the shard's queue only while its process is still there to take the row
+            while shard_processes[shard_number].is_alive():
+                try:
+                    row_queues[shard_number].put(row, timeout=1)
+                    return
+                except queue.Full:
+                    continue
+            if row is not None:
+                status_counts['failed'] += 1
+
+        try:
+            for row in rows:
+                put_row(self.shard_number(row), row)
+        finally:
+            for shard_number in range(self.processes):
+                put_row(shard_number, None)
+        finished_shards = set()
+        while len(finished_shards) < self.processes:
+            try:
+                shard_number, shard_counts = result_queue.get(timeout=1)
+            except queue.Empty:
+                if not any(shard_process.is_alive() for shard_process in shard_processes) and result_queue.empty():
+                    break
+                continue
+            finished_shards.add(shard_number)
+            status_counts.update(shard_counts)
+        for shard_process in shard_processes:
+            shard_process.join()
+        if len(finished_shards) < self.processes:
+            record_error('ShardedBatchJob.run() - Worker processes stopped without reporting their results',
+                         sorted(set(range(self.processes)) - finished_shards))
+        if self.backup_path:
+            merge_backups(self.job_settings['shard_backup_paths'], self.backup_path)
+        if self.outcome_path:
+            merge_backups(self.job_settings['shard_outcome_paths'], self.outcome_path)
+        logger.info(f'{self.name} finished in {time.perf_counter() - start_time:.2f}s with {self.processes} '
+                    f'processes: {dict(status_counts)}')
+        print(f'{self.name} finished in {time.perf_counter() - start_time:.2f}s with {self.processes} processes: '
+              f'{dict(status_counts)}')
+        return status_counts
+
+
+class SharedBudget:
+
+    def __init__(self, max_in_flight=8, requests_per_second=None):
+        """
+        Shares one ArchivesSpace's capacity between several jobs running in the same process. At most max_in_flight
+        API calls run at once across all jobs, and calls start no faster than requests_per_second. When jobs are
+        waiting for a free slot, the slot goes to the waiting job with the fewest calls in flight for its priority, so
+        a job with priority 2 gets twice the share of a job with priority 1, and a job running alone can use every slot
+
+        Args:
+            max_in_flight (int): the number of API calls allowed to run at once across all jobs, default is 8
+            requests_per_second (float): the most API calls started each second, default is None (no limit)
+        """
+        self.max_in_flight = max_in_flight
+        self.request_interval = 1 / requests_per_second if requests_per_second else 0
+        self.condition = threading.Condition()
+        self.priorities = {}
+        self.in_flight = Counter()
+        self.waiting = Counter()
+        self.request_counts = Counter()
+        self.next_request_time = 0.0
+
+    def add_job(self, job_name, priority=1):
+        """
+        Registers a job sharing the budget
+
+        Args:
+            job_name (str): the name of the job
+            priority (float): the job's share of the budget relative to the other jobs, default is 1
+        """
+        with self.condition:
+            self.priorities[job_name] = priority
+
+    def next_job(self):
+        """
+        Gets the waiting job furthest below its share of the in-flight calls, preferring the higher priority on a tie
+
+        Returns:
+            job_name (str): the name of the job the next free slot goes to, or None if no job is waiting
+        """
+        waiting_jobs = [job_name for job_name, waiting_count in self.waiting.items() if waiting_count > 0]
+        if waiting_jobs:
+            return min(waiting_jobs, key=lambda job_name: (self.in_flight[job_name] / self.priorities[job_name],
+                                                           -self.priorities[job_name]))
+
+    def acquire(self, job_name):
+        """
+        Waits until the job may start an API call, for a free slot that is its turn and then for the rate limit
+
+        Args:
+            job_name (str): the name of the job
+        """
+        with self.condition:
+            self.waiting[job_name] += 1
+            while sum(self.in_flight.values()) >= self.max_in_flight or self.next_job() != job_name:
+                self.condition.wait()
+            self.waiting[job_name] -= 1
+            self.in_flight[job_name] += 1
+            start_time = max(self.next_request_time, time.monotonic())
+            self.next_request_time = start_time + self.request_interval
+            self.condition.notify_all()
+        time.sleep(max(start_time - time.monotonic(), 0))
+
+    def release(self, job_name):
+        """
+        Frees the slot of a finished API call
+
+        Args:
+            job_name (str): the name of the job
+        """
+        with self.condition:
+            self.in_flight[job_name] -= 1
+            self.request_counts[job_name] += 1
+            self.condition.notify_all()
+
+
+class BudgetedAPI:
+
+    def __init__(self, local_aspace, budget, job_name):
+        """
+        Stands in for an ASpaceAPI shared by several jobs, waiting for the job's turn in a SharedBudget before each
+        method call, so the jobs share one ArchivesSpace session and its connection pool
+
+        Args:
+            local_aspace (ASpaceAPI): the instance of the ASpace API shared by the jobs
+            budget (SharedBudget): the budget shared by the jobs
+            job_name (str): the name of the job making the calls
+        """
+        self.local_aspace = local_aspace
+        self.budget = budget
+        self.job_name = job_name
+
+    def __getattr__(self, attribute_name):
+        api_attribute = getattr(self.local_aspace, attribute_name)
+        if not callable(api_attribute):
+            return api_attribute
+
+        def budgeted_call(*args, **kwargs):
+            self.budget.acquire(self.job_name)
+            try:
+                return api_attribute(*args, **kwargs)
+            finally:
+                self.budget.release(self.job_name)
+        return budgeted_call
+
+
+class JobScheduler:
+
+    def __init__(self, local_aspace, max_in_flight=8, requests_per_second=None):
+        """
+        Runs several BatchJobs at once against a single ArchivesSpace, sharing one session, a SharedBudget of in-flight
+        API calls and a rate limit between them, instead of running each script on its own and either overloading
+        ArchivesSpace or leaving its capacity idle
+
+        Args:
+            local_aspace (ASpaceAPI): the instance of the ASpace API shared by the jobs
+            max_in_flight (int): the number of API calls allowed to run at once across all jobs, default is 8
+            requests_per_second (float): the most API calls started each second, default is None (no limit)
+        """
+        self.local_aspace = local_aspace
+        self.budget = SharedBudget(max_in_flight, requests_per_second)
+        self.jobs = {}
+
+    def add(self, job_name, transform, rows, priority=1, **job_options):
+        """
+        Adds a job to run with the others
+
+        Args:
+            job_name (str): the name of the job, which must be unique
+            transform (function): the BatchJob transform
+            rows (iterable): the job's input rows
+            priority (float): the job's share of the budget relative to the other jobs, default is 1
+            **job_options: the other BatchJob arguments, such as backup_path, row_uri, after_post or journal
+
+        Returns:
+            batch_job (BatchJob): the job added, or None if a job with the same name was already added
+        """
+        if job_name in self.jobs:
+            record_error('JobScheduler.add() - A job with this name was already added', job_name)
+            return None
+        self.budget.add_job(job_name, priority)
+        batch_job = BatchJob(BudgetedAPI(self.local_aspace, self.budget, job_name), transform, name=job_name,
+                             **job_options)
+        self.jobs[job_name] = (batch_job, rows)
+        return batch_job
+
+    def run(self):
+        """
+        Runs every job added at once and prints the outcomes and API calls of each when they have all finished
+
+        Returns:
+            job_counts (dict): the status counts of each job, by job name
+        """
+        start_time = time.perf_counter()
+        job_counts = {}
+
+        def run_job(job_name, batch_job, rows):
+            try:
+                job_counts[job_name] = batch_job.run(rows)
+            except Exception as job_error:  # noqa: BLE001 - any error stops only this job, not the others
+                record_error(f'JobScheduler.run() - Job {job_name} stopped', job_error)
+                job_counts[job_name] = batch_job.status_counts
+
+        job_threads = [threading.Thread(target=run_job, args=(job_name, batch_job, rows))
+                       for job_name, (batch_job, rows) in self.jobs.items()]
+        for job_thread in job_threads:
+            job_thread.start()
+        for job_thread in job_threads:
+            job_thread.join()
+        for job_name in self.jobs:
+            logger.info(f'{job_name}: {dict(job_counts[job_name])}, {self.budget.request_counts[job_name]} API calls')
+            print(f'{job_name}: {dict(job_counts[job_name])}, {self.budget.request_counts[job_name]} API calls')
+        logger.info(f'{len(self.jobs)} jobs finished in {time.perf_counter() - start_time:.2f}s')
+        print(f'{len(self.jobs)} jobs finished in {time.perf_counter() - start_time:.2f}s')
+        return job_counts
@@ -1,29 +1,37 @@
 #!/usr/bin/env python
-# This script iterates through all the digital objects in every repository in SI's ArchivesSpace
-# instance - except Test, Training, and NMAH-AF, parses them for any data in the following fields:
-# agents, dates, extents, languages, notes, and subjects, and then deletes any data within those
-# fields except digitized date and uploads the updated digital object back to ArchivesSpace
+# This script queries SI's ArchivesSpace database for the digital objects in every repository - except Test, Training,
+# and NMAH-AF - that have data in the following fields: agents, dates, extents, languages, notes, and subjects. It then
+# fetches only those digital objects, deletes any data within those fields except digitized date and uploads the updated
+# digital object back to ArchivesSpace
 
 import jsonlines
+import os
+import sys
 from collections import namedtuple
 from copy import deepcopy
+from functools import partial
 from http.client import HTTPException
 from pathlib import Path
 
 from jsonlines import InvalidLineError
 
-from secrets import *
-
 from asnake.client import ASnakeClient
 from asnake.client.web_client import ASnakeAuthError
+from dotenv import load_dotenv, find_dotenv
 from loguru import logger
 
+sys.path.append(os.path.dirname('python_scripts'))  # Needed to import functions from utilities.py
+from python_scripts.utilities import ASpaceDatabase, BackupWriter, fan_out_repositories
 
 
 logger.remove()
 log_path = Path('../../logs', 'delete_dometadata_{time:YYYY-MM-DD}.log')
 logger.add(str(log_path), format="{time}-{level}: {message}")
 
+# Find  and load environment-specific .env file
+env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
+load_dotenv(env_file)
+
 
 class ArchivesSpace:
 
@@ -234,37 +242,139 @@ def delete_field_info(object_json, field, subrecord):
     return updated_json
 
 
+def candidate_query(donotrun_repos):
+    """
+    Builds the SQL query that returns the ID and repository ID of every digital object with data in linked_agents,
+    dates (other than digitized), extents, lang_materials, notes, or subjects, excluding the given repositories
+
+    Args:
+        donotrun_repos (list): the repository codes (repo_code) of the repositories to exclude
+
+    Returns:
+        do_query (str): the SQL query returning (digital_object.id, digital_object.repo_id, repository.repo_code) rows
+        query_parameters (tuple): the repository codes for the query's placeholders
+    """
+    excluded_repos = ', '.join(['%s'] * len(donotrun_repos))
+    do_query = ('SELECT '
+                    'T.id, T.repo_id, repository.repo_code '
+                'FROM '
+                    '(SELECT do.id, do.repo_id FROM digital_object AS do '
+                        'JOIN lang_material ON lang_material.digital_object_id = do.id '
+                    'UNION '
+                    'SELECT do.id, do.repo_id FROM digital_object AS do '
+                        'JOIN note ON note.digital_object_id = do.id '
+                    'UNION '
+                    'SELECT do.id, do.repo_id FROM digital_object AS do '
+                        'JOIN extent ON extent.digital_object_id = do.id '
+                    'UNION '
+                    'SELECT do.id, do.repo_id FROM digital_object AS do '
+                        'JOIN linked_agents_rlshp ON linked_agents_rlshp.digital_object_id = do.id '
+                    'UNION '
+                    'SELECT do.id, do.repo_id FROM digital_object AS do '
+                        'JOIN subject_rlshp ON subject_rlshp.digital_object_id = do.id '
+                    'UNION '
+                    'SELECT do.id, do.repo_id FROM digital_object AS do '
+                        'JOIN date ON date.digital_object_id = do.id '
+                        'LEFT JOIN enumeration_value AS date_label ON date_label.id = date.label_id '
+                    'WHERE '
+                        'date_label.value IS NULL OR date_label.value != "digitized") AS T '
+                'JOIN '
+                    'repository ON repository.id = T.repo_id '
+                'WHERE '
+                    f'repository.repo_code NOT IN ({excluded_repos}) '
+                'ORDER BY '
+                    'T.repo_id, T.id')
+    return do_query, tuple(donotrun_repos)
+
+
+def find_candidates(as_database, donotrun_repos):
+    """
+    Queries the database for the digital objects with data to delete and groups them by repository
+
+    Args:
+        as_database (ASpaceDatabase): the connection to the ArchivesSpace database
+        donotrun_repos (list): the repository codes (repo_code) of the repositories to exclude
+
+    Returns:
+        repositories (list): the uri, repo_code and digital_object_ids of each repository with candidate digital
+            objects, in repository ID order
+    """
+    candidate_digital_objects = as_database.query_database(*candidate_query(donotrun_repos))
+    print(f'Found {len(candidate_digital_objects)} digital objects with metadata to delete')
+    logger.info(f'Found {len(candidate_digital_objects)} digital objects with metadata to delete')
+    repositories = {}
+    for do_id, repo_id, repo_code in candidate_digital_objects:
+        repo_uri = f'/repositories/{repo_id}'
+        if repo_uri not in repositories:
+            repositories[repo_uri] = {'uri': repo_uri, 'repo_code': repo_code, 'digital_object_ids': []}
+        repositories[repo_uri]['digital_object_ids'].append(do_id)
+    return list(repositories.values())
+
+
+def delete_repository_metadata(archivesspace_instance, backup_writer, repository, progress):
+    """
+    Gets the JSON data for each of the repository's candidate digital objects, deletes all information not contained
+    within the Basic Information or File Version sections and posts the updated JSON to ArchivesSpace, saving the old
+    JSON data in a separate file
+
+    Args:
+        archivesspace_instance (ArchivesSpace): the ArchivesSpace class instance used to get and update the objects
+        backup_writer (BackupWriter): the writer for the jsonL file storing JSON data of objects before updates
+        repository (dict): the repository uri, repo_code and digital_object_ids of the candidate digital objects
+        progress (RepositoryProgress): the repository's progress, used to record results and errors
+    """
+    for do_id in repository['digital_object_ids']:
+        digital_object_json = archivesspace_instance.get_object('digital_objects', do_id, repository['uri'])
+        if digital_object_json is None:
+            progress.add_error('delete_repository_metadata() - Unable to retrieve digital object',
+                               f'{repository["uri"]}/digital_objects/{do_id}')
+            continue
+        delete_fields = parse_delete_fields(digital_object_json)
+        if not delete_fields:
+            progress.add_result(None)
+            continue
+        updated_digital_object_json = deepcopy(digital_object_json)
+        for field in delete_fields:
+            updated_digital_object_json = delete_field_info(updated_digital_object_json,
+                                                            field.Field,
+                                                            field.Subrecord)
+        backup_writer.write(digital_object_json)
+        update_response = archivesspace_instance.update_object(updated_digital_object_json['uri'],
+                                                               updated_digital_object_json)
+        if update_response:
+            print(f'Updated {updated_digital_object_json["uri"]}: {update_response}')
+            logger.info(f'Updated {updated_digital_object_json["uri"]}: {update_response}')
+            progress.add_result(updated_digital_object_json['uri'])
+        else:
+            progress.add_error('delete_repository_metadata() - Unable to update digital object',
+                               updated_digital_object_json['uri'])
+
+
 def main():
     """
-    Runs the functions of the script by creating an ArchivesSpacec class instance, getting the repository info for every
-    repository, then all the digital object IDs per each repository, gets the JSON data for the digital object, deletes
-    all information not contained within the Basic Information or File Version sections and posts the updated JSON to
-    ArchivesSpace, saving the old JSON data in a separate file.
+    Runs the functions of the script by creating an ArchivesSpace class instance and a connection to the ArchivesSpace
+    database, querying the database for the digital objects that have data to delete in every repository not in
+    donotrun_repos, then working through the repositories concurrently, getting the JSON data for only those digital
+    objects, deleting all information not contained within the Basic Information or File Version sections and posting
+    the updated JSON to ArchivesSpace, saving the old JSON data in a separate file.
     """
     donotrun_repos = ['Test', 'TRAINING', 'NMAH-AF']
-    original_do_json_data = str(Path('../../test_data', 'delete_dometadata_original_data.jsonl'))
-    archivesspace_instance = ArchivesSpace(as_api_stag, as_un, as_pw)   # TODO: replace as_api_stag with as_api_prod
-    archivesspace_instance.get_repo_info()
-    for repo in archivesspace_instance.repo_info:
-        if repo['repo_code'] not in donotrun_repos:
-            all_digital_object_ids = archivesspace_instance.get_objects(repo['uri'], 'digital_objects')
-            if len(all_digital_object_ids) > 0:
-                for do_id in all_digital_object_ids:
-                    digital_object_json = archivesspace_instance.get_object('digital_objects', do_id,
-                                                                            repo['uri'])
-                    delete_fields = parse_delete_fields(digital_object_json)
-                    if delete_fields:
-                        updated_digital_object_json = deepcopy(digital_object_json)
-                        for field in delete_fields:
-                            updated_digital_object_json = delete_field_info(updated_digital_object_json,
-                                                                            field.Field,
-                                                                            field.Subrecord)
-                        write_to_file(original_do_json_data, digital_object_json)
-                        update_response = archivesspace_instance.update_object(updated_digital_object_json['uri'],
-                                                                               updated_digital_object_json)
-                        if update_response:
-                            print(f'Updated {updated_digital_object_json["uri"]}: {update_response}')
-                            logger.info(f'Updated {updated_digital_object_json["uri"]}: {update_response}')
+    original_do_json_data = str(Path('../../test_data', 'delete_dometadata_original_data.jsonl.gz'))
+    archivesspace_instance = ArchivesSpace(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
+    as_database = ASpaceDatabase(os.getenv('db_un'), os.getenv('db_pw'), os.getenv('db_host'), os.getenv('db_name'),
+                                 int(os.getenv('db_port')))
+    repositories = find_candidates(as_database, donotrun_repos)
+    as_database.close_connection()
+    # Hand each backup to the operating system before its object is posted, so it survives the script being killed
+    with BackupWriter(original_do_json_data, flush_records=1) as backup_writer:
+        updated_uris, repo_progress = fan_out_repositories(repositories,
+                                                           partial(delete_repository_metadata, archivesspace_instance,
+                                                                   backup_writer),
+                                                           max_workers=int(os.getenv('max_workers', '4')))
+    total_errors = sum(len(progress.errors) for progress in repo_progress.values())
+    print(f'Updated {len(updated_uris)} digital objects in {len(repo_progress)} repositories, errors: {total_errors}')
+    logger.info(f'Updated {len(updated_uris)} digital objects in {len(repo_progress)} repositories, '
+                f'errors: {total_errors}')
 
 
 if __name__ == "__main__":
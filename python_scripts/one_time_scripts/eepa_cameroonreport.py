@@ -9,6 +9,7 @@ from asnake.client import ASnakeClient
 from asnake.client.web_client import ASnakeAuthError
 from loguru import logger
 from pathlib import Path
+from python_scripts.utilities import read_validated_csv
 from secrets import *
 
 logger.remove()
@@ -40,28 +41,6 @@ def client_login(as_api, as_un, as_pw):
         return client
 
 
-def read_csv(cameroon_reports_csv):
-    """
-    Takes a csv input of ASpace resources and returns a list of dictionaries of all the objects metadata, including
-    their URIs
-
-    Args:
-        cameroon_reports_csv (str): filepath for the CSV
-
-    Returns:
-        resources (list): a list of dictionaries for each column name (key) and row values (value)
-    """
-    resources = []
-    try:
-        open_csv = open(cameroon_reports_csv, 'r', encoding='UTF-8')
-        resources = csv.DictReader(open_csv)
-    except IOError as csverror:
-        logger.error(f'ERROR reading csv file: {csverror}')
-        print(f'ERROR reading csv file: {csverror}')
-    else:
-        return resources
-
-
 def write_csv(original_filepath, new_filepath, add_values):
     """
     Takes a CSV input and writes a header and values to an additional column at the end of the CSV
@@ -151,7 +130,9 @@ def main():
     for file in reportspath:
         abstractscope_column_values = ['Abstract/Scope']
         new_report_filepath = str(file)[:-4] + '-Abstracts.csv'
-        report_collections = read_csv(str(file))
+        report_collections = read_validated_csv(str(file), {'uri': 'uri'})
+        if report_collections is None:
+            continue
         for collection in report_collections:
             print(collection['uri'])
             resource_json = get_resource_metadata(collection['uri'], aspace_client)
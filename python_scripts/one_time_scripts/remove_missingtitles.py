@@ -3,13 +3,13 @@
 # This script collects all resources and archival objects from every repository, checks their notes for lists and
 # 'Missing Title' in the list title, removes the title and updates to ArchivesSpace
 import copy
-import csv
 
 from asnake.client import ASnakeClient
 from asnake.client.web_client import ASnakeAuthError
 from collections import namedtuple
 from loguru import logger
 from pathlib import Path
+from python_scripts.utilities import read_validated_csv
 from secrets import *
 
 
@@ -40,29 +40,6 @@ def client_login(as_api, as_un, as_pw):
         return client
 
 
-def read_csv(missing_titles_csv):
-    """
-    Takes a csv input of ASpace objects with "Missing Title" in them - ran from SQL query - and returns a list of all
-    dictionaries of all the objects metadata, including their identifiers, repository ID, ASpace ID, and URI
-
-    Args:
-        missing_titles_csv (str): filepath for the missing titles csv listing metadata for resources or archival
-    objects
-
-    Returns:
-        missingtitle_objects (list): a list of URIs (dict) with "Missing Title" in their notes
-    """
-    missingtitle_objects = []
-    try:
-        open_csv = open(missing_titles_csv, 'r', encoding='UTF-8')
-        missingtitle_objects = csv.DictReader(open_csv)
-    except IOError as csverror:
-        logger.error(f'ERROR reading csv file: {csverror}')
-        print(f'ERROR reading csv file: {csverror}')
-    else:
-        return missingtitle_objects
-
-
 def get_objects(object_metadata, test=""):
     """
     Iterate through an object (resource or archival object) in a given repository and return new object without
@@ -149,8 +126,10 @@ def run_script(missing_titles_csv):
         missing_titles_csv (str): filepath for the missing titles csv listing all the URIs for resources or archival
     objects
     """
+    missingtitles = read_validated_csv(missing_titles_csv, {'uri': 'uri'})
+    if missingtitles is None:
+        return
     client = client_login(as_api_stag, as_un, as_pw)   # TODO: replace as_api_stag with as_api_prod
-    missingtitles = read_csv(missing_titles_csv)
     for mt_object in missingtitles:
         object_md = client.get(f'{mt_object['uri']}').json()
         if 'error' in object_md:
@@ -7,7 +7,6 @@
 # sorts the order of the IDs according to the above and posts the updated agent record via the ArchivesSpace API.
 import argparse
 import os
-import pandas
 import sys
 import time
 
@@ -18,7 +17,7 @@ from loguru import logger
 from pathlib import Path
 
 sys.path.append(os.path.dirname('python_scripts'))  # Needed to import functions from utilities.py
-from python_scripts.utilities import ASpaceAPI, record_error, write_to_file
+from python_scripts.utilities import ASpaceAPI, ProgressJournal, record_error, row_hash, write_to_file
 
 logger.remove()
 log_path = Path('../../logs', 'update_agentids_{time:YYYY-MM-DD}.log')
@@ -36,6 +35,9 @@ def parseArguments():
 
     parser.add_argument("excelPath", help="path to Excel input file", type=str)
     parser.add_argument("objectType", help="resources/archival_objects/digital_objects", type=str)
+    parser.add_argument("-j", "--journal", help="path to the progress journal file, default is the Excel path with "
+                                                ".progress.sqlite added", type=str)
+    parser.add_argument("--resume", help="skip the rows a previous run finished", action='store_true')
     parser.add_argument("-dR", "--dry-run", help="dry run?", action='store_true')
     parser.add_argument("--version", action="version", version='%(prog)s - Version 1.0')
 
@@ -136,7 +138,7 @@ def set_primary(object_json):
         index += 1
     return object_json
 
-def main(excel_path, object_type, dry_run=False):
+def main(excel_path, object_type, dry_run=False, journal_path=None, resume=False):
     """
     Takes an Excel file of agent IDs, adds the IDs to the agent JSON as Record IDs, then posts it via the ASpace API
 
@@ -145,17 +147,27 @@ def main(excel_path, object_type, dry_run=False):
         object_type (str): the type of object to be updated. In this case, "agents"
         dry_run (bool): if True, it prints the changed object_json but does not post the changes to ASpace or in the
         jsonlines file
+        journal_path (str): filepath of the progress journal, default is the Excel path with .progress.sqlite added
+        resume (bool): if True, skip the rows the journal has as finished by a previous run
     """
+    import pandas
+
     original_agent_json_data = Path('../../logs',
-                                    f'update_agentids_original_data_{time.strftime("%Y-%m-%d")}.jsonl')
+                                    f'update_agentids_original_data_{time.strftime("%Y-%m-%d")}.jsonl.gz')
     local_aspace = ASpaceAPI(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
     # pandas.set_option('display.max_rows', 10000)  # Optional for running the script locally to see all returns
     agent_excelfile = pandas.ExcelFile(excel_path)
     combined_and_cleaned_sheet = agent_excelfile.parse("combined and cleaned")
     combined_and_cleaned_sheet.fillna(0, inplace=True)  # replace missing cell values with 0 to sort out later - source: https://medium.com/swlh/data-science-for-beginners-how-to-handle-missing-values-with-pandas-73db5fcd46ec
+    journal = ProgressJournal(journal_path or f'{excel_path}.progress.sqlite', resume)
     for row in combined_and_cleaned_sheet.itertuples():
+        row_key = row_hash(row._asdict())
+        if journal.is_finished(row_key):
+            continue
         uri_parts = row.Aspace_link.split("/")
         original_agent_json = local_aspace.get_object(object_type, uri_parts[-1])
+        if not original_agent_json and not dry_run:
+            journal.mark(row_key, row.Aspace_link, 'not found')
         if original_agent_json:
             updated_object_json = deepcopy(original_agent_json)
             if row.Wikidata_id and row.Wikidata_id != 0:  # TODO: way to do this recursively? while loop or within function?
@@ -182,13 +194,19 @@ def main(excel_path, object_type, dry_run=False):
                 print(f'{updated_primary_identifiers}')
             else:
                 write_to_file(str(original_agent_json_data), original_agent_json)
+                journal.mark(row_key, row.Aspace_link, 'fetched')
                 update_status = local_aspace.update_object(f'{object_type}/{uri_parts[-1]}',
                                                            updated_primary_identifiers)
-                if 'error' in update_status:
+                if update_status is None:
+                    journal.mark(row_key, row.Aspace_link, 'failed')
                     record_error(f'main() - Error updating agent {row.Aspace_link}', update_status)
                 else:
+                    journal.mark(row_key, row.Aspace_link, 'posted')
                     logger.success(update_status)
                     print(update_status)
+    logger.info(f'Journal statuses: {journal.status_counts()}')
+    print(f'Journal statuses: {journal.status_counts()}')
+    journal.close()
 
 
 # Call with `python update_agentids.py <filename>.xlsx agents/people`
@@ -203,4 +221,5 @@ if __name__ == '__main__':
         print(str(arg) + ": " + str(args.__dict__[arg]))
 
     # Run function
-    main(excel_path=str(Path(f'{sys.argv[1]}')), object_type=str(f'{sys.argv[2]}'), dry_run=bool(f'{sys.argv[3]}'))
+    main(excel_path=args.excelPath, object_type=args.objectType, dry_run=args.dry_run, journal_path=args.journal,
+         resume=args.resume)
@@ -13,7 +13,7 @@ from loguru import logger
 from pathlib import Path
 
 sys.path.append(os.path.dirname('python_scripts'))  # Needed to import functions from utilities.py
-from python_scripts.utilities import ASpaceAPI, ASpaceDatabase, write_to_file
+from python_scripts.utilities import ASpaceAPI, ASpaceDatabase, BackupWriter
 
 # Find  and load environment-specific .env file
 env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
@@ -73,16 +73,18 @@ def main(jsonl_path, dry_run=False):
                         'coordinate_1_indicator LIKE "0_" '
                      'ORDER BY coordinate_1_indicator')
     sql_results = as_database.query_database(find_mapcases)
-    for result in sql_results:
-        location_json = local_aspace.get_object('locations', result[0])
-        write_to_file(jsonl_path, location_json)
-        updated_location = strip_coordinate_leadzero(location_json)
-        if dry_run:
-            print(f'This is the updated container: {updated_location}')
-        else:
-            update_result = local_aspace.update_object(updated_location['uri'], updated_location)
-            print(update_result)
-            logger.info(update_result)
+    # Hand each backup to the operating system before its object is posted, so it survives the script being killed
+    with BackupWriter(jsonl_path, flush_records=1) as backup_writer:
+        for result in sql_results:
+            location_json = local_aspace.get_object('locations', result[0])
+            backup_writer.write(location_json)
+            updated_location = strip_coordinate_leadzero(location_json)
+            if dry_run:
+                print(f'This is the updated container: {updated_location}')
+            else:
+                update_result = local_aspace.update_object(updated_location['uri'], updated_location)
+                print(update_result)
+                logger.info(update_result)
 
 
 # Call with `python update_coordinates.py <jsonl_filepath>.jsonl <log_folder_path>`
@@ -1,7 +1,8 @@
 #!/usr/bin/python3
 # This script takes a CSV containing archival object IDs, retrieves the archival object JSON from the ArchivesSpace
-# API, checks for container instances associated with the archival object, updates the FIRST instance's instance type
-# to the updated_instance_value, then posts the result back to ArchivesSpace.
+# API, checks for container instances associated with the archival object, updates the container instances' instance
+# type to the updated_instance_value, then posts the result back to ArchivesSpace. Rows for the same archival object
+# are grouped, so each archival object is fetched and posted once.
 # NOTE: This script is hard-coded to work with NMAH
 import argparse
 import os
@@ -14,7 +15,7 @@ from pathlib import Path
 sys.path.append(
     os.path.dirname("python_scripts")
 )  # Needed to import functions from utilities.py
-from python_scripts.utilities import ASpaceAPI, read_csv, write_to_file
+from python_scripts.utilities import ASpaceAPI, BackupWriter, group_rows, read_csv
 
 # Find  and load environment-specific .env file
 env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
@@ -39,8 +40,9 @@ def main(instances_csv, jsonl_path, dry_run=False):
     NOTE: This script is hard-coded to work with NMAH in the repo_uri parameter when calling aspace_api.get_object()
     Takes a CSV containing archival object IDs (column ao_ID), archival object ref IDs (column ao_refID),
     and the value of the instance to update to (column updated_instance_value), retrieves the archival object JSON from
-    the ArchivesSpace API, checks for container instances associated with the archival object, updates the FIRST
-    instance's instance type to the updated_instance_value, then posts the result back to ArchivesSpace.
+    the ArchivesSpace API, checks for container instances associated with the archival object, updates the container
+    instances' instance type to the updated_instance_value, then posts the result back to ArchivesSpace. All the rows
+    for an archival object are applied to it in order before it is posted once.
 
 
     Args:
@@ -50,28 +52,32 @@ def main(instances_csv, jsonl_path, dry_run=False):
     """
     aspace_api = ASpaceAPI(os.getenv("as_api"), os.getenv("as_un"), os.getenv("as_pw"))
     archival_objects = read_csv(instances_csv)
-    for archival_object in archival_objects:
-        ao_json = aspace_api.get_object('archival_objects',
-                                    int(archival_object['ao_ID']),
-                                    '/repositories/20')
-        if ao_json:
-            write_to_file(jsonl_path, ao_json)
-            if 'instances' in ao_json:
-                for instance in ao_json['instances']:
-                    if 'digital_object' in instance:
-                        pass
-                    else:
-                        original_instance_type = instance['instance_type']
-                        instance['instance_type'] = archival_object['updated_instance_value']
-                        if dry_run:
-                            print(f'{archival_object['ao_refID']}: {original_instance_type} > '
-                                  f'{instance['instance_type']}')
-                            logger.info(f'{archival_object['ao_refID']}: {original_instance_type} > '
-                                        f'{instance['instance_type']}')
-                        else:  # TODO: This only updates the first instance - receive 'The record you tried to update has been modified since you fetched it.' when trying to update subsequent instances
-                            post_result = aspace_api.update_object(ao_json['uri'], ao_json)
-                            print(post_result)
-                            logger.info(post_result)
+    # Hand each backup to the operating system before its object is posted, so it survives the script being killed
+    with BackupWriter(jsonl_path, flush_records=1) as backup_writer:
+        for ao_id, ao_rows in group_rows(archival_objects, lambda archival_object: archival_object['ao_ID']):
+            ao_json = aspace_api.get_object('archival_objects',
+                                        int(ao_id),
+                                        '/repositories/20')
+            if ao_json:
+                backup_writer.write(ao_json)
+                instance_updated = False
+                for archival_object in ao_rows:
+                    for instance in ao_json.get('instances', []):
+                        if 'digital_object' in instance:
+                            pass
+                        else:
+                            original_instance_type = instance['instance_type']
+                            instance['instance_type'] = archival_object['updated_instance_value']
+                            instance_updated = True
+                            if dry_run:
+                                print(f'{archival_object['ao_refID']}: {original_instance_type} > '
+                                      f'{instance['instance_type']}')
+                                logger.info(f'{archival_object['ao_refID']}: {original_instance_type} > '
+                                            f'{instance['instance_type']}')
+                if instance_updated and not dry_run:
+                    post_result = aspace_api.update_object(ao_json['uri'], ao_json)
+                    print(post_result)
+                    logger.info(post_result)
 
 
 # Call with `python update_instancetype.py <instances_csv_filepath>.csv <jsonl_filepath>.jsonl <log_folder_path>`
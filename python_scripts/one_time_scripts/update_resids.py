@@ -2,7 +2,6 @@
 
 # This script takes a CSV file of resource identifiers, edits them to standardize them to contain only alphanumeric
 # characters, except periods using those as separators, and posts those changes to ArchivesSpace
-import csv
 import json
 import re
 
@@ -10,6 +9,7 @@ from asnake.client import ASnakeClient
 from asnake.client.web_client import ASnakeAuthError
 from loguru import logger
 from pathlib import Path
+from python_scripts.utilities import read_validated_csv
 from secrets import *
 
 alphanumeric_capture = re.compile(r'[a-zA-Z0-9.-]*', re.UNICODE)
@@ -42,27 +42,6 @@ def client_login(as_api, as_un, as_pw):
         logger.info('Connected to ASnake client')
         return client
 
-def read_csv(all_ids_csv):
-    """
-    Takes a csv input of ASpace resource identifiers - ran from SQL query - and returns a list of all
-    dictionaries of all the objects metadata, including their identifiers, repository ID, ASpace ID, and URI
-
-    Args:
-        all_ids_csv (str): filepath for CSV file
-
-    Returns:
-        resources (list): a list of dictionaries for each column name (key) and row values (value)
-    """
-    try:
-        open_csv = open(all_ids_csv, 'r', encoding='UTF-8')
-        resources = csv.DictReader(open_csv)
-    except IOError as csverror:
-        logger.error(f'ERROR reading csv file: {csverror}')
-        print(f'ERROR reading csv file: {csverror}')
-    else:
-        return resources
-
-
 def remove_nonalphanums(identifier_value):
     """
     Takes a string input for a resource identifier value, removes all non-alphanumeric characters except periods and
@@ -130,7 +109,9 @@ def update_resids(aspace_client, updated_resource):
 
 def main():
     # aspace_client = client_login(as_api_stag, as_un, as_pw)  # TODO: replace as_api_stag with as_api_prod
-    resources = read_csv('../test_data/resource_accession_IDs_all.csv')
+    resources = read_validated_csv('../test_data/resource_accession_IDs_all.csv', {'identifier': 'text'})
+    if resources is None:
+        return
     for resource in resources:
         identifier_values = json.loads(resource['identifier'])
         update_identifiers = []
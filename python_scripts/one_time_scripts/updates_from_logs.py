@@ -1,14 +1,32 @@
 #!/usr/bin/env python
-
+# This script replays logged POSTs to ArchivesSpace, either from a CSV with Path and JSON columns or straight from the
+# scripts' loguru log files. Log files (or directories of them, including rotated and gzipped logs) are scanned one
+# line at a time for "would be updated with the following data:" messages, optionally only those logged within a time
+# window or by the given scripts, and the entries of all the log files are merged by time. The input is read a row at
+# a time and the posts are spread across several workers by path, so posts to the same record are still made one after
+# another in the order they were logged. Use --collapse to only post the last logged update for each path. Each
+# finished row is written to a checkpoint file, so a replay that stops can be run again and picks up where it left off.
+# Logged updates are checkpointed by their log file and line, so changing the filters between runs does not skip them.
 import argparse
+import ast
+import contextlib
+import csv
+import heapq
 import json
 import os
+import queue
+import re
 import sys
+import threading
+import zlib
 
+from collections import Counter
+from datetime import datetime
+from functools import partial
 from dotenv import load_dotenv, find_dotenv
 from loguru import logger
 from pathlib import Path
-from python_scripts.utilities import client_login, read_csv
+from python_scripts.utilities import client_login, open_backup, record_error
 
 # Logging
 logger.remove()
@@ -20,10 +38,27 @@ logger.add(str(log_path), format="{time}-{level}: {message}")
 env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
 load_dotenv(env_file)
 
+# The start of a log entry written with the {time}-{level}: {message} format - lines that do not match continue the
+# message of the entry above them
+log_entry_start = re.compile(r'^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:[+-]\d{2}:?\d{2}|Z)?)'
+                             r'-([A-Z]+): ?(.*)$')
+update_message = re.compile(r'would be updated with the following data:\s*(?P<payload>[\[{].*?)\s*$', re.S)
+update_object_path = re.compile(r'Object (?P<path>/?\S+) would be updated')
+
 def parseArguments():
     parser = argparse.ArgumentParser()
 
-    parser.add_argument("csvPath", help="path to csv input file", type=str)
+    parser.add_argument("inputPaths", help="path to csv input file, or to log files or directories of log files",
+                        type=str, nargs='+')
+    parser.add_argument("-s", "--since", help="only replay log entries from this ISO date/time on", type=str)
+    parser.add_argument("-u", "--until", help="only replay log entries before this ISO date/time", type=str)
+    parser.add_argument("--scripts", help="only replay log entries from these scripts' log files, default is every "
+                                          "script but updates_from_logs", nargs='+')
+    parser.add_argument("-w", "--workers", help="number of posts to make at once", type=int, default=4)
+    parser.add_argument("-c", "--collapse", help="only post the last update logged for each path",
+                        action='store_true')
+    parser.add_argument("--checkpoint", help="path to the checkpoint file, default is the first input path with "
+                                             ".checkpoint added", type=str)
     parser.add_argument("-dR", "--dry-run", help="dry run?", action='store_true')
     parser.add_argument("--version", action="version", version='%(prog)s - Version 1.0')
 
@@ -35,7 +70,7 @@ def post_object(client, path, data):
         client (ASnake.client object): client object from ASnake.client
         path (str): post path
         payload (dict): Json payload
-    
+
     Returns:
         update_message (dict): ArchivesSpace API response
     """
@@ -49,34 +84,314 @@ def post_object(client, path, data):
 
     return update_message
 
-def main(log_file_csv, dry_run):
+def read_update_csv(log_file_csv):
     """
-    Runs the functions of the script.
+    Reads the logged updates from a csv one row at a time
 
-    Takes a csv input of valid ASpace post paths and json payloads as such:
-        - Path
-        - JSON
+    Args:
+        log_file_csv (str): filepath for the csv with Path and JSON columns
+
+    Returns:
+        updates (generator): yields the row number, post path and JSON payload of each row
+    """
+    with open(log_file_csv, 'r', encoding='UTF-8', newline='') as csv_file:
+        for row_number, row in enumerate(csv.DictReader(csv_file), start=1):
+            yield row_number, row['Path'], row['JSON']
+
+def find_log_files(log_paths, script_names=None):
+    """
+    Lists the log files to read
 
     Args:
-        log_file_csv (str): filepath for the csv
-        dry_run (bool): run as non-destructive dry run?  True if `--dry-run` provided as an argument
+        log_paths (list): paths to log files or directories of log files
+        script_names (list): only include the log files of these scripts, default is None (all log files but this
+            script's own, whose dry run messages would be replayed again - add updates_from_logs to include them)
+
+    Returns:
+        log_files (list): the paths of the log files
     """
-    client = client_login(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
-    csv_dict = read_csv(log_file_csv)
-    for obj in csv_dict:
-        path = obj['Path']
-        payload = obj['JSON']
-        data = json.loads(payload)
-
-        if not dry_run:
-            post_object(client, path, data)
+    log_files = []
+    for log_path in log_paths:
+        if Path(log_path).is_dir():
+            log_files.extend(str(log_file) for log_file in Path(log_path).glob('*.log*') if log_file.is_file())
         else:
+            log_files.append(log_path)
+    if not script_names:
+        own_script_name = Path(__file__).stem
+        return sorted(log_file for log_file in log_files if not Path(log_file).name.startswith(f'{own_script_name}_'))
+    log_files = [log_file for log_file in log_files
+                 if any(Path(log_file).name.startswith(f'{script_name}_') for script_name in script_names)]
+    return sorted(log_files)
+
+def read_log_entries(log_file):
+    """
+    Reads a loguru log file, plain or gzipped, one entry at a time, joining the lines of multi-line messages. Each
+    entry gets an ID made of the log file's full path, without a .gz or .zst extension so compressing a log does not
+    change it, and the line the entry starts on
+
+    Args:
+        log_file (str): path to the log file
+
+    Returns:
+        log_entries (generator): yields the time (datetime), level, message and ID of each log entry
+    """
+    log_file_id = re.sub(r'\.(?:gz|zst)$', '', str(Path(log_file).resolve()))
+    log_entry = None
+    with open_backup(log_file) as log_reader:
+        for line_number, line in enumerate(log_reader, start=1):
+            entry_start = log_entry_start.match(line.rstrip('\n'))
+            if entry_start:
+                if log_entry:
+                    yield log_entry[0], log_entry[1], '\n'.join(log_entry[2]), log_entry[3]
+                log_entry = (parse_log_time(entry_start.group(1)), entry_start.group(2), [entry_start.group(3)],
+                             f'{log_file_id}:{line_number}')
+            elif log_entry:
+                log_entry[2].append(line.rstrip('\n'))
+    if log_entry:
+        yield log_entry[0], log_entry[1], '\n'.join(log_entry[2]), log_entry[3]
+
+def parse_log_time(time_text):
+    """
+    Reads a date/time from a log entry or the command line, treating times without a time zone as local time
+
+    Args:
+        time_text (str): an ISO date/time, ex. 2024-05-01T10:11:12.123456-0400 or 2024-05-01
+
+    Returns:
+        log_time (datetime): the time with its time zone
+    """
+    log_time = datetime.fromisoformat(time_text)
+    return log_time if log_time.tzinfo else log_time.astimezone()
+
+def parse_payload(payload_text):
+    """
+    Reads a logged payload, which scripts log either as JSON or as a printed Python dictionary
+
+    Args:
+        payload_text (str): the logged payload
+
+    Returns:
+        payload (dict): the payload, or None if it could not be read
+    """
+    try:
+        return json.loads(payload_text)
+    except json.JSONDecodeError:
+        try:
+            return ast.literal_eval(payload_text)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            return None
+
+def read_update_logs(log_paths, since=None, until=None, script_names=None):
+    """
+    Reads the logged updates from loguru log files one entry at a time. The entries of all the log files are merged
+    in the order they were logged, so updates to the same record logged by different scripts stay in order. Each
+    update is identified by its log file and line instead of a row number, so the checkpoint still matches when the
+    time window, the scripts or the log files read change between runs
+
+    Args:
+        log_paths (list): paths to log files or directories of log files
+        since (str): only include entries logged from this ISO date/time on, default is None
+        until (str): only include entries logged before this ISO date/time, default is None
+        script_names (list): only include the log files of these scripts, default is None (all log files)
+
+    Returns:
+        updates (generator): yields the ID, post path and JSON payload of each logged update
+    """
+    since_time = parse_log_time(since) if since else None
+    until_time = parse_log_time(until) if until else None
+    log_entries = heapq.merge(*(read_log_entries(log_file) for log_file in find_log_files(log_paths, script_names)),
+                              key=lambda log_entry: log_entry[0])
+    for log_time, _, message, entry_id in log_entries:
+        logged_update = update_message.search(message)
+        if not logged_update:
+            continue
+        if (since_time and log_time < since_time) or (until_time and log_time >= until_time):
+            continue
+        payload = parse_payload(logged_update.group('payload'))
+        object_path = update_object_path.search(message)
+        if isinstance(payload, dict) and payload.get('uri'):
+            path = payload['uri']
+        elif isinstance(payload, dict) and object_path:
+            path = object_path.group('path')
+        else:
+            record_error(f'read_update_logs() - Logged update at {log_time.isoformat()} could not be read', message)
+            continue
+        yield entry_id, path, json.dumps(payload)
+
+def normalize_path(path):
+    """
+    Gives a post path a single leading slash and no trailing slash, so the same record always has the same path
+
+    Args:
+        path (str): post path
+
+    Returns:
+        path (str): the normalized post path
+    """
+    return '/' + path.strip().strip('/')
+
+def collapse_updates(read_updates):
+    """
+    Keeps only the last logged update for each path. The updates are read twice, first to find the last row for each
+    path and then to pass those rows on, so only the paths are held in memory
+
+    Args:
+        read_updates (function): returns a new generator of (row number or ID, path, payload) updates each time it is
+            called
+
+    Returns:
+        updates (generator): yields the last update logged for each path, in the order they were logged
+    """
+    last_rows = {}
+    for row_number, path, _ in read_updates():
+        last_rows[normalize_path(path)] = row_number
+    for row_number, path, payload in read_updates():
+        if last_rows[normalize_path(path)] == row_number:
+            yield row_number, path, payload
+
+def read_checkpoint(checkpoint_path):
+    """
+    Gets the rows a previous replay already finished from the checkpoint file
+
+    Args:
+        checkpoint_path (str): path to the checkpoint file
+
+    Returns:
+        finished_rows (set): the row numbers or IDs written to the checkpoint file, as text
+    """
+    if not os.path.isfile(checkpoint_path):
+        return set()
+    with open(checkpoint_path, 'r', encoding='UTF-8') as checkpoint_file:
+        return {line.strip() for line in checkpoint_file if line.strip()}
+
+def replay_partition(client, updates_queue, checkpoint, dry_run, status_counts):
+    """
+    Posts the updates for one partition of paths in the order they were queued. If a post fails without a response
+    from ArchivesSpace, the rest of the updates to that path are left for the next replay so they stay in order
+
+    Args:
+        client (ASnake.client object): client object from ASnake.client
+        updates_queue (queue.Queue): the partition's (row number, path, payload) updates, ending with None
+        checkpoint (function): called with the row number of each finished row
+        dry_run (bool): run as non-destructive dry run?
+        status_counts (Counter): the partition's number of rows posted, failed, or skipped, updated as it is replayed
+    """
+    failed_paths = set()
+    while (update := updates_queue.get()) is not None:
+        row_number, path, payload = update
+        path = normalize_path(path)
+        if path in failed_paths:
+            status_counts['skipped'] += 1
+            continue
+        if dry_run:
             message = f"""
 Object {path} would be updated with the following data:
     {payload}
 """
             logger.info(message)
             print(message)
+            status_counts['dry run'] += 1
+            continue
+        try:
+            update_message = post_object(client, path, json.loads(payload))
+        except json.JSONDecodeError as json_error:
+            record_error(f'replay_partition() - Row {row_number} JSON could not be read', json_error)
+            status_counts['error'] += 1
+        except OSError as post_error:
+            record_error(f'replay_partition() - Row {row_number} could not be posted, later updates to {path} will '
+                         f'wait for the next replay', post_error)
+            failed_paths.add(path)
+            status_counts['failed'] += 1
+            continue
+        else:
+            status_counts['error' if 'error' in update_message else 'posted'] += 1
+        checkpoint(row_number)
+
+def replay_updates(client, updates, workers=4, dry_run=False, checkpoint_path=None):
+    """
+    Replays logged updates with several workers. Updates are split into one partition per worker by path and each
+    partition is posted in order, so updates to the same record are never posted at the same time or out of order
+
+    Args:
+        client (ASnake.client object): client object from ASnake.client
+        updates (iterable): the (row number or ID, path, payload) updates in the order they were logged
+        workers (int): number of posts to make at once, default is 4
+        dry_run (bool): run as non-destructive dry run?
+        checkpoint_path (str): path to the checkpoint file, default is None (no checkpoint)
+
+    Returns:
+        status_counts (Counter): the number of rows posted, with errors, failed, skipped, or already finished
+    """
+    finished_rows = read_checkpoint(checkpoint_path) if checkpoint_path else set()
+    status_counts = Counter()
+    checkpoint_lock = threading.Lock()
+    with contextlib.ExitStack() as checkpoint_stack:
+        checkpoint_file = None
+        if checkpoint_path and not dry_run:
+            checkpoint_file = checkpoint_stack.enter_context(open(checkpoint_path, 'a', encoding='UTF-8'))
+
+        def checkpoint(row_number):
+            if checkpoint_file is not None:
+                with checkpoint_lock:
+                    checkpoint_file.write(f'{row_number}\n')
+                    checkpoint_file.flush()
+
+        # Bounded queues keep the csv from being read much faster than the updates are posted
+        update_queues = [queue.Queue(maxsize=1000) for _ in range(workers)]
+        partition_counts = [Counter() for _ in range(workers)]
+        replay_threads = [threading.Thread(target=replay_partition,
+                                           args=(client, update_queue, checkpoint, dry_run, partition_count))
+                          for update_queue, partition_count in zip(update_queues, partition_counts)]
+        for replay_thread in replay_threads:
+            replay_thread.start()
+        try:
+            for row_number, path, payload in updates:
+                if str(row_number) in finished_rows:
+                    status_counts['already finished'] += 1
+                    continue
+                partition = zlib.crc32(normalize_path(path).encode('utf-8')) % workers
+                update_queues[partition].put((row_number, path, payload))
+        finally:
+            for update_queue in update_queues:
+                update_queue.put(None)
+            for replay_thread in replay_threads:
+                replay_thread.join()
+    for partition_count in partition_counts:
+        status_counts.update(partition_count)
+    return status_counts
+
+def main(input_paths, dry_run, workers=4, collapse=False, checkpoint_path=None, since=None, until=None,
+         script_names=None):
+    """
+    Runs the functions of the script.
+
+    Takes a csv input of valid ASpace post paths and json payloads as such:
+        - Path
+        - JSON
+    or loguru log files with "would be updated with the following data:" messages
+
+    Args:
+        input_paths (list): filepath for the csv, or filepaths of log files or directories of log files
+        dry_run (bool): run as non-destructive dry run?  True if `--dry-run` provided as an argument
+        workers (int): number of posts to make at once, default is 4
+        collapse (bool): if True, only post the last update logged for each path
+        checkpoint_path (str): path to the checkpoint file, default is the first input path with .checkpoint added
+        since (str): only replay log entries from this ISO date/time on, default is None
+        until (str): only replay log entries before this ISO date/time, default is None
+        script_names (list): only replay log entries from these scripts' log files, default is None
+    """
+    if isinstance(input_paths, str):
+        input_paths = [input_paths]
+    client = client_login(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
+    if len(input_paths) == 1 and input_paths[0].lower().endswith('.csv'):
+        read_updates = partial(read_update_csv, input_paths[0])
+    else:
+        read_updates = partial(read_update_logs, input_paths, since, until, script_names)
+    updates = collapse_updates(read_updates) if collapse else read_updates()
+    checkpoint_path = checkpoint_path or f'{input_paths[0].rstrip("/")}.checkpoint'
+    status_counts = replay_updates(client, updates, workers, dry_run, checkpoint_path)
+    logger.info(f'Replay finished: {dict(status_counts)}')
+    print(f'Replay finished: {dict(status_counts)}')
 
 if __name__ == "__main__":
     args = parseArguments()
@@ -89,4 +404,5 @@ if __name__ == "__main__":
         print(str(a) + ": " + str(args.__dict__[a]))
 
     # Run function
-    main(args.csvPath, args.dry_run)
+    main(args.inputPaths, args.dry_run, args.workers, args.collapse, args.checkpoint, args.since, args.until,
+         args.scripts)
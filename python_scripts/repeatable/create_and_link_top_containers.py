@@ -1,4 +1,5 @@
-# This script creates new top containers in bulk and links as instances to other records
+# This script creates new top containers in bulk and links as instances to other records. Rows linking to the same
+# record are grouped, so each record is fetched and posted once with all of its new instances
 import argparse
 import csv
 import os
@@ -10,7 +11,7 @@ from loguru import logger
 from pathlib import Path
 
 sys.path.append(os.path.dirname('python_scripts'))  # Needed to import functions from utilities.py
-from python_scripts.utilities import ASpaceAPI, read_csv
+from python_scripts.utilities import ASpaceAPI, ProgressReporter, count_csv_rows, group_rows, read_csv
 
 logger.remove()
 log_path = Path('./logs', 'create_and_link_top_containers_{time:YYYY-MM-DDTHH:MM:SS}.log')
@@ -119,6 +120,60 @@ def build_updated_rec(rec, tc_uri, row):
 
     return rec
 
+def find_or_create_top_container(local_aspace, row, repo_id, dry_run=False):
+    """
+    Finds the top container for a row by barcode and indicator, or creates it if it does not exist
+
+    Args:
+        local_aspace (ASpaceAPI): an instance of the ASpace API for connecting to the client
+        row (dict): tc metadata from csv
+        repo_id (int): repo_id of the top container
+        dry_run (bool): if True, it prints the new top container but does not post it to ASpace
+
+    Returns:
+        top_container_uri (str): the URI of the top container, the new top container data for a dry run, or None if
+            it could not be created
+    """
+    query = build_tc_query(row)
+    existing_tc = local_aspace.search_objects(query, 'top_container', repo_id)
+    if existing_tc:
+        return existing_tc[0]['uri']
+    data = build_tc(row)
+    if not dry_run:
+        post_response = local_aspace.update_object(f'/repositories/{repo_id}/top_containers', data)
+        logger.info(post_response)
+        print(post_response)
+        return post_response['uri'] if post_response else None
+    logger.info(f'The following top container would be created:\n{data}')
+    print(f'The following top container would be created:\n{data}')
+    return data
+
+def link_top_containers(local_aspace, record_to_link, rows, dry_run=False):
+    """
+    Adds an instance for each row's top container to the record, posting the record once for all the rows
+
+    Args:
+        local_aspace (ASpaceAPI): an instance of the ASpace API for connecting to the client
+        record_to_link (str): the URI of the resource or archival object, ex: /repositories/2/archival_objects/1
+        rows (list): the rows linking to the record, each with its top_container_uri
+        dry_run (bool): if True, it prints the record URI but does not post the changes to ASpace
+
+    Returns:
+        record_to_link_uri (str): the URI of the updated record
+    """
+    if dry_run:
+        logger.info(f'and linked to:\n{record_to_link}')
+        print(f'and linked to:\n{record_to_link}')
+        return record_to_link
+    parts = record_to_link.split('/')
+    rec_data = local_aspace.get_object(parts[3], parts[4], f'{parts[1]}/{parts[2]}/')
+    for row in rows:
+        rec_data = build_updated_rec(rec_data, row['top_container_uri'], row)
+    rec_post_response = local_aspace.update_object(rec_data['uri'], rec_data)
+    logger.info(rec_post_response)
+    print(rec_post_response)
+    return rec_data['uri']
+
 def main(csv_in_path, csv_out_path, repo_id, dry_run=False):
     """
     This script takes a CSV of top container data, creates those new top containers, and
@@ -143,49 +198,27 @@ def main(csv_in_path, csv_out_path, repo_id, dry_run=False):
         dry_run (bool): if True, it prints the changed object_json but does not post the changes to ASpace
     """
     local_aspace = ASpaceAPI(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
+    progress = ProgressReporter('create_and_link_top_containers', count_csv_rows(csv_in_path))
     with open(csv_out_path, mode='w', newline='', encoding='utf-8') as outfile:
-        for row in read_csv(csv_in_path):
-            row['mode'] = 'test update' if dry_run else 'updated'
-            top_container_uri = ''
-            record_to_link = row['link_to_uri']
-
+        for record_to_link, rows in group_rows(read_csv(csv_in_path), lambda row: row['link_to_uri']):
             # Find existing or create new top_container
-            query = build_tc_query(row)
-            existing_tc = local_aspace.search_objects(query, 'top_container', repo_id)
-            if existing_tc:
-                top_container_uri = existing_tc[0]['uri']
-            else:
-                data = build_tc(row)
-                if not dry_run:
-                    post_response = local_aspace.update_object(f'/repositories/{repo_id}/top_containers', data)
-                    logger.info(post_response)
-                    print(post_response)
-                    top_container_uri = post_response['uri']
-                else:
-                    top_container_uri = data
-                    logger.info(f'The following top container would be created:\n{top_container_uri}')
-                    print(f'The following top container would be created:\n{top_container_uri}')
-            row['top_container_uri'] = top_container_uri
-
-            # Create instance and link if we have a record to link to
-            if record_to_link and top_container_uri is not None:
-                if not dry_run:
-                    parts = record_to_link.split('/')
-                    record_to_link = local_aspace.get_object(parts[3], parts[4], f'{parts[1]}/{parts[2]}/')
-                    rec_data = build_updated_rec(record_to_link, top_container_uri, row)
-                    record_to_link_uri = record_to_link['uri']
-                    rec_post_response = local_aspace.update_object(record_to_link['uri'], rec_data)
-                    logger.info(rec_post_response)
-                    print(rec_post_response)
-                else:
-                    record_to_link_uri = record_to_link
-                    logger.info(f'and linked to:\n{record_to_link_uri}')
-                    print(f'and linked to:\n{record_to_link_uri}')
-                row['updated_record_uri'] = record_to_link_uri
-            
-            writer = csv.DictWriter(outfile, fieldnames=list(row.keys()))
-            writer.writeheader()
-            writer.writerow(row)
+            for row in rows:
+                row['mode'] = 'test update' if dry_run else 'updated'
+                row['top_container_uri'] = find_or_create_top_container(local_aspace, row, repo_id, dry_run)
+
+            # Create instances and link if we have a record to link to
+            linked_rows = [row for row in rows if row['top_container_uri'] is not None]
+            if record_to_link and linked_rows:
+                record_to_link_uri = link_top_containers(local_aspace, record_to_link, linked_rows, dry_run)
+                for row in linked_rows:
+                    row['updated_record_uri'] = record_to_link_uri
+
+            for row in rows:
+                writer = csv.DictWriter(outfile, fieldnames=list(row.keys()))
+                writer.writeheader()
+                writer.writerow(row)
+            progress.update(len(rows), errors=sum(row['top_container_uri'] is None for row in rows))
+    progress.finish()
 
 # Call with `python create_and_link_top_containers.py <input_filename>.csv <output_filename>.csv <repo_id>`
 if __name__ == '__main__':
@@ -9,14 +9,12 @@ import sys
 
 from dotenv import load_dotenv, find_dotenv
 from loguru import logger
-from pathlib import Path
 
 sys.path.append(os.path.dirname('python_scripts'))  # Needed to import functions from utilities.py
-from python_scripts.utilities import ASpaceAPI, read_csv, write_to_file, record_error
+from python_scripts.utilities import (ASpaceAPI, BackupWriter, ProgressJournal, ProgressReporter, count_csv_rows,
+                                      echo, read_validated_csv, record_error, row_hash, setup_logging)
 
-logger.remove()
-log_path = Path('../../logs', 'delete_objects_{time:YYYY-MM-DD}.log')
-logger.add(str(log_path), format="{time}-{level}: {message}")
+setup_logging('delete_objects', '../../logs')
 
 # Find  and load environment-specific .env file
 env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
@@ -28,6 +26,13 @@ def parseArguments():
 
     parser.add_argument("csvPath", help="path to CSV input file", type=str)
     parser.add_argument("jsonPath", help="path to the JSONL file for storing data", type=str)
+    parser.add_argument("-j", "--journal", help="path to the progress journal file, default is the CSV path with "
+                                                ".progress.sqlite added", type=str)
+    parser.add_argument("--resume", help="skip the rows a previous run finished", action='store_true')
+    parser.add_argument("--log-level", help="lowest level written to the log", type=str, default='INFO',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    parser.add_argument("-q", "--quiet", help="only print errors and progress reports to the console",
+                        action='store_true')
     parser.add_argument("-dR", "--dry-run", help="dry run?", action='store_true')
     parser.add_argument("--version", action="version", version='%(prog)s - Version 1.0')
 
@@ -58,7 +63,7 @@ def retrieve_object_json(object_uri, local_aspace):
         return object_json
 
 
-def main(csv_path, jsonl_path, dry_run=False):
+def main(csv_path, jsonl_path, dry_run=False, journal_path=None, resume=False):
     """
     This script takes a CSV of URIs and object type as inputs, grabs all the objects' JSON data using the API, saves
     them to a jsonL file using the jsonl_path input, and then deletes them in ArchivesSpace.
@@ -71,25 +76,51 @@ def main(csv_path, jsonl_path, dry_run=False):
         csv_path (str): filepath of the CSV file with the object URIs
         jsonl_path (str): filepath of the jsonL file for storing JSON data of objects before updates - backup
         dry_run (bool): if True, it prints the changed object_json but does not post the changes to ASpace
+        journal_path (str): filepath of the progress journal, default is the CSV path with .progress.sqlite added
+        resume (bool): if True, skip the rows the journal has as finished by a previous run
     """
+    uris = read_validated_csv(csv_path, {'uri': 'uri'})
+    if uris is None:
+        return
+    progress = ProgressReporter('delete_objects', count_csv_rows(csv_path))
     local_aspace = ASpaceAPI(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
-    for uri in read_csv(csv_path):
-        object_json = retrieve_object_json(uri, local_aspace)
-        write_to_file(jsonl_path, object_json)
-        if object_json:
-            if dry_run:
-                print(f'Object would be deleted: {uri['uri']}')
-                logger.info(f'Object would be deleted: {uri['uri']}')
+    # Hand each backup to the operating system before its object is deleted, so it survives the script being killed
+    with BackupWriter(jsonl_path, flush_records=1) as backup_writer, \
+            ProgressJournal(journal_path or f'{csv_path}.progress.sqlite', resume) as journal:
+        for uri in uris:
+            row_key = row_hash(uri)
+            if journal.is_finished(row_key):
+                progress.update()
+                continue
+            object_json = retrieve_object_json(uri, local_aspace)
+            backup_writer.write(object_json)
+            if not object_json:
+                progress.update(errors=1)
+                if not dry_run:
+                    journal.mark(row_key, uri['uri'], 'not found')
+            elif dry_run:
+                echo(f'Object would be deleted: {uri["uri"]}')
+                logger.info(f'Object would be deleted: {uri["uri"]}')
+                progress.update()
             else:
+                journal.mark(row_key, uri['uri'], 'fetched')
                 post_response = local_aspace.delete_object(object_json['uri'])
                 if post_response:
+                    journal.mark(row_key, uri['uri'], 'posted')
                     logger.info(f'Deleted: {uri}, {post_response}')
-                    print(post_response)
+                    echo(post_response)
+                else:
+                    journal.mark(row_key, uri['uri'], 'failed')
+                progress.update(errors=int(not post_response))
+        progress.finish()
+        logger.info(f'Journal statuses: {journal.status_counts()}')
+        print(f'Journal statuses: {journal.status_counts()}')
 
 
 # Call with `python delete_objects.py <csv_filpath>.csv <jsonl_filepath>.jsonl`
 if __name__ == '__main__':
     args = parseArguments()
+    setup_logging('delete_objects', '../../logs', args.log_level, args.quiet)
 
     # Print arguments
     logger.info(f'Running {sys.argv[0]} script with following arguments: ')
@@ -99,4 +130,5 @@ if __name__ == '__main__':
         print(str(arg) + ": " + str(args.__dict__[arg]))
 
     # Run function
-    main(csv_path=args.csvPath, jsonl_path= args.jsonPath, dry_run=args.dry_run)
+    main(csv_path=args.csvPath, jsonl_path= args.jsonPath, dry_run=args.dry_run, journal_path=args.journal,
+         resume=args.resume)
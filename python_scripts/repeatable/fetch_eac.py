@@ -12,7 +12,8 @@ from loguru import logger
 from pathlib import Path
 
 sys.path.append(os.path.dirname('python_scripts'))  # Needed to import functions from utilities.py
-from python_scripts.utilities import ASpaceAPI, read_csv, record_error, write_to_xml_file
+from python_scripts.utilities import (ASpaceAPI, ProgressReporter, count_csv_rows, read_csv, record_error,
+                                      write_to_xml_file)
 
 logger.remove()
 log_name = __file__.rsplit('/',1)[1].replace('.py', '')+'_{time:YYYY-MM-DDTHH:MM:SS}'
@@ -63,7 +64,9 @@ def main(csv_path, output_dir, dry_run=False):
         dry_run (bool): if True, it fetches the records that would be exported, but does not save them
     """
     local_aspace = ASpaceAPI(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
-    agents = read_csv(str(Path(os.getcwd(), csv_path)))
+    csv_location = str(Path(os.getcwd(), csv_path))
+    agents = read_csv(csv_location)
+    progress = ProgressReporter('fetch_eac', count_csv_rows(csv_location))
     for row in agents:
         file_path = os.path.join(output_dir, f"{row['agent_type']}_{row['agent_id']}.xml")
         agent_xml = get_eac(local_aspace, row)
@@ -73,6 +76,8 @@ def main(csv_path, output_dir, dry_run=False):
         else:
             logger.info(f'The following would be written to {file_path}:\n{agent_xml}')
             print(f'The following would be written to {file_path}:\n{agent_xml}')
+        progress.update(errors=int(agent_xml is None))
+    progress.finish()
 
 # Call with `python fetch_eac.py <input_filename>.csv <output_dir>`
 if __name__ == '__main__':
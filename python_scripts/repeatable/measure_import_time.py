@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+# This script measures how long it takes to start Python and import each of the given modules, such as utilities.py or
+# one of the scripts, so slow startups can be caught before they add up across many short jobs. Each module is
+# imported in a new interpreter with -X importtime several times and the fastest run is kept. It prints the time spent
+# starting the interpreter and importing each module, and the packages that took the longest to import. Save the times
+# with --save to a baseline file, then later runs with the same --baseline report the modules that got slower.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from loguru import logger
+from pathlib import Path
+
+sys.path.append(os.path.dirname('python_scripts'))  # Needed to import functions from utilities.py
+from python_scripts.utilities import record_error, setup_logging
+
+log_name = __file__.rsplit('/',1)[1].replace('.py', '')
+setup_logging(log_name)
+
+# The repository folder, added to the PYTHONPATH of each interpreter so python_scripts can be imported
+repository_dir = str(Path(__file__).resolve().parents[2])
+
+default_modules = ['python_scripts.utilities', 'python_scripts.batch_jobs']
+
+def parseArguments():
+    """Parses the arguments fed to the script from the terminal or within a run configuration"""
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("modules", help="the modules to import, such as python_scripts.repeatable.delete_objects",
+                        nargs='*', default=default_modules)
+    parser.add_argument("-r", "--runs", help="number of times to import each module, the fastest is kept", type=int,
+                        default=3)
+    parser.add_argument("-t", "--top", help="number of slowest packages to list for each module", type=int, default=5)
+    parser.add_argument("-b", "--baseline", help="path to a JSON file of earlier import times to compare against",
+                        type=str)
+    parser.add_argument("-s", "--save", help="save the import times to the baseline file instead of comparing",
+                        action='store_true')
+    parser.add_argument("-m", "--max-increase", help="percent an import time can grow over the baseline before it "
+                                                     "is reported", type=float, default=20)
+    parser.add_argument("--version", action="version", version='%(prog)s - Version 1.0')
+
+    return parser.parse_args()
+
+
+def import_times(module_name=None, runs=3):
+    """
+    Starts a new interpreter that imports a module with -X importtime, as many times as given, and keeps the fastest
+
+    Args:
+        module_name (str): the module to import, default is None (start the interpreter without importing anything)
+        runs (int): the number of times to start the interpreter, default is 3
+
+    Returns:
+        total_seconds (float): the fastest time taken to start the interpreter and import the module
+        package_times (dict): the cumulative import time in microseconds of every module imported in the fastest run,
+            by module name
+    """
+    python_path = os.pathsep.join(filter(None, [repository_dir, os.getenv('PYTHONPATH')]))
+    import_statement = f'import {module_name}' if module_name else 'pass'
+    total_seconds, package_times = None, {}
+    for _ in range(runs):
+        started = time.perf_counter()
+        interpreter = subprocess.run([sys.executable, '-X', 'importtime', '-c', import_statement], capture_output=True,
+                                     text=True, env=dict(os.environ, PYTHONPATH=python_path))
+        run_seconds = time.perf_counter() - started
+        if interpreter.returncode != 0:
+            record_error(f'import_times() - Unable to import {module_name}', interpreter.stderr.strip()[-500:])
+            return None, {}
+        if total_seconds is None or run_seconds < total_seconds:
+            total_seconds, package_times = run_seconds, {}
+            for import_line in interpreter.stderr.splitlines():
+                if not import_line.startswith('import time:') or '[us]' in import_line:
+                    continue
+                _, cumulative_time, package_name = import_line.split(':', 1)[1].split('|')
+                package_times[package_name.strip()] = int(cumulative_time)
+    return total_seconds, package_times
+
+
+def slowest_packages(package_times, module_name, top_count=5, startup_packages=()):
+    """
+    Gets the top-level packages that took the longest to import, leaving out the module's own package and the packages
+    the interpreter imports when it starts
+
+    Args:
+        package_times (dict): the cumulative import time in microseconds of every module imported, by module name
+        module_name (str): the module that was imported
+        top_count (int): the number of packages to return, default is 5
+        startup_packages (set): the packages imported when the interpreter starts, default is none
+
+    Returns:
+        packages (list): (package name, import seconds) tuples of the slowest packages, slowest first
+    """
+    own_package = module_name.split('.')[0]
+    packages = [(package_name, package_time / 1000000) for package_name, package_time in package_times.items()
+                if '.' not in package_name and not package_name.startswith('_') and package_name != own_package
+                and package_name not in startup_packages]
+    return sorted(packages, key=lambda package: package[1], reverse=True)[:top_count]
+
+
+def main(module_names, runs=3, top_count=5, baseline_path=None, save=False, max_increase=20):
+    """
+    Measures the startup time of each module and compares it with a baseline or saves it as the new baseline
+
+    Args:
+        module_names (list): the modules to import
+        runs (int): the number of times to import each module, the fastest is kept, default is 3
+        top_count (int): the number of slowest packages to list for each module, default is 5
+        baseline_path (str): filepath of a JSON file of import times to compare against or save to, default is None
+        save (bool): if True, save the import times to the baseline file instead of comparing them
+        max_increase (float): the percent an import time can grow over the baseline before it is reported, default is
+            20
+
+    Returns:
+        module_seconds (dict): the time taken to start the interpreter and import each module, by module name
+        slower_modules (list): the modules whose import time grew more than max_increase over the baseline
+    """
+    startup_seconds, startup_packages = import_times(runs=runs)
+    print(f'Interpreter startup: {startup_seconds:.3f}s')
+    module_seconds = {}
+    for module_name in module_names:
+        total_seconds, package_times = import_times(module_name, runs)
+        if total_seconds is None:
+            continue
+        module_seconds[module_name] = total_seconds
+        print(f'{module_name}: {total_seconds:.3f}s ({total_seconds - startup_seconds:.3f}s importing)')
+        for package_name, package_seconds in slowest_packages(package_times, module_name, top_count,
+                                                               startup_packages):
+            print(f'    {package_name}: {package_seconds:.3f}s')
+        logger.info(f'{module_name} started in {total_seconds:.3f}s')
+    slower_modules = []
+    if baseline_path and save:
+        with open(baseline_path, 'w', encoding='UTF-8') as baseline_file:
+            json.dump(module_seconds, baseline_file, indent=2)
+    elif baseline_path and os.path.exists(baseline_path):
+        with open(baseline_path, 'r', encoding='UTF-8') as baseline_file:
+            baseline_seconds = json.load(baseline_file)
+        for module_name, total_seconds in module_seconds.items():
+            if module_name in baseline_seconds and \
+                    total_seconds > baseline_seconds[module_name] * (1 + max_increase / 100):
+                slower_modules.append(module_name)
+                record_error(f'main() - {module_name} takes longer to import than the baseline of '
+                             f'{baseline_seconds[module_name]:.3f}s', f'{total_seconds:.3f}s')
+    return module_seconds, slower_modules
+
+
+# Call with `python measure_import_time.py python_scripts.repeatable.delete_objects -b import_times.json`
+if __name__ == '__main__':
+    args = parseArguments()
+
+    # Print arguments
+    logger.info(f'Running {sys.argv[0]} script with following arguments: ')
+    print(f'Running {sys.argv[0]} script with following arguments: ')
+    for arg in args.__dict__:
+        logger.info(str(arg) + ": " + str(args.__dict__[arg]))
+        print(str(arg) + ": " + str(args.__dict__[arg]))
+
+    # Run function
+    main(module_names=args.modules, runs=args.runs, top_count=args.top, baseline_path=args.baseline, save=args.save,
+         max_increase=args.max_increase)
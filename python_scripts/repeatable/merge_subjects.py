@@ -1,5 +1,4 @@
 # This script merges two existing subjects identified in a provided csv
-import csv
 import os
 import sys
 
@@ -8,6 +7,7 @@ from asnake.client.web_client import ASnakeAuthError
 from dotenv import load_dotenv, find_dotenv
 from loguru import logger
 from pathlib import Path
+from python_scripts.utilities import ProgressReporter, count_csv_rows, read_validated_csv
 
 logger.remove()
 log_path = Path('./logs', 'merge_subjects_{time:YYYY-MM-DD}.log')
@@ -17,6 +17,10 @@ logger.add(str(log_path), format="{time}-{level}: {message}")
 env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
 load_dotenv(env_file)
 
+# The columns of the csv and the types read_validated_csv() checks them against
+merge_subjects_schema = {'aspace_subject_id': 'int', 'title': 'text', 'aspace_subject_id2': 'int',
+                         'Merge into': 'text'}
+
 def client_login(as_api, as_un, as_pw):
     """
     Login to the ArchivesSnake client and return client
@@ -40,24 +44,6 @@ def client_login(as_api, as_un, as_pw):
     else:
         return client
 
-def read_csv(merge_subjects_csv):
-    """
-    Args:
-        merge_subjects_csv (str): filepath for the subjects csv
-
-    Returns:
-        merge_subjects (list): a list of subjects to be merged
-    """
-    merge_subjects = []
-    try:
-        open_csv = open(merge_subjects_csv, 'r', encoding='UTF-8')
-        merge_subjects = csv.DictReader(open_csv)
-    except IOError as csverror:
-        logger.error(f'ERROR reading csv file: {csverror}')
-        print(f'ERROR reading csv file: {csverror}')
-    else:
-        return merge_subjects
-
 def get_subject(client, existing_subject_id):
     """
     Args:
@@ -135,16 +121,22 @@ def main(merge_subjects_csv):
     Args:
         merge_subjects_csv (str): filepath for the subjects csv
     """
+    merge_subjects = read_validated_csv(merge_subjects_csv, merge_subjects_schema)
+    if merge_subjects is None:
+        return
     client = client_login(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
-    merge_subjects = read_csv(merge_subjects_csv)
+    progress = ProgressReporter('merge_subjects', count_csv_rows(merge_subjects_csv))
     for subj in merge_subjects:
+        row_failed = True
         destination_id = subj['aspace_subject_id2']
         candidate_id = subj['aspace_subject_id']
         destination_match = check_subject(client, destination_id, subj['Merge into'])
         candidate_match = check_subject(client, candidate_id, subj['title'])
         if destination_match is not None and candidate_match is not None:
             if destination_match and candidate_match:
-                merge_subject(client, f'/subjects/{subj["aspace_subject_id2"]}', f'/subjects/{subj["aspace_subject_id"]}')
+                merge_message = merge_subject(client, f'/subjects/{subj["aspace_subject_id2"]}',
+                                              f'/subjects/{subj["aspace_subject_id"]}')
+                row_failed = 'error' in merge_message
             elif not destination_match and candidate_match:
                 logger.error(f'ERROR: Destination subject id and title do not match for subject {destination_id}.')
                 print(f'ERROR: Destination subject id and title do not match for subject {destination_id}.')
@@ -154,6 +146,8 @@ def main(merge_subjects_csv):
             elif not destination_match and not candidate_match:
                 logger.error(f'ERROR: Destination and candidate subject ids and titles do not match for ids {destination_id} and {candidate_id}.')
                 print(f'ERROR: Destination and candidate subject ids and titles do not match for ids {destination_id} and {candidate_id}.')
+        progress.update(errors=int(row_failed))
+    progress.finish()
 
 # Call with `python merge_subjects.py <filename>.csv`
 if __name__ == "__main__":
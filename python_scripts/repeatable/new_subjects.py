@@ -1,5 +1,4 @@
 # This script creates new subjects in bulk from a csv
-import csv
 import os
 import sys
 
@@ -8,6 +7,7 @@ from asnake.client.web_client import ASnakeAuthError
 from dotenv import load_dotenv, find_dotenv
 from loguru import logger
 from pathlib import Path
+from python_scripts.utilities import ProgressReporter, count_csv_rows, read_validated_csv
 
 logger.remove()
 log_path = Path('./logs', 'new_subjects_{time:YYYY-MM-DD}.log')
@@ -17,6 +17,9 @@ logger.add(str(log_path), format="{time}-{level}: {message}")
 env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
 load_dotenv(env_file)
 
+# The columns of the csv and the types read_validated_csv() checks them against
+new_subjects_schema = {'new_title': 'text', 'new_scope_note': 'text?', 'new_EMu_ID': 'text'}
+
 def client_login(as_api, as_un, as_pw):
     """
     Login to the ArchivesSnake client and return client
@@ -40,24 +43,6 @@ def client_login(as_api, as_un, as_pw):
     else:
         return client
 
-def read_csv(new_subjects_csv):
-    """
-    Args:
-        new_subjects_csv (str): filepath for the subjects csv
-
-    Returns:
-        new_subjects (list): a list of new subjects and their metadata based on the csv contents
-    """
-    new_subjects = []
-    try:
-        open_csv = open(new_subjects_csv, 'r', encoding='UTF-8')
-        new_subjects = csv.DictReader(open_csv)
-    except IOError as csverror:
-        logger.error(f'ERROR reading csv file: {csverror}')
-        print(f'ERROR reading csv file: {csverror}')
-    else:
-        return new_subjects
-    
 def build_subject(subj):
     """
     Builds out the new subjects based on a mixture of csv content and hardcoded repository defaults.
@@ -125,11 +110,15 @@ def main(new_subjects_csv):
     Args:
         new_subjects_csv (str): filepath for the subjects csv
     """
+    new_subjects = read_validated_csv(new_subjects_csv, new_subjects_schema)
+    if new_subjects is None:
+        return
     client = client_login(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
-    new_subjects = read_csv(new_subjects_csv)
+    progress = ProgressReporter('new_subjects', count_csv_rows(new_subjects_csv))
     for subj in new_subjects:
         data = build_subject(subj)
-        create_subject(client, data)
+        progress.update(errors=int('error' in create_subject(client, data)))
+    progress.finish()
 
 # Call with `python new_subjects.py <filename>.csv`
 if __name__ == "__main__":
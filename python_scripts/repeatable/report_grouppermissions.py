@@ -4,17 +4,17 @@
 # marked with the text of that permission in the spreadsheet or if not, FALSE. This is to check to make sure permissions
 # are the same for each user group across all repositories.
 
-import mysql.connector as mysql
 import os
+import sys
 
 from datetime import date
 from dotenv import load_dotenv, find_dotenv
-from mysql.connector import errorcode
 from loguru import logger
-from openpyxl import Workbook
-from openpyxl.styles import Font
 from pathlib import Path
 
+sys.path.append(os.path.dirname('python_scripts'))  # Needed to import functions from utilities.py
+from python_scripts.utilities import ASpaceDatabase, record_error
+
 # Logging
 logger.remove()
 log_path = Path('../../logs', 'report_grouppermissions_{time:YYYY-MM-DD}.log')
@@ -24,83 +24,6 @@ logger.add(str(log_path), format="{time}-{level}: {message}")
 env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
 load_dotenv(env_file)
 
-class ASpaceDatabase:
-
-    def __init__(self, as_db_un, as_db_pw, as_db_host, as_db_name, as_db_port):
-        """
-        Handles the connection to and data retrieval from the ArchivesSpace database
-
-        Args:
-            as_db_un (str): the username for the account to connect to the ArchivesSpace database
-            as_db_pw (str): the password for the account to connect to the ArchivesSpace database
-            as_db_host (str): the hostname for the ArchivesSpace database
-            as_db_name (str): the name of the ArchivesSpace database
-            as_db_port (int): the port number of the ArchivesSpace database
-        """
-        self.aspace_username = as_db_un
-        self.aspace_password = as_db_pw
-        self.aspace_host = as_db_host
-        self.aspace_name = as_db_name
-        self.aspace_port = as_db_port
-        self.connection, self.cursor = self.connect_db()
-
-    def connect_db(self):
-        """
-        Connects to the ArchivesSpace test database with credentials provided in local secrets.py file
-
-        Returns:
-             test_connect (mysql.connection): The connection to the database
-             test_cursor (mysql.connection.cursor): The cursor of results for the database
-        """
-
-        try:
-            self.connection = mysql.connect(user=self.aspace_username,
-                                            password=self.aspace_password,
-                                            host=self.aspace_host,
-                                            database=self.aspace_name,
-                                            port=self.aspace_port)
-        except mysql.Error as error:
-            if error.errno == errorcode.ER_ACCESS_DENIED_ERROR:
-                record_error('connect_db() - Failed to authorize username/password', error)
-                raise error
-            elif error.errno == errorcode.ER_BAD_DB_ERROR:
-                record_error('connect_db() - Database does not exist', error)
-                raise error
-            else:
-                record_error('connect_db() - Other error when connecting to the database', error)
-                raise error
-        else:
-            self.cursor = self.connection.cursor()
-            return self.connection, self.cursor
-
-
-    def query_database(self, statement):
-        """
-        Runs a query on the database
-
-        Args:
-            statement (str): The MySQL statement to run against the database
-
-        Returns:
-            worksheet (openpysl.worksheet): An openpyxl worksheet class
-        """
-        try:
-            self.cursor.execute(statement)
-        except mysql.Error as error:
-            record_error('query_database() - SQL query was invalid', error)
-            raise error
-        else:
-            results = self.cursor.fetchall()
-        return results
-
-    def close_connection(self):
-        """
-        Closes the cursor and connection to the ArchivesSpace database
-        """
-        self.cursor.close()
-        self.connection.close()
-
-
 class Spreadsheet:
 
     def __init__(self, spreadsheet_filepath):
@@ -127,6 +50,8 @@ class Spreadsheet:
             wb (openpyxl.Workbook): The openpyxl workbook of the spreadsheet being generated for the data audit
             data_worksheet (str): The filepath of the data audit worksheet
         """
+        from openpyxl import Workbook
+
         wb = Workbook()
         try:
             wb.save(self.spreadsheet_filepath)
@@ -169,6 +94,8 @@ class Spreadsheet:
             cell_row (int): the minimum row to write to, max will not be supplied
             header (bool): if True, format the permission string with bold and underline
         """
+        from openpyxl.styles import Font
+
         # for row in worksheet.iter_cols(min_col=min_column, min_row=min_row):
         #     for cell in row:
         worksheet.cell(row=cell_row, column=cell_column).value=permission
@@ -177,24 +104,9 @@ class Spreadsheet:
         self.wb.save(self.spreadsheet_filepath)
 
 
-def record_error(message, status_input):
-    """
-    Prints and logs an error message and the code/parameters causing the error
-    Args:
-        message (str): message to prefix the error code
-        status_input (str, tuple, bool): error code or input parameters producing the error
-    """
-    try:
-        print(f'{message}: {status_input}')
-        logger.error(f'{message}: {status_input}')
-    except TypeError as input_error:
-        print(f'record_error() - Input is invalid for recording error: {input_error}')
-        logger.error(f'record_error() - Input is invalid for recording error: {input_error}')
-
-
 def main():
     aspace_db = ASpaceDatabase(os.getenv('DB_UN'), os.getenv('DB_PW'), os.getenv('DB_HOST'), os.getenv('DB_NAME'),
-                               int(os.getenv('DB_PORT')))
+                               int(os.getenv('DB_PORT')), cache_dir=os.getenv('query_cache_dir'))
     report_spreadsheet = Spreadsheet(str(Path('../../test_data',
                                               f'report_grouppermissions_{str(date.today())}.xlsx')))
     report_spreadsheet.wb.remove(report_spreadsheet.wb['Sheet'])
@@ -0,0 +1,282 @@
+#!/usr/bin/python3
+# This script rolls records back to the JSON saved in a jsonl backup written before a change, such as the backups of
+# delete_objects.py, update_refids.py, or update_coordinates.py. For each record in the backup, it fetches the record's
+# current lock_version from the API and posts the original JSON back over it. Records that have been deleted are only
+# recreated when --recreate is given, and get a new URI since ArchivesSpace does not reuse IDs. If a record was changed
+# again after the backup was taken (its lock_version moved on more than once), it is left alone as a conflict unless
+# --overwrite is given. Records are restored by several workers at once. Every outcome is written to a journal file, so
+# a restore that stops can be run again and will skip the records already restored. Use --uris to restore only the
+# records in a CSV with a uri column, which are looked up in the backup's index instead of reading the whole backup.
+import argparse
+import jsonlines
+import os
+import sys
+
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dotenv import load_dotenv, find_dotenv
+from loguru import logger
+
+sys.path.append(os.path.dirname('python_scripts'))  # Needed to import functions from utilities.py
+from python_scripts.utilities import (ASpaceAPI, BackupLookup, ProgressReporter, count_csv_rows, read_backup,
+                                      read_validated_csv, record_error, setup_logging)
+
+log_name = __file__.rsplit('/',1)[1].replace('.py', '')
+setup_logging(log_name)
+
+# Find  and load environment-specific .env file
+env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
+load_dotenv(env_file)
+
+# Journal statuses that mean a record needs no more work - conflicts and errors are tried again on the next run
+finished_statuses = ['restored', 'recreated', 'unchanged']
+
+# Fields ArchivesSpace sets itself, removed from the backup JSON before recreating a deleted record
+system_fields = ['uri', 'lock_version', 'system_mtime', 'user_mtime', 'create_time', 'created_by', 'last_modified_by']
+
+def parseArguments():
+    """Parses the arguments fed to the script from the terminal or within a run configuration"""
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("backupPath", help="path to the jsonl backup file to restore from", type=str)
+    parser.add_argument("-j", "--journal", help="path to the restore journal file, default is the backup path with "
+                                                ".restore.jsonl added", type=str)
+    parser.add_argument("-u", "--uris", help="path to a CSV with a uri column listing the only records to restore",
+                        type=str)
+    parser.add_argument("-w", "--workers", help="number of records to restore at once", type=int, default=4)
+    parser.add_argument("--recreate", help="recreate records that have been deleted", action='store_true')
+    parser.add_argument("--overwrite", help="restore records changed again since the backup was taken",
+                        action='store_true')
+    parser.add_argument("--log-level", help="lowest level written to the log", type=str, default='INFO',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    parser.add_argument("-q", "--quiet", help="only print errors and progress reports to the console",
+                        action='store_true')
+    parser.add_argument("-dR", "--dry-run", help="dry run?", action='store_true')
+    parser.add_argument("--version", action="version", version='%(prog)s - Version 1.0')
+
+    return parser.parse_args()
+
+
+def split_uri(object_uri):
+    """
+    Splits an object URI into the parts used by ASpaceAPI methods
+
+    Args:
+        object_uri (str): the object's URI, ex. /repositories/2/archival_objects/5 or /agents/people/5
+
+    Returns:
+        repo_uri (str): the repository URI, or an empty string for objects that do not belong to a repository
+        record_type (str): the type of the object, ex. archival_objects or agents/people
+        object_id (str): the object's ID
+    """
+    uri_parts = object_uri.strip('/').split('/')
+    if uri_parts[0] == 'repositories':
+        return f'/repositories/{uri_parts[1]}', '/'.join(uri_parts[2:-1]), uri_parts[-1]
+    return '', '/'.join(uri_parts[:-1]), uri_parts[-1]
+
+
+def restore_action(original_json, current_json, overwrite=False, recreate=False):
+    """
+    Decides how to restore a record from its backup
+
+    Args:
+        original_json (dict): the JSON data of the record saved in the backup
+        current_json (dict): the JSON data of the record in ArchivesSpace now, or None if it has been deleted
+        overwrite (bool): if True, restore records changed again since the backup was taken
+        recreate (bool): if True, recreate records that have been deleted
+
+    Returns:
+        action (str): 'restore' to post the original JSON over the record, 'recreate' to create it again, or the
+            journal status of a record that is left alone - 'unchanged', 'conflict', or 'deleted'
+    """
+    if current_json is None:
+        return 'recreate' if recreate else 'deleted'
+    original_version, current_version = original_json.get('lock_version'), current_json.get('lock_version')
+    if original_version is not None and current_version == original_version:
+        return 'unchanged'
+    if (original_version is not None and current_version is not None and current_version > original_version + 1
+            and not overwrite):
+        return 'conflict'
+    return 'restore'
+
+
+def fetch_current(local_aspace, object_uri):
+    """
+    Gets the current JSON data of an object, without logging an error if it has been deleted
+
+    Args:
+        local_aspace (ASpaceAPI): an instance of the ASpace API for connecting to the client
+        object_uri (str): the object's URI
+
+    Returns:
+        current_json (dict): the object's JSON data, or None if it does not exist
+    """
+    current_json = local_aspace.aspace_client.get(object_uri).json()
+    if 'error' in current_json:
+        return None
+    return current_json
+
+
+def restore_record(local_aspace, original_json, overwrite=False, recreate=False, dry_run=False):
+    """
+    Restores a single record from its backup
+
+    Args:
+        local_aspace (ASpaceAPI): an instance of the ASpace API for connecting to the client
+        original_json (dict): the JSON data of the record saved in the backup
+        overwrite (bool): if True, restore records changed again since the backup was taken, fetching the record
+            again and retrying once if it is changed between the GET and the POST
+        recreate (bool): if True, recreate records that have been deleted
+        dry_run (bool): if True, decide what would be done without posting anything to ArchivesSpace
+
+    Returns:
+        journal_entry (dict): the record's URI, status and the lock_version it was found at, plus the new URI of a
+            recreated record or the error message of a failed restore
+    """
+    object_uri = original_json['uri']
+    try:
+        current_json = fetch_current(local_aspace, object_uri)
+        action = restore_action(original_json, current_json, overwrite, recreate)
+        journal_entry = {'uri': object_uri, 'status': action,
+                         'lock_version': current_json.get('lock_version') if current_json else None}
+        if dry_run or action not in ('restore', 'recreate'):
+            return journal_entry
+        if action == 'restore':
+            restored_json = dict(original_json, lock_version=current_json['lock_version'])
+            update_message = local_aspace.update_object(object_uri, restored_json)
+            if update_message is None and local_aspace.last_status_code() == 409:
+                # The record was changed again between the GET and the POST, so it is only overwritten if asked to
+                if not overwrite:
+                    return dict(journal_entry, status='conflict')
+                current_json = fetch_current(local_aspace, object_uri)
+                if current_json is None:
+                    return dict(journal_entry, status='error')
+                journal_entry['lock_version'] = current_json.get('lock_version')
+                restored_json = dict(original_json, lock_version=current_json['lock_version'])
+                update_message = local_aspace.update_object(object_uri, restored_json)
+            if update_message is None:
+                return dict(journal_entry, status='error')
+            return dict(journal_entry, status='restored')
+        repo_uri, record_type, _ = split_uri(object_uri)
+        new_json = {key: value for key, value in original_json.items() if key not in system_fields}
+        create_message = local_aspace.create_object(record_type, new_json, repo_uri)
+        if create_message is None:
+            return dict(journal_entry, status='error')
+        return dict(journal_entry, status='recreated', new_uri=create_message.get('uri'))
+    except Exception as restore_error:
+        record_error(f'restore_record() - Unable to restore {object_uri}', restore_error)
+        return {'uri': object_uri, 'status': 'error', 'message': str(restore_error)}
+
+
+def read_journal(journal_path):
+    """
+    Gets the URIs of the records a previous run already finished with from the journal
+
+    Args:
+        journal_path (str): the path of the restore journal file
+
+    Returns:
+        finished_uris (set): the URIs with a journal status in finished_statuses
+    """
+    if not os.path.isfile(journal_path):
+        return set()
+    return {journal_entry['uri'] for journal_entry in read_backup(journal_path)
+            if journal_entry.get('status') in finished_statuses}
+
+
+def backup_records(backup_path, uri_rows=None):
+    """
+    Gets the records to restore from the backup. A record backed up more than once is only restored to its first
+    backup, which holds the record as it was before the first change
+
+    Args:
+        backup_path (str): the path of the jsonl backup file
+        uri_rows (iterable): the rows of a CSV with a uri column listing the only records to restore, with or without
+            a leading slash, default is None
+
+    Returns:
+        records (generator): yields the JSON data of each record to restore
+    """
+    if uri_rows is not None:
+        with BackupLookup(backup_path) as backup_lookup:
+            for uri_row in uri_rows:
+                # Backed up records have URIs with a leading slash, which the CSV's URIs may leave out
+                object_uri = f'/{uri_row["uri"].lstrip("/")}'
+                backup_entries = backup_lookup.index.get(object_uri)
+                if not backup_entries:
+                    record_error('backup_records() - URI not found in backup', object_uri)
+                    continue
+                yield backup_lookup.read_entry(backup_entries[0])
+        return
+    seen_uris = set()
+    for original_json in read_backup(backup_path):
+        if isinstance(original_json, dict) and 'uri' in original_json and original_json['uri'] not in seen_uris:
+            seen_uris.add(original_json['uri'])
+            yield original_json
+
+
+def main(backup_path, journal_path=None, uris_path=None, workers=4, recreate=False, overwrite=False, dry_run=False):
+    """
+    Restores the records in a jsonl backup to ArchivesSpace with several workers, writing each outcome to the journal
+
+    Args:
+        backup_path (str): the path of the jsonl backup file
+        journal_path (str): the path of the restore journal file, default is the backup path with .restore.jsonl added
+        uris_path (str): the path of a CSV with a uri column listing the only records to restore, default is None
+        workers (int): the number of records to restore at once, default is 4
+        recreate (bool): if True, recreate records that have been deleted
+        overwrite (bool): if True, restore records changed again since the backup was taken
+        dry_run (bool): if True, write what would be done to the journal without posting anything to ArchivesSpace
+    """
+    uri_rows = None
+    if uris_path:
+        uri_rows = read_validated_csv(uris_path, {'uri': 'uri'})
+        if uri_rows is None:
+            return
+    journal_path = journal_path or f'{backup_path}.restore.jsonl'
+    finished_uris = read_journal(journal_path)
+    local_aspace = ASpaceAPI(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
+    status_counts = Counter()
+    progress = ProgressReporter('Restore', count_csv_rows(uris_path) if uris_path else None)
+
+    def record_outcome(journal_entry):
+        status_counts[journal_entry['status']] += 1
+        if not dry_run:
+            journal_writer.write(journal_entry)
+        logger.info(journal_entry)
+        progress.update(errors=int(journal_entry['status'] == 'error'))
+
+    # Only a few records per worker are waiting at a time, so the backup is read as the restore goes
+    with jsonlines.open(journal_path, mode='a', flush=True) as journal_writer, \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for original_json in backup_records(backup_path, uri_rows):
+            if original_json['uri'] in finished_uris:
+                status_counts['already finished'] += 1
+                progress.update()
+                continue
+            pending.add(executor.submit(restore_record, local_aspace, original_json, overwrite, recreate, dry_run))
+            if len(pending) >= workers * 4:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record_outcome(future.result())
+        for future in wait(pending).done:
+            record_outcome(future.result())
+    progress.finish(dict(status_counts))
+
+
+# Call with `python restore_from_backup.py <backup_filepath>.jsonl --recreate`
+if __name__ == '__main__':
+    args = parseArguments()
+    setup_logging(log_name, level=args.log_level, quiet=args.quiet)
+
+    # Print arguments
+    logger.info(f'Running {sys.argv[0]} script with following arguments: ')
+    print(f'Running {sys.argv[0]} script with following arguments: ')
+    for arg in args.__dict__:
+        logger.info(str(arg) + ": " + str(args.__dict__[arg]))
+        print(str(arg) + ": " + str(args.__dict__[arg]))
+
+    # Run function
+    main(backup_path=args.backupPath, journal_path=args.journal, uris_path=args.uris, workers=args.workers,
+         recreate=args.recreate, overwrite=args.overwrite, dry_run=args.dry_run)
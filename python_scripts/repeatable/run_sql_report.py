@@ -0,0 +1,230 @@
+#!/usr/bin/python3
+# This script runs one or more of the SQL files in sql_scripts against the ArchivesSpace database and streams the
+# results into a CSV, XLSX, or Parquet file per SQL file in the given output directory. Named parameters in the SQL files
+# are written as :parameter_name (ex. ao.repo_id = :repo_id) and given values with --param, for example:
+# `python run_sql_report.py ../../sql_scripts/report_cfchlinkedagents.sql ./reports -p repo_id=21`
+# Values with commas are expanded into lists for IN clauses (ex. -p excluded_repo_ids=11,23,50,52). Rows are read from
+# the database in batches with a server-side cursor and written as they arrive, so the result set is never held in
+# memory. The time taken by each query is logged.
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+
+from dotenv import load_dotenv, find_dotenv
+from loguru import logger
+from pathlib import Path
+
+sys.path.append(os.path.dirname('python_scripts'))  # Needed to import functions from utilities.py
+from python_scripts.utilities import ASpaceDatabase, record_error, write_to_parquet
+
+logger.remove()
+log_name = __file__.rsplit('/',1)[1].replace('.py', '')+'_{time:YYYY-MM-DD}'
+log_path = Path(f'./logs/{log_name}.log')
+logger.add(str(log_path), format="{time}-{level}: {message}")
+
+# Find  and load environment-specific .env file
+env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
+load_dotenv(env_file)
+
+named_parameter = re.compile(r'(?<![:\w]):([A-Za-z_]\w*)')
+
+def parseArguments():
+    """Parses the arguments fed to the script from the terminal or within a run configuration"""
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("sqlPaths", help="path(s) to the SQL file(s) to run", type=str, nargs='+')
+    parser.add_argument("outputDir", help="path to the directory where the report files should be saved", type=str)
+    parser.add_argument("-f", "--format", help="output file format", choices=['csv', 'xlsx', 'parquet'],
+                        default='csv')
+    parser.add_argument("-p", "--param", help="named parameter as name=value, can be used more than once",
+                        action='append', default=[])
+    parser.add_argument("-b", "--batch-size", help="number of rows to read from the database at a time", type=int,
+                        default=1000)
+    parser.add_argument("--version", action="version", version='%(prog)s - Version 1.0')
+
+    return parser.parse_args()
+
+
+def parse_parameters(param_args):
+    """
+    Turns the name=value parameters given on the command line into a dictionary, splitting values containing commas
+    into lists and converting whole numbers to integers
+
+    Args:
+        param_args (list): the parameters as name=value strings
+
+    Returns:
+        parameters (dict): parameter name as key and the parameter value (int, str, or list) as value
+    """
+    parameters = {}
+    for param_arg in param_args:
+        name, separator, value = param_arg.partition('=')
+        if not separator or not name:
+            record_error('parse_parameters() - parameter is not formatted as name=value', param_arg)
+            raise ValueError(param_arg)
+        values = [int(item) if item.strip().lstrip('-').isdigit() else item.strip() for item in value.split(',')]
+        parameters[name.strip()] = values if ',' in value else values[0]
+    return parameters
+
+
+def bind_parameters(sql, parameters):
+    """
+    Replaces the :parameter_name placeholders in an SQL statement with MySQL connector placeholders, expanding list
+    parameters into one placeholder per value
+
+    Args:
+        sql (str): the SQL statement with :parameter_name placeholders
+        parameters (dict): parameter name as key and the parameter value as value
+
+    Returns:
+        statement (str): the SQL statement with %(parameter_name)s placeholders, or the SQL unchanged if it has no
+            placeholders
+        bound_parameters (dict): the values for each placeholder in the statement, or None if it has no placeholders
+    """
+    if not named_parameter.search(sql):
+        return sql, None
+    bound_parameters = {}
+
+    def placeholder(match):
+        name = match.group(1)
+        if name not in parameters:
+            record_error('bind_parameters() - no value given for SQL parameter', name)
+            raise KeyError(name)
+        if isinstance(parameters[name], list):
+            list_placeholders = []
+            for index, value in enumerate(parameters[name]):
+                bound_parameters[f'{name}_{index}'] = value
+                list_placeholders.append(f'%({name}_{index})s')
+            return ', '.join(list_placeholders)
+        bound_parameters[name] = parameters[name]
+        return f'%({name})s'
+
+    statement = named_parameter.sub(placeholder, sql.replace('%', '%%'))
+    return statement, bound_parameters
+
+
+def write_csv(output_file, column_names, row_batches):
+    """
+    Writes the query results to a CSV file batch by batch
+
+    Args:
+        output_file (str): the filepath of the CSV file
+        column_names (list): the column names of the results, written as the header row
+        row_batches (generator): the results as lists of tuples
+
+    Returns:
+        row_count (int): the number of rows written
+    """
+    row_count = 0
+    with open(output_file, 'w', encoding='UTF-8', newline='') as report_file:
+        report_writer = csv.writer(report_file)
+        report_writer.writerow(column_names)
+        for rows in row_batches:
+            report_writer.writerows(rows)
+            row_count += len(rows)
+    return row_count
+
+
+def write_xlsx(output_file, column_names, row_batches):
+    """
+    Writes the query results to a spreadsheet using openpyxl's write-only mode, which streams rows to disk
+
+    Args:
+        output_file (str): the filepath of the spreadsheet
+        column_names (list): the column names of the results, written as the header row
+        row_batches (generator): the results as lists of tuples
+
+    Returns:
+        row_count (int): the number of rows written
+    """
+    from openpyxl import Workbook
+
+    row_count = 0
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(Path(output_file).stem[:31])
+    worksheet.append(column_names)
+    for rows in row_batches:
+        for row in rows:
+            worksheet.append(row)
+        row_count += len(rows)
+    workbook.save(output_file)
+    return row_count
+
+
+report_writers = {
+    'csv': write_csv,
+    'xlsx': write_xlsx,
+    'parquet': write_to_parquet
+}
+
+
+def run_report(as_database, sql_path, output_dir, output_format='csv', parameters=None, batch_size=1000):
+    """
+    Runs the SQL file against the database and streams the results into a report file named after the SQL file
+
+    Args:
+        as_database (ASpaceDatabase): the connection to the ArchivesSpace database
+        sql_path (str): filepath of the SQL file to run
+        output_dir (str): path to the directory where the report file should be saved
+        output_format (str): csv, xlsx, or parquet, default is csv
+        parameters (dict): parameter name as key and the parameter value as value, default is None
+        batch_size (int): the number of rows to read from the database at a time, default is 1000
+
+    Returns:
+        output_file (str): the filepath of the report file
+    """
+    with open(sql_path, 'r', encoding='UTF-8') as sql_file:
+        sql = '\n'.join(line for line in sql_file.read().splitlines()
+                        if not line.strip().startswith('--')).strip().rstrip(';')
+    statement, bound_parameters = bind_parameters(sql, parameters or {})
+    output_file = str(Path(output_dir, f'{Path(sql_path).stem}.{output_format}'))
+    start_time = time.perf_counter()
+    column_names, row_batches = as_database.stream_query(statement, bound_parameters, batch_size)
+    query_time = time.perf_counter() - start_time
+    row_count = report_writers[output_format](output_file, column_names, row_batches)
+    total_time = time.perf_counter() - start_time
+    logger.info(f'{sql_path}: {row_count} rows written to {output_file} - query {query_time:.2f}s, '
+                f'total {total_time:.2f}s')
+    print(f'{sql_path}: {row_count} rows written to {output_file} - query {query_time:.2f}s, total {total_time:.2f}s')
+    return output_file
+
+
+def main(sql_paths, output_dir, output_format='csv', param_args=(), batch_size=1000):
+    """
+    Runs each of the SQL files against the ArchivesSpace database and writes each one's results to a report file
+
+    Args:
+        sql_paths (list): filepaths of the SQL files to run
+        output_dir (str): path to the directory where the report files should be saved
+        output_format (str): csv, xlsx, or parquet, default is csv
+        param_args (list): the named parameters as name=value strings
+        batch_size (int): the number of rows to read from the database at a time, default is 1000
+    """
+    parameters = parse_parameters(param_args)
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    as_database = ASpaceDatabase(os.getenv('db_un'), os.getenv('db_pw'), os.getenv('db_host'), os.getenv('db_name'),
+                                 os.getenv('db_port'))
+    try:
+        for sql_path in sql_paths:
+            run_report(as_database, sql_path, output_dir, output_format, parameters, batch_size)
+    finally:
+        as_database.close_connection()
+
+
+# Call with `python run_sql_report.py <sql_filepath>.sql [<sql_filepath>.sql ...] <output_dir> -p <name>=<value>`
+if __name__ == '__main__':
+    args = parseArguments()
+
+    # Print arguments
+    logger.info(f'Running {sys.argv[0]} script with following arguments: ')
+    print(f'Running {sys.argv[0]} script with following arguments: ')
+    for arg in args.__dict__:
+        logger.info(str(arg) + ": " + str(args.__dict__[arg]))
+        print(str(arg) + ": " + str(args.__dict__[arg]))
+
+    # Run function
+    main(sql_paths=args.sqlPaths, output_dir=args.outputDir, output_format=args.format, param_args=args.param,
+         batch_size=args.batch_size)
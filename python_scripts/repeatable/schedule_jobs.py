@@ -0,0 +1,233 @@
+#!/usr/bin/python3
+# This script runs several batch jobs at once against a single ArchivesSpace, such as a suppress_objects job and an
+# update_refids job queued at the same time. Instead of each script logging in on its own and competing for the API,
+# the jobs share one session and its connection pool, a limit on the API calls in flight across all jobs, and an
+# optional rate limit. Each job gets a share of the calls in flight in proportion to its priority, and a job running
+# alone can use all of them. The jobs are listed in a JSON file, for example:
+# [{"script": "suppress_objects", "csv": "suppress.csv", "priority": 2, "args": {"repo_id": 2}},
+#  {"script": "update_refids", "csv": "refids.csv", "backup": "refids_original_data.jsonl"}]
+# Each job can also have a "name", needed when a script is listed more than once, and a number of "workers". Every
+# job writes a progress journal next to its CSV, so a stopped schedule can be run again with --resume.
+import argparse
+import json
+import os
+import sys
+
+from contextlib import ExitStack
+from dotenv import load_dotenv, find_dotenv
+from functools import partial
+from loguru import logger
+from pathlib import Path
+from requests.adapters import HTTPAdapter
+
+sys.path.append(os.path.dirname('python_scripts'))  # Needed to import functions from utilities.py
+from python_scripts.batch_jobs import JobScheduler
+from python_scripts.repeatable.strip_whitespace import (group_record_rows, record_row_count, strip_record,
+                                                       whitespace_schema)
+from python_scripts.repeatable.suppress_objects import object_uri, suppress_object, unpublish_object
+from python_scripts.repeatable.update_fileuri import digital_object_uri, update_file_uri
+from python_scripts.repeatable.update_locationrepo import add_repo
+from python_scripts.repeatable.update_refids import regenerate_refid
+from python_scripts.repeatable.update_subjects import build_subject, subject_uri, updated_subjects_schema
+from python_scripts.utilities import (ASpaceAPI, ChangeLedger, OutcomeLog, ProgressJournal, read_csv,
+                                      read_validated_csv, record_error, setup_logging)
+
+log_name = __file__.rsplit('/',1)[1].replace('.py', '')
+setup_logging(log_name)
+
+# Find  and load environment-specific .env file
+env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
+load_dotenv(env_file)
+
+def parseArguments():
+    """Parses the arguments fed to the script from the terminal or within a run configuration"""
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("jobsPath", help="path to the JSON file listing the jobs to run", type=str)
+    parser.add_argument("-m", "--max-in-flight", help="number of API calls allowed at once across all jobs",
+                        type=int, default=8)
+    parser.add_argument("-r", "--requests-per-second", help="most API calls started each second across all jobs",
+                        type=float)
+    parser.add_argument("-l", "--ledger", help="path to the ledger of applied changes, rows whose change it has as "
+                                               "applied are skipped", type=str)
+    parser.add_argument("--resume", help="skip the rows a previous run of each job finished", action='store_true')
+    parser.add_argument("-o", "--outcome-log", help="path to a JSON lines log of each row's outcome, for "
+                                                    "summarize_outcomes.py", type=str)
+    parser.add_argument("--log-level", help="lowest level written to the log", type=str, default='INFO',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    parser.add_argument("-q", "--quiet", help="only print errors and progress reports to the console",
+                        action='store_true')
+    parser.add_argument("-dR", "--dry-run", help="dry run?", action='store_true')
+    parser.add_argument("--version", action="version", version='%(prog)s - Version 1.0')
+
+    return parser.parse_args()
+
+
+def suppress_objects_job(csv_location, repo_id=None, object_type=None):
+    """
+    Gets the input rows and BatchJob arguments of a suppress_objects.py job
+
+    Args:
+        csv_location (str): filepath of the CSV containing the object URIs or URLs in a URL column
+        repo_id (int): repository ID if the CSV does not contain the repository ID within the object URI
+        object_type (str): the type of object if the CSV does not contain it within the object URI
+
+    Returns:
+        rows (list): the input rows, or None if the CSV could not be read
+        job_options (dict): the BatchJob arguments of the job
+    """
+    return read_csv(str(Path(os.getcwd(), csv_location))), {
+        'transform': unpublish_object, 'row_uri': partial(object_uri, repo_id=repo_id, object_type=object_type),
+        'after_post': suppress_object, 'change_parameters': {'repo_id': repo_id, 'object_type': object_type}}
+
+
+def update_refids_job(csv_location):
+    """
+    Gets the input rows and BatchJob arguments of an update_refids.py job
+
+    Args:
+        csv_location (str): filepath of the CSV with the archival object URIs in a uri column
+
+    Returns:
+        rows (list): the input rows, or None if the CSV is invalid
+        job_options (dict): the BatchJob arguments of the job
+    """
+    return read_validated_csv(csv_location, {'uri': 'uri'}), {'transform': regenerate_refid}
+
+
+def update_locationrepo_job(csv_location, repo_id):
+    """
+    Gets the input rows and BatchJob arguments of an update_locationrepo.py job
+
+    Args:
+        csv_location (str): filepath of the CSV containing the location URIs in a uri column
+        repo_id (int): the repository identifier number to add to the location JSON data
+
+    Returns:
+        rows (list): the input rows, or None if the CSV could not be read
+        job_options (dict): the BatchJob arguments of the job
+    """
+    return read_csv(str(Path(os.getcwd(), csv_location))), {
+        'transform': lambda location_data, row: add_repo(location_data, repo_id),
+        'change_parameters': {'repo_id': repo_id}}
+
+
+def update_fileuri_job(csv_location):
+    """
+    Gets the input rows and BatchJob arguments of an update_fileuri.py job
+
+    Args:
+        csv_location (str): filepath of the CSV with the repo_id, digital_object_id and updated_file_uri of each digital
+            object
+
+    Returns:
+        rows (list): the input rows, or None if the CSV could not be read
+        job_options (dict): the BatchJob arguments of the job
+    """
+    return read_csv(csv_location), {'transform': update_file_uri, 'row_uri': digital_object_uri}
+
+
+def update_subjects_job(csv_location):
+    """
+    Gets the input rows and BatchJob arguments of an update_subjects.py job
+
+    Args:
+        csv_location (str): filepath of the CSV with the aspace_subject_id, new_title, new_scope_note and new_EMu_ID of
+            each subject
+
+    Returns:
+        rows (iterable): the input rows, or None if the CSV is invalid
+        job_options (dict): the BatchJob arguments of the job
+    """
+    return (read_validated_csv(csv_location, updated_subjects_schema),
+            {'transform': build_subject, 'row_uri': subject_uri})
+
+
+def strip_whitespace_job(csv_location, object_type):
+    """
+    Gets the input rows and BatchJob arguments of a strip_whitespace.py job, with the CSV rows for the same record
+    grouped into one input row
+
+    Args:
+        csv_location (str): filepath of the CSV with the id, repo_id, field_1 and field_2 of each field to strip
+        object_type (str): the type of ArchivesSpace object, such as archival_objects or resources
+
+    Returns:
+        rows (iterable): the input rows, or None if the CSV is invalid
+        job_options (dict): the BatchJob arguments of the job
+    """
+    rows = read_validated_csv(csv_location, whitespace_schema)
+    if rows is not None:
+        rows = group_record_rows(rows, object_type)
+    return rows, {'transform': strip_record, 'row_weight': record_row_count,
+                  'change_parameters': {'object_type': object_type}}
+
+
+# The scripts that can be scheduled, each with a function returning a job's input rows and BatchJob arguments
+scheduled_scripts = {'suppress_objects': suppress_objects_job,
+                     'update_refids': update_refids_job,
+                     'update_locationrepo': update_locationrepo_job,
+                     'update_fileuri': update_fileuri_job,
+                     'update_subjects': update_subjects_job,
+                     'strip_whitespace': strip_whitespace_job}
+
+
+def main(jobs_path, max_in_flight=8, requests_per_second=None, ledger_path=None, resume=False, dry_run=False,
+         outcome_path=None):
+    """
+    Runs the jobs listed in a JSON file at once, sharing one ArchivesSpace session and budget of API calls
+
+    Args:
+        jobs_path (str): filepath of the JSON file listing the jobs, each with a script, csv, and optional name,
+            priority, workers, backup and args
+        max_in_flight (int): the number of API calls allowed at once across all jobs, default is 8
+        requests_per_second (float): the most API calls started each second, default is None (no limit)
+        ledger_path (str): filepath of the ledger of applied changes, default is None (no ledger)
+        resume (bool): if True, skip the rows each job's journal has as finished by a previous run
+        dry_run (bool): if True, print the changes each job would make without posting them
+        outcome_path (str): filepath of the JSON lines log of the outcome of every job's rows, default is None (no
+            outcome log)
+
+    Returns:
+        job_counts (dict): the status counts of each job, by job name, or None if the jobs could not be set up
+    """
+    with open(jobs_path, 'r', encoding='UTF-8') as jobs_file:
+        job_definitions = json.load(jobs_file)
+    unknown_scripts = [job['script'] for job in job_definitions if job['script'] not in scheduled_scripts]
+    if unknown_scripts:
+        record_error(f'main() - Scripts cannot be scheduled, use one of {list(scheduled_scripts)}', unknown_scripts)
+        return None
+    local_aspace = ASpaceAPI(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
+    local_aspace.aspace_client.session.mount(os.getenv('as_api'), HTTPAdapter(pool_maxsize=max_in_flight))
+    scheduler = JobScheduler(local_aspace, max_in_flight, requests_per_second)
+    with ExitStack() as job_files:
+        ledger = job_files.enter_context(ChangeLedger(ledger_path, os.getenv('as_api'))) if ledger_path else None
+        outcome_log = job_files.enter_context(OutcomeLog(outcome_path)) if outcome_path else None
+        for job in job_definitions:
+            rows, job_options = scheduled_scripts[job['script']](job['csv'], **job.get('args', {}))
+            if rows is None:
+                return None
+            journal = job_files.enter_context(ProgressJournal(f'{job["csv"]}.progress.sqlite', resume))
+            if scheduler.add(job.get('name', job['script']), rows=rows, priority=job.get('priority', 1),
+                             backup_path=job.get('backup'), fetch_workers=job.get('workers', 4),
+                             post_workers=job.get('workers', 4), dry_run=dry_run, journal=journal, ledger=ledger,
+                             outcome_log=outcome_log, **job_options) is None:
+                return None
+        return scheduler.run()
+
+
+# Call with `python schedule_jobs.py <jobs_filepath>.json -m 8 -r 20`
+if __name__ == '__main__':
+    args = parseArguments()
+    setup_logging(log_name, level=args.log_level, quiet=args.quiet)
+
+    # Print arguments
+    logger.info(f'Running {sys.argv[0]} script with following arguments: ')
+    print(f'Running {sys.argv[0]} script with following arguments: ')
+    for arg in args.__dict__:
+        logger.info(str(arg) + ": " + str(args.__dict__[arg]))
+        print(str(arg) + ": " + str(args.__dict__[arg]))
+
+    # Run function
+    main(jobs_path=args.jobsPath, max_in_flight=args.max_in_flight, requests_per_second=args.requests_per_second,
+         ledger_path=args.ledger, resume=args.resume, dry_run=args.dry_run, outcome_path=args.outcome_log)
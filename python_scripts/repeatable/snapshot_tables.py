@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+# This script exports selected tables from the ArchivesSpace database into local Parquet files (one per table) or a
+# single DuckDB database file, so reports can run against the local copy with pandas or DuckDB instead of querying the
+# production database. Each table is read with a server-side cursor in batches and written as it arrives. A
+# snapshot_manifest.json file records when each table was exported and how many rows it had. Load a Parquet table for a
+# report with utilities.load_snapshot_table(<output_dir>, <table_name>).
+import argparse
+import json
+import os
+import sys
+import time
+
+from datetime import datetime
+from dotenv import load_dotenv, find_dotenv
+from loguru import logger
+from pathlib import Path
+
+sys.path.append(os.path.dirname('python_scripts'))  # Needed to import functions from utilities.py
+from python_scripts.utilities import ASpaceDatabase, arrow_batches, record_error, write_to_parquet
+
+logger.remove()
+log_name = __file__.rsplit('/',1)[1].replace('.py', '')+'_{time:YYYY-MM-DD}'
+log_path = Path(f'./logs/{log_name}.log')
+logger.add(str(log_path), format="{time}-{level}: {message}")
+
+# Find  and load environment-specific .env file
+env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
+load_dotenv(env_file)
+
+default_tables = ['repository', 'resource', 'archival_object', 'digital_object', 'instance', 'instance_do_link_rlshp',
+                  'sub_container', 'top_container', 'top_container_link_rlshp', 'enumeration', 'enumeration_value',
+                  'location', 'date', 'extent']
+
+def parseArguments():
+    """Parses the arguments fed to the script from the terminal or within a run configuration"""
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("outputDir", help="path to the directory where the snapshot should be saved", type=str)
+    parser.add_argument("-t", "--tables", help="the database tables to export", nargs='+', default=default_tables)
+    parser.add_argument("-f", "--format", help="snapshot file format", choices=['parquet', 'duckdb'],
+                        default='parquet')
+    parser.add_argument("-b", "--batch-size", help="number of rows to read from the database at a time", type=int,
+                        default=10000)
+    parser.add_argument("--version", action="version", version='%(prog)s - Version 1.0')
+
+    return parser.parse_args()
+
+
+def write_to_duckdb(database_file, table_name, column_names, row_batches):
+    """
+    Replaces a table in a DuckDB database file with batches of query results
+
+    Args:
+        database_file (str): the path of the DuckDB database file
+        table_name (str): the name of the table to replace
+        column_names (list): the column names of the results
+        row_batches (generator): the results as lists of tuples
+
+    Returns:
+        row_count (int): the number of rows written
+    """
+    import duckdb
+
+    row_count = 0
+    duckdb_connection = duckdb.connect(database_file)
+    try:
+        duckdb_connection.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        for batch_table in arrow_batches(column_names, row_batches):
+            duckdb_connection.register('batch_table', batch_table)
+            if row_count == 0:
+                duckdb_connection.execute(f'CREATE TABLE "{table_name}" AS SELECT * FROM batch_table')
+            else:
+                duckdb_connection.execute(f'INSERT INTO "{table_name}" SELECT * FROM batch_table')
+            duckdb_connection.unregister('batch_table')
+            row_count += batch_table.num_rows
+    finally:
+        duckdb_connection.close()
+    return row_count
+
+
+def snapshot_table(as_database, table_name, output_dir, output_format='parquet', batch_size=10000):
+    """
+    Exports a single database table into the snapshot. Parquet files are written under a temporary name and renamed
+    when complete, so a failed export never replaces the previous snapshot of the table
+
+    Args:
+        as_database (ASpaceDatabase): the connection to the ArchivesSpace database
+        table_name (str): the name of the table to export
+        output_dir (str): path to the snapshot directory
+        output_format (str): parquet or duckdb, default is parquet
+        batch_size (int): the number of rows to read from the database at a time, default is 10000
+
+    Returns:
+        table_info (dict): the table's row count, export time and the seconds the export took
+    """
+    start_time = time.perf_counter()
+    snapshot_time = datetime.now().isoformat(timespec='seconds')
+    column_names, row_batches = as_database.stream_query(f'SELECT * FROM `{table_name}`', batch_size=batch_size)
+    if output_format == 'duckdb':
+        row_count = write_to_duckdb(str(Path(output_dir, 'aspace_snapshot.duckdb')), table_name, column_names,
+                                    row_batches)
+    else:
+        table_file = Path(output_dir, f'{table_name}.parquet')
+        temp_file = Path(output_dir, f'{table_name}.parquet.tmp')
+        row_count = write_to_parquet(str(temp_file), column_names, row_batches)
+        temp_file.replace(table_file)
+    table_info = {'rows': row_count, 'snapshot_time': snapshot_time,
+                  'seconds': round(time.perf_counter() - start_time, 2)}
+    logger.info(f'{table_name}: {table_info}')
+    print(f'{table_name}: {table_info}')
+    return table_info
+
+
+def main(output_dir, tables=default_tables, output_format='parquet', batch_size=10000):
+    """
+    Exports each of the given tables from the ArchivesSpace database into the snapshot directory and updates the
+    snapshot manifest
+
+    Args:
+        output_dir (str): path to the directory where the snapshot should be saved
+        tables (list): the database tables to export
+        output_format (str): parquet or duckdb, default is parquet
+        batch_size (int): the number of rows to read from the database at a time, default is 10000
+    """
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    manifest_path = Path(output_dir, 'snapshot_manifest.json')
+    manifest = {}
+    if manifest_path.exists():
+        with open(manifest_path, 'r', encoding='UTF-8') as manifest_file:
+            manifest = json.load(manifest_file)
+    as_database = ASpaceDatabase(os.getenv('db_un'), os.getenv('db_pw'), os.getenv('db_host'), os.getenv('db_name'),
+                                 os.getenv('db_port'))
+    try:
+        for table_name in tables:
+            try:
+                manifest[table_name] = snapshot_table(as_database, table_name, output_dir, output_format, batch_size)
+            except Exception as snapshot_error:
+                record_error(f'main() - Unable to snapshot table {table_name}', snapshot_error)
+    finally:
+        as_database.close_connection()
+        with open(manifest_path, 'w', encoding='UTF-8') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+
+
+# Call with `python snapshot_tables.py <output_dir>` or `python snapshot_tables.py <output_dir> -t resource location`
+if __name__ == '__main__':
+    args = parseArguments()
+
+    # Print arguments
+    logger.info(f'Running {sys.argv[0]} script with following arguments: ')
+    print(f'Running {sys.argv[0]} script with following arguments: ')
+    for arg in args.__dict__:
+        logger.info(str(arg) + ": " + str(args.__dict__[arg]))
+        print(str(arg) + ": " + str(args.__dict__[arg]))
+
+    # Run function
+    main(output_dir=args.outputDir, tables=args.tables, output_format=args.format, batch_size=args.batch_size)
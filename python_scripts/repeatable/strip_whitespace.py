@@ -7,11 +7,12 @@ import argparse
 import os
 import sys
 
-from asnake.aspace import ASpace
+from copy import deepcopy
 from dotenv import load_dotenv, find_dotenv
 from loguru import logger
 from pathlib import Path
-from python_scripts.utilities import read_csv, record_error
+from python_scripts.batch_jobs import BatchJob
+from python_scripts.utilities import ASpaceAPI, count_csv_rows, group_rows, read_validated_csv, record_error
 
 # Logging
 logger.remove()
@@ -23,24 +24,19 @@ logger.add(str(log_path), format="{time}-{level}: {message}")
 env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
 load_dotenv(env_file)
 
-# Define functions
-def archival_objects(repo): return repo.archival_objects
-def digital_objects(repo): return repo.digital_objects
-def resources(repo): return repo.resources
+# The types of ArchivesSpace object the script can update
+object_types = ['archival_objects', 'digital_objects', 'resources']
 
-# Create a dictionary to map arguments to functions
-func_dict = {
-    "archival_objects": archival_objects,
-    "digital_objects": digital_objects,
-    "resources": resources
-}
+# The columns of the csv and the types read_validated_csv() checks them against
+whitespace_schema = {'id': 'int', 'repo_id': 'int', 'field_1': 'text', 'field_2': 'text?'}
 
 def parseArguments():
     parser = argparse.ArgumentParser()
 
     parser.add_argument("csvPath", help="path to csv input file", type=str)
     parser.add_argument("-dR", "--dry-run", help="dry run?", action='store_true')
-    parser.add_argument("-t", "--type", help="type of ArchivesSpace object", choices=func_dict.keys(), required='true')
+    parser.add_argument("-t", "--type", help="type of ArchivesSpace object", choices=object_types, required='true')
+    parser.add_argument("-w", "--workers", help="number of records to fetch and post at once", type=int, default=4)
     parser.add_argument("--version", action="version", version='%(prog)s - Version 1.0')
 
     return parser.parse_args()
@@ -74,7 +70,53 @@ def strip_whitespace(json_object, field_1, field_2):
         record_error(f'Field `{field_1}` does not exist in JSON data: ',
                      json_object)
 
-def main(whitespace_csv, dry_run):
+def strip_record(json_object, record_rows):
+    """
+    Strips whitespace from every field the csv lists for a record
+
+    Args:
+        json_object (dict): json object from ArchivesSpace
+        record_rows (dict): the record's uri and its csv rows, each with a field_1 and field_2
+
+    Returns:
+        updated_object (dict): a copy of the json object with the whitespace stripped, or None if none of the fields
+        exist
+    """
+    json_object = deepcopy(json_object)
+    updated_object = None
+    for object_row in record_rows['rows']:
+        updated_object = strip_whitespace(json_object, object_row['field_1'], object_row['field_2']) or updated_object
+    return updated_object
+
+def group_record_rows(whitespace_rows, object_type):
+    """
+    Groups the csv rows by the record they update, so the record is fetched once, stripped for every row, and posted
+    once
+
+    Args:
+        whitespace_rows (iterable): the csv rows, each with an id, repo_id, field_1 and field_2
+        object_type (str): the type of ArchivesSpace object, one of object_types
+
+    Returns:
+        records (generator): yields the uri and csv rows of each record
+    """
+    for _, object_rows in group_rows(whitespace_rows, lambda obj: f'{obj["repo_id"]}/{obj["id"]}'):
+        yield {'uri': f'/repositories/{object_rows[0]["repo_id"]}/{object_type}/{object_rows[0]["id"]}',
+               'rows': object_rows}
+
+def record_row_count(record_rows):
+    """
+    Gets the number of csv rows grouped for a record, for progress reports
+
+    Args:
+        record_rows (dict): the record's uri and its csv rows
+
+    Returns:
+        row_count (int): the number of csv rows
+    """
+    return len(record_rows['rows'])
+
+def main(whitespace_csv, dry_run, object_type, workers=4):
     """
     Runs the functions of the script, fetching, digging into, and stripping whitespace from a
     specified record type and field, printing error messages if they occur.
@@ -93,41 +135,17 @@ def main(whitespace_csv, dry_run):
     Args:
         whitespace_csv (str): filepath for the csv
         dry_run (bool): run as non-destructive dry run?  True if `--dry-run` provided as an argument
+        object_type (str): the type of ArchivesSpace object, one of object_types
+        workers (int): the number of records to fetch and post at once, default is 4
     """
+    csv_dict = read_validated_csv(whitespace_csv, whitespace_schema)
+    if csv_dict is None:
+        return None
+    local_aspace = ASpaceAPI(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
+    BatchJob(local_aspace, strip_record, fetch_workers=workers, post_workers=workers, dry_run=dry_run,
+             name='strip_whitespace', row_weight=record_row_count
+             ).run(group_record_rows(csv_dict, object_type), count_csv_rows(whitespace_csv))
 
-    aspace = ASpace(
-        baseurl=os.getenv('as_api'),
-        username=os.getenv('as_un'),
-        password=os.getenv('as_pw')
-    )
-    csv_dict = read_csv(whitespace_csv)
-    for obj in csv_dict:
-        repo = aspace.repositories(obj['repo_id'])
-        existing_object = func_dict[args.type](repo)(obj['id'])
-        if isinstance(existing_object, dict) and 'error' in existing_object:
-            record_error(f'Unable to retrieve object with provided URI: '
-                         f'repositories/{obj["repo_id"]}/{args.type}/{obj["id"]}',
-                         existing_object)
-            return None
-        elif existing_object is not None:
-            json_object = existing_object.json()
-            data = strip_whitespace(json_object, obj['field_1'], obj['field_2'])
-            if not dry_run:
-                update_message = aspace.client.post(data['uri'], json=data).json()
-                if 'error' in update_message:
-                    record_error('update_object() - Update failed due to following error', update_message)
-                    return None
-                else:
-                    logger.info(f'{update_message}')
-                    print(f'Updated object data: {update_message}')
-            else:
-                message = f"""
-{args.type} {obj['id']} would be updated with the following data:
-{data}
-"""
-                logger.info(message)
-                print(message)
-            
 if __name__ == "__main__":
     args = parseArguments()
 
@@ -139,4 +157,4 @@ if __name__ == "__main__":
         print(str(a) + ": " + str(args.__dict__[a]))
 
     # Run function
-    main(args.csvPath, args.dry_run)
+    main(args.csvPath, args.dry_run, args.type, args.workers)
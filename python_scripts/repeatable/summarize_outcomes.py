@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+# This script summarizes one or more outcome logs written by batch jobs run with --outcome-log, such as
+# suppress_objects.py or update_refids.py. It prints the number of rows, the count of each status, the most common
+# errors by stage, error class and HTTP status code, the slowest rows, and the URIs that were retried, so the failures
+# of a run of millions of rows can be triaged without searching the text log.
+import argparse
+import os
+import sys
+
+from loguru import logger
+
+sys.path.append(os.path.dirname('python_scripts'))  # Needed to import functions from utilities.py
+from python_scripts.utilities import setup_logging, summarize_outcomes
+
+log_name = __file__.rsplit('/',1)[1].replace('.py', '')
+setup_logging(log_name)
+
+
+def parseArguments():
+    """Parses the arguments fed to the script from the terminal or within a run configuration"""
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("outcomePaths", help="paths of the outcome logs to summarize", nargs='+', type=str)
+    parser.add_argument("-n", "--slowest", help="number of slowest rows to list", type=int, default=10)
+    parser.add_argument("--version", action="version", version='%(prog)s - Version 1.0')
+
+    return parser.parse_args()
+
+
+def main(outcome_paths, slowest_count=10):
+    """
+    Prints a summary of the outcome logs of one or more batch job runs
+
+    Args:
+        outcome_paths (list): the paths of the outcome logs
+        slowest_count (int): the number of slowest rows to list, default is 10
+
+    Returns:
+        summary (dict): the summary returned by summarize_outcomes()
+    """
+    summary = summarize_outcomes(outcome_paths, slowest_count)
+    print(f'Rows: {summary["rows"]}')
+    print('Statuses:')
+    for status, status_count in summary['statuses'].items():
+        print(f'    {status}: {status_count}')
+    print('Errors by stage, error class and HTTP status:')
+    for (stage, error_class, http_status), error_count in summary['errors']:
+        print(f'    {stage} {error_class} {http_status if http_status is not None else "-"}: {error_count}')
+    print('Slowest rows:')
+    for latency, uri in summary['slowest']:
+        print(f'    {latency:.3f}s {uri}')
+    print(f'Retried URIs: {summary["retried_uris"]} ({summary["retries"]} retries, '
+          f'{summary["retried_uris_still_failing"]} still failing)')
+    logger.info(f'Summarized {summary["rows"]} rows from {outcome_paths}: {summary["statuses"]}')
+    return summary
+
+
+# Call with `python summarize_outcomes.py <outcome_log>.jsonl [<outcome_log>.jsonl ...] -n 10`
+if __name__ == '__main__':
+    args = parseArguments()
+
+    # Print arguments
+    logger.info(f'Running {sys.argv[0]} script with following arguments: ')
+    print(f'Running {sys.argv[0]} script with following arguments: ')
+    for arg in args.__dict__:
+        logger.info(str(arg) + ": " + str(args.__dict__[arg]))
+        print(str(arg) + ": " + str(args.__dict__[arg]))
+
+    # Run function
+    main(outcome_paths=args.outcomePaths, slowest_count=args.slowest)
@@ -6,22 +6,27 @@
 # repository ID (if not already supplied) and object type (if not already supplied), grabs the resource JSON data, then
 # passes the data to the update_publish_status function, which modifies the JSON to publish=False and
 # finding_aid_status=staff_only (for resources only). Then it posts the updated JSON to ArchivesSpace and suppresses
-# the record.
+# the record. To share one CSV between workers on several hosts, run the script on each host with --queue pointing to
+# the same file on a shared volume - the first worker loads the CSV into the queue and every worker claims chunks of
+# rows from it until none are left.
 import argparse
 import os
+import socket
 import sys
 
+from contextlib import nullcontext
 from copy import deepcopy
+from functools import partial
 from dotenv import load_dotenv, find_dotenv
 from loguru import logger
 from pathlib import Path
 
 sys.path.append(os.path.dirname('python_scripts'))  # Needed to import functions from utilities.py
-from python_scripts.utilities import ASpaceAPI, read_csv, record_error
+from python_scripts.batch_jobs import BatchJob, ShardedBatchJob
+from python_scripts.utilities import (ASpaceAPI, ChangeLedger, OutcomeLog, ProgressJournal, WorkQueue, count_csv_rows,
+                                      echo, read_csv, record_error, setup_logging)
 
-logger.remove()
-log_path = Path('../logs', 'suppress_objects_{time:YYYY-MM-DD}.log')
-logger.add(str(log_path), format="{time}-{level}: {message}")
+setup_logging('suppress_objects', '../logs')
 
 # Find  and load environment-specific .env file
 env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
@@ -33,6 +38,25 @@ def parseArguments():
     parser.add_argument("csvPath", help="path to csv input file", type=str)
     parser.add_argument("repoID", help="the ASpace repo id number", type=int)
     parser.add_argument("objectType", help="resources/archival_objects/digital_objects", type=str)
+    parser.add_argument("-w", "--workers", help="number of objects to fetch and post at once", type=int, default=4)
+    parser.add_argument("-p", "--processes", help="number of worker processes to split the objects between, each "
+                                                  "fetching and posting --workers objects at once", type=int,
+                        default=1)
+    parser.add_argument("-j", "--journal", help="path to the progress journal file, default is the CSV path with "
+                                                ".progress.sqlite added", type=str)
+    parser.add_argument("--resume", help="skip the rows a previous run finished", action='store_true')
+    parser.add_argument("-l", "--ledger", help="path to the ledger of applied changes, rows whose change it has as "
+                                               "applied are skipped", type=str)
+    parser.add_argument("-Q", "--queue", help="path to a work queue file on a shared volume, to share the CSV "
+                                              "between workers on several hosts", type=str)
+    parser.add_argument("--worker-id", help="name of this worker in the work queue, default is the hostname and "
+                                            "process ID", type=str, default=f'{socket.gethostname()}-{os.getpid()}')
+    parser.add_argument("-o", "--outcome-log", help="path to a JSON lines log of each row's outcome, for "
+                                                    "summarize_outcomes.py", type=str)
+    parser.add_argument("--log-level", help="lowest level written to the log", type=str, default='INFO',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    parser.add_argument("-q", "--quiet", help="only print errors and progress reports to the console",
+                        action='store_true')
     parser.add_argument("-dR", "--dry-run", help="dry run?", action='store_true')
     parser.add_argument("--version", action="version", version='%(prog)s - Version 1.0')
 
@@ -61,7 +85,66 @@ def update_publish_status(object_json, object_type):
         return updated_object
 
 
-def main(csv_location, repo_id=None, object_type=None, dry_run=False):
+def unpublish_object(object_json, row):
+    """
+    Unpublishes an object with update_publish_status(), taking the object type from its URI
+
+    Args:
+        object_json (dict): the JSON data of the object
+        row (dict): the CSV row of the object
+
+    Returns:
+        updated_json (dict): the JSON data of the object updated with publish=False and finding_aid_status=staff_only
+    """
+    return update_publish_status(object_json, object_json['uri'].split('/')[3])
+
+
+def object_uri(row, repo_id=None, object_type=None):
+    """
+    Gets the URI of the object to suppress from the URI or URL in a CSV row
+
+    Args:
+        row (dict): the CSV row with the object's URI or URL in the URL column
+        repo_id (int): repository ID if the CSV does not contain the repository ID within the object URI
+        object_type (str): the type of object if the CSV does not contain it within the object URI
+
+    Returns:
+        object_uri (str): the object's URI, or None if the URI or URL does not end in an object ID
+    """
+    object_uri_parts = list(filter(None, row['URL'].split('/')))  # Filter out any empty strings
+    try:
+        resource_aspace_id = int(object_uri_parts[-1])
+    except ValueError:  # If anything other than an integer in the ASpace generated object ID, then throw error
+        record_error(f'object_uri() - error getting object ID {object_uri_parts[-1]}', ValueError)
+    else:
+        if repo_id is None:
+            repo_id = object_uri_parts[1]
+        if object_type is None:
+            object_type = object_uri_parts[2]
+        return f'/repositories/{repo_id}/{object_type}/{resource_aspace_id}'
+
+
+def suppress_object(local_aspace, updated_object, row):
+    """
+    Suppresses an object after its unpublished JSON data has been posted
+
+    Args:
+        local_aspace (ASpaceAPI): an instance of the ASpace API for connecting to the client
+        updated_object (dict): the posted JSON data of the object
+        row (dict): the CSV row of the object
+
+    Returns:
+        suppress_message (dict): ArchivesSpace response or None if an error was encountered and logged
+    """
+    suppress_message = local_aspace.update_suppression(updated_object['uri'], True)
+    if suppress_message is not None:
+        echo(suppress_message)
+        logger.info(suppress_message)
+    return suppress_message
+
+
+def main(csv_location, repo_id=None, object_type=None, dry_run=False, workers=4, journal_path=None, resume=False,
+         ledger_path=None, processes=1, queue_path=None, worker_id=None, outcome_path=None):
     """
     Takes a CSV of object URIs or URLs, searches for them in ArchivesSpace, then unpublishes, suppresses, and sets the
     finding_aid_status if resource to staff_only using the API
@@ -71,40 +154,49 @@ def main(csv_location, repo_id=None, object_type=None, dry_run=False):
         repo_id (int): repository ID if the CSV does not contain the repository ID within the object URI
         object_type (str): the type of object you want to suppress: resources, archival_objects, digital_objects
         dry_run (bool): if True, do not suppress resources. Just print statements confirming the resources to suppress
+        workers (int): the number of objects to fetch and post at once, default is 4
+        journal_path (str): filepath of the progress journal, default is the CSV path with .progress.sqlite added
+        resume (bool): if True, skip the rows the journal has as finished by a previous run
+        ledger_path (str): filepath of the ledger of applied changes, default is None (no ledger)
+        processes (int): the number of worker processes to split the objects between, each with its own ArchivesSpace
+            session, default is 1
+        queue_path (str): filepath of a work queue on a shared volume to share the CSV between workers on several
+            hosts, default is None (no queue)
+        worker_id (str): the name of this worker in the work queue, default is the hostname and process ID
+        outcome_path (str): filepath of the JSON lines log of each row's outcome, default is None (no outcome log)
     """
-    local_aspace = ASpaceAPI(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
     uris = read_csv(str(Path(os.getcwd(), csv_location)))
-    for row in uris:
-        object_uri_parts = list(filter(None, row['URL'].split('/')))  # Filter out any empty strings
-        try:
-            resource_aspace_id = int(object_uri_parts[-1])
-        except ValueError:  # If anything other than an integer in the ASpace generated object ID, then throw error
-            record_error(f'main() - error getting object ID {object_uri_parts[-1]}', ValueError)
-        else:
-            if repo_id is None:
-                repo_id = object_uri_parts[1]
-            if object_type is None:
-                object_type = object_uri_parts[2]
-            original_object = local_aspace.get_object(object_type,
-                                                      resource_aspace_id,
-                                                      f'repositories/{repo_id}')
-            if original_object:
-                updated_object = update_publish_status(original_object, object_type)
-                if dry_run is True:
-                    print(f'This is what the post will look like: {updated_object}')
-                else:
-                    update_status = local_aspace.update_object(updated_object['uri'], updated_object)
-                    if update_status is not None:
-                        print(update_status)
-                        logger.info(update_status)
-                        suppress_message = local_aspace.update_suppression(updated_object['uri'], True)
-                        if suppress_message is not None:
-                            print(suppress_message)
-                            logger.info(suppress_message)
+    if uris is None:
+        return
+    journal_path = journal_path or f'{csv_location}.progress.sqlite'
+    row_uri = partial(object_uri, repo_id=repo_id, object_type=object_type)
+    change_parameters = {'repo_id': repo_id, 'object_type': object_type}
+    if processes > 1:
+        ShardedBatchJob((os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw')), unpublish_object,
+                        row_uri=row_uri, after_post=suppress_object, processes=processes, threads=workers,
+                        dry_run=dry_run, name='suppress_objects', journal_path=journal_path, resume=resume,
+                        ledger_path=ledger_path, change_parameters=change_parameters,
+                        outcome_path=outcome_path).run(uris)
+        return
+    local_aspace = ASpaceAPI(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
+    with ProgressJournal(journal_path, resume) as journal, \
+            ChangeLedger(ledger_path, os.getenv('as_api')) if ledger_path else nullcontext() as ledger, \
+            OutcomeLog(outcome_path) if outcome_path else nullcontext() as outcome_log:
+        batch_job = BatchJob(local_aspace, unpublish_object, row_uri=row_uri, after_post=suppress_object,
+                             fetch_workers=workers, post_workers=workers, dry_run=dry_run, name='suppress_objects',
+                             journal=journal, ledger=ledger, change_parameters=change_parameters,
+                             outcome_log=outcome_log)
+        if queue_path is None:
+            batch_job.run(uris, count_csv_rows(str(Path(os.getcwd(), csv_location))))
+            return
+        with WorkQueue(queue_path) as work_queue:
+            if work_queue.load(uris, Path(csv_location).name) is not None:
+                batch_job.run_queue(work_queue, worker_id or f'{socket.gethostname()}-{os.getpid()}')
 
 
 if __name__ == '__main__':
     args = parseArguments()
+    setup_logging('suppress_objects', '../logs', args.log_level, args.quiet)
 
     # Print arguments
     logger.info(f'Running {sys.argv[0]} script with following arguments: ')
@@ -114,4 +206,5 @@ if __name__ == '__main__':
         print(str(arg) + ": " + str(args.__dict__[arg]))
 
     # Run function
-    main(args.csvPath, args.repoID, args.objectType, args.dry_run)
+    main(args.csvPath, args.repoID, args.objectType, args.dry_run, args.workers, args.journal, args.resume, args.ledger,
+         args.processes, args.queue, args.worker_id, args.outcome_log)
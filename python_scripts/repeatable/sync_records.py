@@ -0,0 +1,256 @@
+#!/usr/bin/python3
+# This script keeps a local SQLite store of ArchivesSpace record JSON up to date for the given record types and
+# repositories. Each run only fetches the records changed since the last run, found either by polling system_mtime in
+# the ArchivesSpace database (default) or with the API's modified_since parameter, and fetches them from the API in
+# batches with id_set. Read-heavy jobs can then use utilities.LocalRecordStore to read records from the store instead
+# of the API. Use --reconcile to also remove records that were deleted in ArchivesSpace from the store.
+import argparse
+import os
+import sys
+
+from datetime import UTC, datetime
+from dotenv import load_dotenv, find_dotenv
+from loguru import logger
+from pathlib import Path
+
+sys.path.append(os.path.dirname('python_scripts'))  # Needed to import functions from utilities.py
+from python_scripts.utilities import ASpaceAPI, ASpaceDatabase, LocalRecordStore, record_error
+
+logger.remove()
+log_name = __file__.rsplit('/',1)[1].replace('.py', '')+'_{time:YYYY-MM-DD}'
+log_path = Path(f'./logs/{log_name}.log')
+logger.add(str(log_path), format="{time}-{level}: {message}")
+
+# Find  and load environment-specific .env file
+env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
+load_dotenv(env_file)
+
+# Database table for each record type, and the record types that do not belong to a repository
+record_tables = {
+    'resources': 'resource',
+    'archival_objects': 'archival_object',
+    'digital_objects': 'digital_object',
+    'accessions': 'accession',
+    'top_containers': 'top_container',
+    'subjects': 'subject',
+    'locations': 'location'
+}
+global_types = ['subjects', 'locations']
+
+def parseArguments():
+    """Parses the arguments fed to the script from the terminal or within a run configuration"""
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("storePath", help="path to the SQLite store file", type=str)
+    parser.add_argument("-t", "--types", help="record types to sync", nargs='+', choices=record_tables.keys(),
+                        default=['resources', 'archival_objects', 'digital_objects'])
+    parser.add_argument("-r", "--repo-ids", help="repository IDs to sync, default is all repositories", nargs='+',
+                        type=int)
+    parser.add_argument("-s", "--source", help="where to find changed records", choices=['database', 'api'],
+                        default='database')
+    parser.add_argument("-b", "--batch-size", help="number of records to fetch per API request", type=int,
+                        default=100)
+    parser.add_argument("--reconcile", help="remove records deleted in ArchivesSpace from the store",
+                        action='store_true')
+    parser.add_argument("--version", action="version", version='%(prog)s - Version 1.0')
+
+    return parser.parse_args()
+
+
+def changed_ids_from_database(as_database, record_type, repo_id, last_mtime):
+    """
+    Gets the IDs of the records changed since last_mtime and the latest system_mtime among them from the database
+
+    Args:
+        as_database (ASpaceDatabase): the connection to the ArchivesSpace database
+        record_type (str): the type of the records
+        repo_id (int): the repository ID of the records, 0 for record types that do not belong to a repository
+        last_mtime (str): the system_mtime the last sync reached, or None to get all records
+
+    Returns:
+        changed_ids (list): the IDs of the changed records
+        latest_mtime (str): the latest system_mtime of the changed records, or last_mtime if none changed
+    """
+    conditions, parameters = [], []
+    if record_type not in global_types:
+        conditions.append('repo_id = %s')
+        parameters.append(repo_id)
+    if last_mtime is not None:
+        # >= so records saved in the same second as the last sync are not missed - saving them twice is harmless
+        conditions.append('system_mtime >= %s')
+        parameters.append(last_mtime)
+    where_clause = f'WHERE {" AND ".join(conditions)} ' if conditions else ''
+    changed_records = as_database.query_database(f'SELECT id, system_mtime FROM `{record_tables[record_type]}` '
+                                                 f'{where_clause}ORDER BY system_mtime',
+                                                 tuple(parameters), use_cache=False)
+    if not changed_records:
+        return [], last_mtime
+    return [record[0] for record in changed_records], str(changed_records[-1][1])
+
+
+def changed_ids_from_api(local_aspace, record_type, repo_uri, last_mtime):
+    """
+    Gets the IDs of the records changed since last_mtime with the API's modified_since parameter
+
+    Args:
+        local_aspace (ASpaceAPI): an instance of the ASpace API for connecting to the client
+        record_type (str): the type of the records
+        repo_uri (str): the repository URI, empty for record types that do not belong to a repository
+        last_mtime (str): the UTC time the last sync started, or None to get all records
+
+    Returns:
+        changed_ids (list): the IDs of the changed records
+        latest_mtime (str): the UTC time this sync started, to use as last_mtime next time
+    """
+    sync_start = datetime.now(UTC).replace(tzinfo=None).isoformat(sep=' ', timespec='seconds')
+    modified_since = None
+    if last_mtime is not None:
+        modified_since = int(datetime.fromisoformat(last_mtime).replace(tzinfo=UTC).timestamp())
+    changed_ids = local_aspace.get_modified_ids(record_type, modified_since, repo_uri)
+    if changed_ids is None:
+        return [], last_mtime
+    return changed_ids, sync_start
+
+
+def fetch_changed_records(local_aspace, record_store, record_type, repo_id, changed_ids, batch_size=100):
+    """
+    Fetches the changed records from the API in batches and saves them to the store
+
+    Args:
+        local_aspace (ASpaceAPI): an instance of the ASpace API for connecting to the client
+        record_store (LocalRecordStore): the local record store
+        record_type (str): the type of the records
+        repo_id (int): the repository ID of the records, 0 for record types that do not belong to a repository
+        changed_ids (list): the IDs of the records to fetch
+        batch_size (int): the number of records to fetch per request, default is 100
+
+    Returns:
+        saved_count (int): the number of records saved to the store
+        complete (bool): False if any batch could not be fetched
+    """
+    repo_uri = '' if record_type in global_types else f'/repositories/{repo_id}'
+    saved_count, complete = 0, True
+    for batch_start in range(0, len(changed_ids), batch_size):
+        batch_ids = changed_ids[batch_start:batch_start + batch_size]
+        records = local_aspace.get_object_set(record_type, batch_ids, repo_uri)
+        if records is None:
+            complete = False
+            continue
+        record_store.save_records(record_type, repo_id, records)
+        saved_count += len(records)
+    return saved_count, complete
+
+
+def reconcile_deletes(local_aspace, as_database, record_store, record_type, repo_id):
+    """
+    Removes records from the store that no longer exist in ArchivesSpace
+
+    Args:
+        local_aspace (ASpaceAPI): an instance of the ASpace API for connecting to the client
+        as_database (ASpaceDatabase): the connection to the ArchivesSpace database, or None to use the API
+        record_store (LocalRecordStore): the local record store
+        record_type (str): the type of the records
+        repo_id (int): the repository ID of the records, 0 for record types that do not belong to a repository
+
+    Returns:
+        deleted_ids (set): the IDs of the records removed from the store
+    """
+    if as_database is not None:
+        if record_type in global_types:
+            current_records = as_database.query_database(f'SELECT id FROM `{record_tables[record_type]}`',
+                                                         use_cache=False)
+        else:
+            current_records = as_database.query_database(f'SELECT id FROM `{record_tables[record_type]}` '
+                                                         'WHERE repo_id = %s', (repo_id,), use_cache=False)
+        current_ids = {record[0] for record in current_records}
+    else:
+        repo_uri = '' if record_type in global_types else f'/repositories/{repo_id}'
+        current_ids = local_aspace.get_modified_ids(record_type, repo_uri=repo_uri)
+        if current_ids is None:
+            return set()
+        current_ids = set(current_ids)
+    deleted_ids = record_store.stored_ids(record_type, repo_id) - current_ids
+    record_store.delete_records(record_type, repo_id, deleted_ids)
+    return deleted_ids
+
+
+def sync_records(local_aspace, as_database, record_store, record_type, repo_id, batch_size=100, reconcile=False):
+    """
+    Brings the store up to date for one record type in one repository
+
+    Args:
+        local_aspace (ASpaceAPI): an instance of the ASpace API for connecting to the client
+        as_database (ASpaceDatabase): the connection to the ArchivesSpace database, or None to use the API
+        record_store (LocalRecordStore): the local record store
+        record_type (str): the type of the records
+        repo_id (int): the repository ID of the records, 0 for record types that do not belong to a repository
+        batch_size (int): the number of records to fetch per request, default is 100
+        reconcile (bool): if True, also remove records deleted in ArchivesSpace from the store
+    """
+    last_mtime = record_store.last_mtime(record_type, repo_id)
+    if as_database is not None:
+        changed_ids, latest_mtime = changed_ids_from_database(as_database, record_type, repo_id, last_mtime)
+    else:
+        repo_uri = '' if record_type in global_types else f'/repositories/{repo_id}'
+        changed_ids, latest_mtime = changed_ids_from_api(local_aspace, record_type, repo_uri, last_mtime)
+    saved_count, complete = fetch_changed_records(local_aspace, record_store, record_type, repo_id, changed_ids,
+                                                  batch_size)
+    if complete:
+        record_store.set_last_mtime(record_type, repo_id, latest_mtime,
+                                    datetime.now(UTC).isoformat(timespec='seconds'))
+    else:
+        record_error(f'sync_records() - Some {record_type} in repository {repo_id} could not be fetched, they will be '
+                     f'retried next sync', last_mtime)
+    deleted_ids = set()
+    if reconcile:
+        deleted_ids = reconcile_deletes(local_aspace, as_database, record_store, record_type, repo_id)
+    logger.info(f'{record_type} in repository {repo_id}: {len(changed_ids)} changed, {saved_count} saved, '
+                f'{len(deleted_ids)} removed')
+    print(f'{record_type} in repository {repo_id}: {len(changed_ids)} changed, {saved_count} saved, '
+          f'{len(deleted_ids)} removed')
+
+
+def main(store_path, record_types, repo_ids=None, source='database', batch_size=100, reconcile=False):
+    """
+    Syncs every given record type in every given repository into the local store
+
+    Args:
+        store_path (str): the filepath of the SQLite store file
+        record_types (list): the record types to sync
+        repo_ids (list): the repository IDs to sync, default is None (all repositories)
+        source (str): database to poll system_mtime or api to use modified_since, default is database
+        batch_size (int): the number of records to fetch per API request, default is 100
+        reconcile (bool): if True, also remove records deleted in ArchivesSpace from the store
+    """
+    local_aspace = ASpaceAPI(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
+    as_database = None
+    if source == 'database':
+        as_database = ASpaceDatabase(os.getenv('db_un'), os.getenv('db_pw'), os.getenv('db_host'),
+                                     os.getenv('db_name'), os.getenv('db_port'))
+    if repo_ids is None:
+        repo_ids = [int(repo['uri'].split('/')[-1]) for repo in local_aspace.get_repo_info()]
+    record_store = LocalRecordStore(store_path)
+    try:
+        for record_type in record_types:
+            for repo_id in ([0] if record_type in global_types else repo_ids):
+                sync_records(local_aspace, as_database, record_store, record_type, repo_id, batch_size, reconcile)
+    finally:
+        record_store.close()
+        if as_database is not None:
+            as_database.close_connection()
+
+
+# Call with `python sync_records.py <store_filepath>.sqlite -t resources archival_objects -r 2 3`
+if __name__ == '__main__':
+    args = parseArguments()
+
+    # Print arguments
+    logger.info(f'Running {sys.argv[0]} script with following arguments: ')
+    print(f'Running {sys.argv[0]} script with following arguments: ')
+    for arg in args.__dict__:
+        logger.info(str(arg) + ": " + str(args.__dict__[arg]))
+        print(str(arg) + ": " + str(args.__dict__[arg]))
+
+    # Run function
+    main(store_path=args.storePath, record_types=args.types, repo_ids=args.repo_ids, source=args.source,
+         batch_size=args.batch_size, reconcile=args.reconcile)
@@ -6,10 +6,12 @@ import argparse
 import os
 import sys
 
+from copy import deepcopy
 from dotenv import load_dotenv, find_dotenv
 from loguru import logger
 from pathlib import Path
-from python_scripts.utilities import check_url, client_login, read_csv
+from python_scripts.batch_jobs import BatchJob
+from python_scripts.utilities import ASpaceAPI, check_url, count_csv_rows, read_csv
 
 # Logging
 logger.remove()
@@ -24,29 +26,12 @@ def parseArguments():
     parser = argparse.ArgumentParser()
 
     parser.add_argument("csvPath", help="path to csv input file", type=str)
+    parser.add_argument("-w", "--workers", help="number of records to fetch and post at once", type=int, default=4)
     parser.add_argument("-dR", "--dry-run", help="dry run?", action='store_true')
     parser.add_argument("--version", action="version", version='%(prog)s - Version 1.0')
 
     return parser.parse_args()
     
-def get_digital_object(client, repo_id, digital_object_id):
-    """
-    Args:
-        client (ASnake.client object): client object from ASnake.client
-        repo_id (str): id of the digital object's repository
-        digital_object_id (str): id of the digital object to be updated
-
-    Returns:
-        existing_digital_object (dict): the existing digital object returned from ArchivesSpace's API
-        None (NoneType): if problem retrieving existing digital object
-    """
-    existing_digital_object = client.get(f'/repositories/{repo_id}/digital_objects/{digital_object_id}').json()
-    if 'error' in existing_digital_object:
-        logger.error(f'ERROR getting existing digital object {digital_object_id}: {existing_digital_object}')
-        print(f'ERROR getting existing digital object {digital_object_id}: {existing_digital_object}')
-    else:
-        return existing_digital_object
-    
 def build_digital_object(do, new_uri):
     """
     Builds out the updated digital object with new uri from csv.
@@ -66,27 +51,38 @@ def build_digital_object(do, new_uri):
 
     return do
 
-def update_digital_object(client, repo_id, digital_object_id, data):
+def digital_object_uri(row):
     """
+    Gets the URI of the digital object to update from a CSV row
+
     Args:
-        client (ASnake.client object): client object from ASnake.client
-        digital_object_id (str): id of the digital object to be updated
-        data (dict): updated digital object ready to post to ArchivesSpace
-    
+        row (dict): the CSV row, with repo_id and digital_object_id columns
+
     Returns:
-        update_message (dict): ArchivesSpace API response
+        object_uri (str): the digital object's URI
     """
-    update_message = client.post(f'repositories/{repo_id}/digital_objects/{digital_object_id}', json=data).json()
-    if 'error' in update_message:
-        logger.error(update_message)
-        print(f'ERROR: {update_message}')
-    else:
-        logger.info(f'{update_message}')
-        print(f'Updated object data: {update_message}')
+    return f'/repositories/{row["repo_id"]}/digital_objects/{row["digital_object_id"]}'
 
-    return update_message
+def update_file_uri(digital_object, row):
+    """
+    Sets a digital object's file URI to the new URI from its CSV row, once the new URI is checked. If the URI cannot be
+    reached, a ValueError is raised so the row is counted as failed
 
-def main(updated_file_uri_csv, dry_run):
+    Args:
+        digital_object (dict): Existing ArchivesSpace digital object
+        row (dict): the CSV row, with updated_file_uri and optional check_uri columns
+
+    Returns:
+        do (dict): a copy of the digital object with the new file URI, ready to post to ArchivesSpace
+    """
+    # In some cases - for example mp3s rendered via a javascript viewer - we want to check the direct `mads/id/` url
+    # and not the `mads/view` player url, as that viewer will always return 200 even when the asset is missing.
+    check_uri = row.get('check_uri') or row['updated_file_uri']
+    if not check_url(check_uri):
+        raise ValueError(f'Unable to reach file URI {check_uri}')
+    return build_digital_object(deepcopy(digital_object), row['updated_file_uri'])
+
+def main(updated_file_uri_csv, dry_run, workers=4):
     """
     Runs the functions of the script, collecting, building, then updating digital object metadata in ArchivesSpace, printing
     error messages if they occur
@@ -99,29 +95,14 @@ def main(updated_file_uri_csv, dry_run):
     Args:
         updated_file_uri_csv (str): filepath for the csv
         dry_run (bool): run as non-destructive dry run?  True if `--dry-run` provided as an argument
+        workers (int): the number of digital objects to fetch and post at once, default is 4
     """
-    client = client_login(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
+    local_aspace = ASpaceAPI(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
     csv_dict = read_csv(updated_file_uri_csv)
-    for obj in csv_dict:
-        repo_id = obj['repo_id']
-        digital_object_id = obj['digital_object_id']
-        new_uri = obj['updated_file_uri']
-        check_uri = obj['check_uri'] or new_uri # In some cases - for example mp3s rendered via a javascript viewer - 
-        # we want to check the direct `mads/id/` url and not the `mads/view` player url, as that viewer will always 
-        # return 200 even when the asset is missing.
-        if check_url(check_uri):
-            do = get_digital_object(client, repo_id, digital_object_id)
-            if do is not None:
-                data = build_digital_object(do, new_uri)
-                if not dry_run:
-                    update_digital_object(client, repo_id, digital_object_id, data)
-                else:
-                    message = f"""
-Digital object {digital_object_id} would be updated with the following data:
-    {data}
-"""
-                    logger.info(message)
-                    print(message)
+    if csv_dict is None:
+        return
+    BatchJob(local_aspace, update_file_uri, row_uri=digital_object_uri, fetch_workers=workers, post_workers=workers,
+             dry_run=dry_run, name='update_fileuri').run(csv_dict, count_csv_rows(updated_file_uri_csv))
 
 if __name__ == "__main__":
     args = parseArguments()
@@ -134,4 +115,4 @@ if __name__ == "__main__":
         print(str(a) + ": " + str(args.__dict__[a]))
 
     # Run function
-    main(args.csvPath, args.dry_run)
+    main(args.csvPath, args.dry_run, args.workers)
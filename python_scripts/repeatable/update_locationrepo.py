@@ -7,17 +7,16 @@
 import os
 import sys
 
+from contextlib import nullcontext
 from copy import deepcopy
 from dotenv import load_dotenv, find_dotenv
-from loguru import logger
 from pathlib import Path
 
 sys.path.append(os.path.dirname('python_scripts'))  # Needed to import functions from utilities.py
-from python_scripts.utilities import ASpaceAPI, read_csv, record_error, write_to_file
+from python_scripts.batch_jobs import BatchJob
+from python_scripts.utilities import ASpaceAPI, ChangeLedger, count_csv_rows, read_csv, record_error, setup_logging
 
-logger.remove()
-log_path = Path('../logs', 'update_locations_{time:YYYY-MM-DD}.log')
-logger.add(str(log_path), format="{time}-{level}: {message}")
+setup_logging('update_locations', '../logs')
 
 # Find  and load environment-specific .env file
 env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
@@ -41,30 +40,26 @@ def add_repo(location_data, repository_id):
         updated_repo['owner_repo'] = {'ref': f'/repositories/{str(repository_id)}'}
         return updated_repo
 
-def main(csv_location, repo_id):
+def main(csv_location, repo_id, ledger_path=None):
     """
     Takes a CSV of location URIs and repository identifier and adds an owner_repo to the location JSON data
 
     Args:
         csv_location (str): filepath of the CSV containing the location URIs to update
         repo_id (int): the repository identifier number to add to the location JSON data
+        ledger_path (str): filepath of the ledger of applied changes, default is None (no ledger)
     """
     original_location_json = str(Path('../logs', 'update_locations_original_data.jsonl'))
     print(original_location_json)
     local_aspace = ASpaceAPI(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
-    uris = read_csv(str(Path(os.getcwd(), csv_location)))
-    for row in uris:
-        location_uri = row['uri'].split('/')
-        location_type, location_id = location_uri[1], location_uri[2]
-        location_data = local_aspace.get_object(location_type, location_id)
-        write_to_file(original_location_json, location_data)
-        updated_location = add_repo(location_data, repo_id)
-        update_status = local_aspace.update_object(row['uri'], updated_location)
-        if 'error' in update_status:
-            record_error(f'main() - Error updating location {row["uri"]}', update_status)
-        else:
-            logger.info(update_status)
-            print(update_status)
+    csv_path = str(Path(os.getcwd(), csv_location))
+    uris = read_csv(csv_path)
+    if uris is None:
+        return
+    with ChangeLedger(ledger_path, os.getenv('as_api')) if ledger_path else nullcontext() as ledger:
+        BatchJob(local_aspace, lambda location_data, row: add_repo(location_data, repo_id),
+                 backup_path=original_location_json, name='update_locationrepo', ledger=ledger,
+                 change_parameters={'repo_id': repo_id}).run(uris, count_csv_rows(csv_path))
 
 # Call with `python update_locations.py <filename>.csv <repo_id>`
 if __name__ == '__main__':
@@ -6,16 +6,16 @@ import argparse
 import os
 import sys
 
+from contextlib import nullcontext
 from dotenv import load_dotenv, find_dotenv
 from loguru import logger
-from pathlib import Path
 
 sys.path.append(os.path.dirname('python_scripts'))  # Needed to import functions from utilities.py
-from python_scripts.utilities import ASpaceAPI, read_csv, write_to_file
+from python_scripts.batch_jobs import BatchJob
+from python_scripts.utilities import (ASpaceAPI, ChangeLedger, OutcomeLog, count_csv_rows, read_validated_csv,
+                                      setup_logging)
 
-logger.remove()
-log_path = Path('../../logs', 'update_refids_{time:YYYY-MM-DD}.log')
-logger.add(str(log_path), format="{time}-{level}: {message}")
+setup_logging('update_refids', '../../logs')
 
 # Find  and load environment-specific .env file
 env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
@@ -27,13 +27,36 @@ def parseArguments():
 
     parser.add_argument("csvPath", help="path to CSV input file", type=str)
     parser.add_argument("jsonPath", help="path to the JSONL file for storing data", type=str)
+    parser.add_argument("-w", "--workers", help="number of records to fetch and post at once", type=int, default=4)
+    parser.add_argument("-l", "--ledger", help="path to the ledger of applied changes, rows whose change it has as "
+                                               "applied are skipped", type=str)
+    parser.add_argument("-o", "--outcome-log", help="path to a JSON lines log of each row's outcome, for "
+                                                    "summarize_outcomes.py", type=str)
+    parser.add_argument("--log-level", help="lowest level written to the log", type=str, default='INFO',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    parser.add_argument("-q", "--quiet", help="only print errors and progress reports to the console",
+                        action='store_true')
     parser.add_argument("-dR", "--dry-run", help="dry run?", action='store_true')
     parser.add_argument("--version", action="version", version='%(prog)s - Version 1.0')
 
     return parser.parse_args()
 
 
-def main(csv_path, jsonl_path, dry_run=False):
+def regenerate_refid(archival_object, row):
+    """
+    Sets an archival object's caas_regenerate_ref_id field so ArchivesSpace regenerates its refid when it is posted
+
+    Args:
+        archival_object (dict): the JSON data of the archival object
+        row (dict): the CSV row of the archival object
+
+    Returns:
+        updated_object (dict): a copy of the archival object JSON data with caas_regenerate_ref_id set to True
+    """
+    return dict(archival_object, caas_regenerate_ref_id=True)
+
+
+def main(csv_path, jsonl_path, dry_run=False, workers=4, ledger_path=None, outcome_path=None):
     """
     This script takes a CSV of archival object URIs as inputs, grabs all the archival objects' JSON data using the API,
     saves them to a jsonL file using the jsonl_path input, and updates the archival objects' update_refid field to
@@ -47,26 +70,25 @@ def main(csv_path, jsonl_path, dry_run=False):
         csv_path (str): filepath of the CSV file with the archival object URIs
         jsonl_path (str): filepath of the jsonL file for storing JSON data of objects before updates - backup
         dry_run (bool): if True, it prints the changed object_json but does not post the changes to ASpace
+        workers (int): the number of records to fetch and post at once, default is 4
+        ledger_path (str): filepath of the ledger of applied changes, default is None (no ledger)
+        outcome_path (str): filepath of the JSON lines log of each row's outcome, default is None (no outcome log)
     """
+    uris = read_validated_csv(csv_path, {'uri': 'uri'})
+    if uris is None:
+        return
     local_aspace = ASpaceAPI(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
-    for uri in read_csv(csv_path):
-        uri_parts = uri['uri'].split('/')
-        archival_object = local_aspace.get_object('archival_objects', uri_parts[3],
-                                                  f'repositories/{uri_parts[1]}')
-        write_to_file(jsonl_path, archival_object)
-        if archival_object:
-            archival_object['caas_regenerate_ref_id'] = True
-            if dry_run:
-                print(f'Updated archival object {uri['uri']}: {archival_object['caas_regenerate_ref_id']}')
-            else:
-                post_response = local_aspace.update_object(archival_object['uri'], archival_object)
-                if post_response:
-                    print(post_response)
+    with ChangeLedger(ledger_path, os.getenv('as_api')) if ledger_path else nullcontext() as ledger, \
+            OutcomeLog(outcome_path) if outcome_path else nullcontext() as outcome_log:
+        BatchJob(local_aspace, regenerate_refid, backup_path=jsonl_path, fetch_workers=workers, post_workers=workers,
+                 dry_run=dry_run, name='update_refids', ledger=ledger,
+                 outcome_log=outcome_log).run(uris, count_csv_rows(csv_path))
 
 
 # Call with `python update_refids.py <csv_filpath>.csv <jsonl_filepath>.jsonl`
 if __name__ == '__main__':
     args = parseArguments()
+    setup_logging('update_refids', '../../logs', args.log_level, args.quiet)
 
     # Print arguments
     logger.info(f'Running {sys.argv[0]} script with following arguments: ')
@@ -76,4 +98,5 @@ if __name__ == '__main__':
         print(str(arg) + ": " + str(args.__dict__[arg]))
 
     # Run function
-    main(csv_path=args.csvPath, jsonl_path= args.jsonPath, dry_run=args.dry_run)
+    main(csv_path=args.csvPath, jsonl_path= args.jsonPath, dry_run=args.dry_run, workers=args.workers,
+         ledger_path=args.ledger, outcome_path=args.outcome_log)
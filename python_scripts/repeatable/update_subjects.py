@@ -1,13 +1,15 @@
 # This script updates existing subjects in bulk from a csv
-import csv
 import os
 import sys
 
 from asnake.client import ASnakeClient
 from asnake.client.web_client import ASnakeAuthError
+from copy import deepcopy
 from dotenv import load_dotenv, find_dotenv
 from loguru import logger
 from pathlib import Path
+from python_scripts.batch_jobs import BatchJob
+from python_scripts.utilities import ASpaceAPI, count_csv_rows, read_validated_csv
 
 logger.remove()
 log_path = Path('./logs', 'update_subjects_{time:YYYY-MM-DD}.log')
@@ -17,6 +19,10 @@ logger.add(str(log_path), format="{time}-{level}: {message}")
 env_file = find_dotenv(f'.env.{os.getenv("ENV", "dev")}')
 load_dotenv(env_file)
 
+# The columns of the csv and the types read_validated_csv() checks them against
+updated_subjects_schema = {'aspace_subject_id': 'int', 'new_title': 'text', 'new_scope_note': 'text?',
+                           'new_EMu_ID': 'text'}
+
 def client_login(as_api, as_un, as_pw):
     """
     Login to the ArchivesSnake client and return client
@@ -40,24 +46,6 @@ def client_login(as_api, as_un, as_pw):
     else:
         return client
 
-def read_csv(updated_subjects_csv):
-    """
-    Args:
-        updated_subjects_csv (str): filepath for the subjects csv
-
-    Returns:
-        updated_subjects (list): a list of subjects to update and their metadata based on the csv contents
-    """
-    updated_subjects = []
-    try:
-        open_csv = open(updated_subjects_csv, 'r', encoding='UTF-8')
-        updated_subjects = csv.DictReader(open_csv)
-    except IOError as csverror:
-        logger.error(f'ERROR reading csv file: {csverror}')
-        print(f'ERROR reading csv file: {csverror}')
-    else:
-        return updated_subjects
-    
 def get_subject(client, existing_subject_id):
     """
     Args:
@@ -84,9 +72,10 @@ def build_subject(existing_subj, subj):
         subj (dict): subject metadata from csv
 
     Returns:
-        existing_subj (dict): updated subject ready to post to ArchivesSpace
+        updated_subj (dict): a copy of the subject, updated and ready to post to ArchivesSpace
     """
-    existing_subj['terms'] = [
+    updated_subj = deepcopy(existing_subj)
+    updated_subj['terms'] = [
             {
                 'term': subj['new_title'],
                 'term_type': 'cultural_context',
@@ -94,14 +83,14 @@ def build_subject(existing_subj, subj):
 
             }
         ]
-    existing_subj['scope_note'] = subj['new_scope_note']
-    existing_subj['external_ids'] = [
+    updated_subj['scope_note'] = subj['new_scope_note']
+    updated_subj['external_ids'] = [
         {
             'external_id': subj['new_EMu_ID'],
             'source': 'EMu_ID'
         }
     ]
-    return existing_subj
+    return updated_subj
 
 def update_subject(client, existing_subj_id, data):
     """
@@ -122,7 +111,19 @@ def update_subject(client, existing_subj_id, data):
         print(f'Updated object data: {update_message}')
     return update_message
 
-def main(updated_subjects_csv):
+def subject_uri(subj):
+    """
+    Gets the URI of the subject to update from a CSV row
+
+    Args:
+        subj (dict): subject metadata from csv, with an aspace_subject_id column
+
+    Returns:
+        subject_uri (str): the subject's URI
+    """
+    return f'/subjects/{subj["aspace_subject_id"]}'
+
+def main(updated_subjects_csv, workers=4):
     """
     Runs the functions of the script, collecting, building, then updating subject metadata in ArchivesSpace, printing
     error messages if they occur
@@ -135,15 +136,14 @@ def main(updated_subjects_csv):
 
     Args:
         updated_subjects_csv (str): filepath for the subjects csv
+        workers (int): the number of subjects to fetch and post at once, default is 4
     """
-    client = client_login(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
-    updated_subjects = read_csv(updated_subjects_csv)
-    for subj in updated_subjects:
-        existing_subj_id = subj['aspace_subject_id']
-        existing_subj = get_subject(client, existing_subj_id)
-        if existing_subj is not None:
-            data = build_subject(existing_subj, subj)
-            update_subject(client, existing_subj_id, data)
+    updated_subjects = read_validated_csv(updated_subjects_csv, updated_subjects_schema)
+    if updated_subjects is None:
+        return
+    local_aspace = ASpaceAPI(os.getenv('as_api'), os.getenv('as_un'), os.getenv('as_pw'))
+    BatchJob(local_aspace, build_subject, row_uri=subject_uri, fetch_workers=workers, post_workers=workers,
+             name='update_subjects').run(updated_subjects, count_csv_rows(updated_subjects_csv))
 
 # Call with `python update_subjects.py <filename>.csv`
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# The classes and functions shared by the scripts, split into submodules so a script only loads the ones it uses:
+#   - api: connecting to the ArchivesSpace API
+#   - database: querying the ArchivesSpace database and the local SQLite copy of records
+#   - csv_files: reading, validating and grouping csv input rows
+#   - backups: writing and reading jsonl backups, and xml and parquet files
+#   - progress: journals, ledgers, work queues, and progress and outcome reports
+#   - logs: logging and recording errors
+# Each name can still be imported from python_scripts.utilities, including with *, and its submodule is imported the
+# first time the name is used.
+import importlib
+
+# The submodule that defines each name
+submodule_names = {
+    'ASpaceAPI': 'api', 'ThrottleProfile': 'api', 'check_url': 'api', 'client_login': 'api', 'clock_minutes': 'api',
+    'read_throttle_profile': 'api',
+    'ASpaceDatabase': 'database', 'LocalRecordStore': 'database', 'normalize_statement': 'database',
+    'query_cache_key': 'database', 'read_query_cache': 'database', 'referenced_tables': 'database',
+    'write_query_cache': 'database',
+    'converted_csv_rows': 'csv_files', 'count_csv_rows': 'csv_files', 'csv_column_types': 'csv_files',
+    'csv_rows': 'csv_files', 'group_rows': 'csv_files', 'read_csv': 'csv_files', 'read_sorted_run': 'csv_files',
+    'read_validated_csv': 'csv_files', 'validate_csv': 'csv_files', 'write_sorted_run': 'csv_files',
+    'BackupLookup': 'backups', 'BackupWriter': 'backups', 'arrow_batches': 'backups', 'backup_compression': 'backups',
+    'backup_format': 'backups', 'backup_index_path': 'backups', 'build_backup_index': 'backups',
+    'compress_frame': 'backups', 'decompress_frame': 'backups', 'iter_backup_frames': 'backups',
+    'load_snapshot_table': 'backups', 'merge_backups': 'backups', 'open_backup': 'backups', 'read_backup': 'backups',
+    'read_backup_index': 'backups', 'write_backup_index': 'backups', 'write_to_file': 'backups',
+    'write_to_parquet': 'backups', 'write_to_xml_file': 'backups',
+    'ChangeLedger': 'progress', 'OutcomeLog': 'progress', 'ProgressJournal': 'progress', 'ProgressReporter': 'progress',
+    'RepositoryProgress': 'progress', 'WorkQueue': 'progress', 'fan_out_repositories': 'progress',
+    'format_duration': 'progress', 'row_hash': 'progress', 'summarize_outcomes': 'progress',
+    'echo': 'logs', 'log_settings': 'logs', 'record_error': 'logs', 'setup_logging': 'logs', 'truncate_payload': 'logs',
+    'truncate_record': 'logs'
+}
+
+__all__ = list(submodule_names)
+
+
+def __getattr__(name):
+    """
+    Imports the submodule that defines a name the first time the name is used
+
+    Args:
+        name (str): the name of the class, function or setting
+
+    Returns:
+        value (object): the class, function or setting from its submodule
+    """
+    if name not in submodule_names:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(f'{__name__}.{submodule_names[name]}'), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(submodule_names))
@@ -0,0 +1,455 @@
+#!/usr/bin/env python
+# Connecting to the ArchivesSpace API, with optional throttling of the requests made
+import json
+import os
+import threading
+import time
+
+from http.client import HTTPException
+from loguru import logger
+from python_scripts.utilities.logs import record_error
+
+
+class ASpaceAPI:
+
+    def __init__(self, aspace_api, aspace_un, aspace_pw, throttle_profile=None):
+        """
+        Establishes connection to ASnakeClient and runs queries to the ArchivesSpace API
+
+        Args:
+            aspace_api (str): ArchivesSpace API URL
+            aspace_un (str): ArchivesSpace username - admin rights preferred
+            aspace_pw (str): ArchivesSpace password
+            throttle_profile (ThrottleProfile): limits on the requests made by this client in each time window, default
+                is the profile in the JSON file at the as_throttle_profile environment variable, if it is set
+        """
+        from asnake.client import ASnakeClient
+        from asnake.client.web_client import ASnakeAuthError
+
+        try:
+            self.aspace_client = ASnakeClient(baseurl=aspace_api, username=aspace_un, password=aspace_pw)
+            self.aspace_client.authorize()
+        except ASnakeAuthError as e:
+            record_error('ArchivesSpace __init__() - Failed to authorize ASnake client', e)
+            raise ASnakeAuthError
+        self.repo_info = []
+        self.response_status = threading.local()
+        self.aspace_client.session.request = self.record_status(self.aspace_client.session.request)
+        if throttle_profile is None and os.getenv('as_throttle_profile'):
+            throttle_profile = read_throttle_profile(os.getenv('as_throttle_profile'))
+        self.throttle_profile = throttle_profile
+        if throttle_profile is not None:
+            self.aspace_client.session.request = throttle_profile.throttle(self.aspace_client.session.request)
+
+    def record_status(self, request_function):
+        """
+        Wraps the session's request function to keep the HTTP status code of the last response each thread got, read
+        back with last_status_code()
+
+        Args:
+            request_function (function): the session's request function
+
+        Returns:
+            recorded_function (function): the request function recording the status code of each response
+        """
+        def recorded_function(*args, **kwargs):
+            self.response_status.code = None
+            response = request_function(*args, **kwargs)
+            self.response_status.code = response.status_code
+            return response
+        return recorded_function
+
+    def last_status_code(self):
+        """
+        Gets the HTTP status code of the last response the calling thread got from ArchivesSpace
+
+        Returns:
+            status_code (int): the HTTP status code, or None if the thread has not had a response
+        """
+        return getattr(self.response_status, 'code', None)
+
+    def get_repo_info(self):
+        """
+        Gets all the repository information for an ArchivesSpace instance in a list and assigns it to self.repo_info
+
+        Returns:
+            self.repo_info (list): a list of dictionaries containing all the repository information for an ArchivesSpace
+            instance
+        """
+        self.repo_info = self.aspace_client.get('repositories').json()
+        if self.repo_info:
+            return self.repo_info
+        print(f'get_repo_info() - There are no repositories in the Archivesspace Instance: {self.repo_info}')
+        logger.info(f'get_repo_info() - There are no repositories in the Archivesspace Instance: {self.repo_info}')
+
+    def get_objects(self, repository_uri, record_type, parameters=('all_ids', True)):
+        """
+        Intakes a repository URI and returns all the digital object IDs as a list for that repository
+
+        Args:
+            repository_uri (str): the repository URI
+            record_type (str): the type of record object you want to get (resources, archival_objects, digital_objects,
+                accessions, etc.)
+            parameters (tuple): Selected parameter and value: ('all_ids', 'True'), ('page', '#'), and
+            ('id_set',' [1,2,3,etc.]) Default is ('all_ids', 'True')
+
+        Returns:
+            record_objects (list): all the record object IDs
+        """
+        parameter_options = ['all_ids', 'page', 'id_set']
+        if parameters[0] not in parameter_options:
+            record_error('get_objects() - parameter not valid', parameters)
+            raise ValueError
+        if parameters[0] == 'all_ids' and not isinstance(parameters[1], bool):
+            record_error('get_objects() - parameter not valid', parameters)
+            raise ValueError
+        if parameters[0] == 'page' and not isinstance(parameters[1], int):
+            record_error('get_objects() - parameter not valid', parameters)
+            raise ValueError
+        if parameters[0] == 'id_set' and not isinstance(parameters[1], list):
+            record_error('get_objects() - parameter not valid', parameters)
+            raise ValueError
+        if isinstance(parameters[1], list):
+            record_objects = []
+            for identifier in parameters[1]:
+                record_objects.append(self.aspace_client.get(
+                    f'{repository_uri}/{record_type}?{parameters[0]}={str(identifier)}').json())
+        else:
+            record_objects = self.aspace_client.get(
+                f'{repository_uri}/{record_type}?{parameters[0]}={parameters[1]}').json()
+        return record_objects
+
+    def get_object(self, record_type, object_id, repo_uri=''):
+        """
+        Get and return a digital object JSON metadata from its URI
+
+        Args:
+            record_type (str): the type of record object you want to get (resources, archival_objects, digital_objects,
+                accessions, etc.)
+            object_id (int): the original object ArchivesSpace ID
+            repo_uri (str): the repository ArchivesSpace URI including ending forward slash, default is None
+
+        Returns:
+            do_json (dict): the JSON metadata for a digital object
+        """
+        try:
+            object_json = self.aspace_client.get(f'{repo_uri}/{record_type}/{object_id}').json()
+        except HTTPException as get_error:
+            record_error(f'get_object() - Unable to retrieve object {repo_uri}/{record_type}/{object_id}',
+                         get_error)
+        else:
+            if 'error' in object_json:
+                record_error(f'get_object() - Unable to retrieve object with provided URI: '
+                             f'{repo_uri}/{record_type}/{object_id}',
+                             object_json)
+            else:
+                return object_json
+
+    def get_modified_ids(self, record_type, modified_since=None, repo_uri=''):
+        """
+        Gets the IDs of all objects of a type, or only those modified since the given time
+
+        Args:
+            record_type (str): the type of record object you want to get (resources, archival_objects, digital_objects,
+                accessions, etc.)
+            modified_since (int): an *optional* UNIX timestamp - only objects modified after it are returned
+            repo_uri (str): the repository ArchivesSpace URI, default is None
+
+        Returns:
+            object_ids (list): the IDs of the objects, or None if an error was encountered and logged
+        """
+        parameters = {'all_ids': True}
+        if modified_since is not None:
+            parameters['modified_since'] = modified_since
+        object_ids = self.aspace_client.get(f'{repo_uri}/{record_type}', params=parameters).json()
+        if isinstance(object_ids, dict) and 'error' in object_ids:
+            record_error(f'get_modified_ids() - Unable to retrieve IDs from {repo_uri}/{record_type}', object_ids)
+        else:
+            return object_ids
+
+    def get_object_set(self, record_type, object_ids, repo_uri=''):
+        """
+        Get and return the JSON metadata for a batch of objects of the same type with a single request
+
+        Args:
+            record_type (str): the type of record object you want to get (resources, archival_objects, digital_objects,
+                accessions, etc.)
+            object_ids (list): the ArchivesSpace IDs of the objects
+            repo_uri (str): the repository ArchivesSpace URI, default is None
+
+        Returns:
+            object_set (list): the JSON metadata for each object found, or None if an error was encountered and logged
+        """
+        object_set = self.aspace_client.get(f'{repo_uri}/{record_type}',
+                                            params={'id_set': ','.join(str(object_id) for object_id in object_ids)}
+                                            ).json()
+        if isinstance(object_set, dict) and 'error' in object_set:
+            record_error(f'get_object_set() - Unable to retrieve objects from {repo_uri}/{record_type}', object_set)
+        else:
+            return object_set
+
+    def update_object(self, object_uri, updated_json):
+        """
+        Posts the updated JSON metadata for the given object_uri to ArchivesSpace
+
+        Args:
+            object_uri (str): the original object's URI for posting to the client
+            updated_json (dict): the updated metadata for the object
+
+        Returns:
+            update_message (dict): ArchivesSpace response or None if an error was encountered and logged
+        """
+        update_message = self.aspace_client.post(f'{object_uri}', json=updated_json).json()
+        if 'error' in update_message:
+            record_error('update_object() - Update failed due to following error', update_message)
+        else:
+            return update_message
+
+    def create_object(self, record_type, object_json, repo_uri=''):
+        """
+        Posts JSON metadata to ArchivesSpace as a new object
+
+        Args:
+            record_type (str): the type of record object you want to create (resources, archival_objects,
+                digital_objects, accessions, etc.)
+            object_json (dict): the metadata for the new object
+            repo_uri (str): the repository ArchivesSpace URI, default is None
+
+        Returns:
+            create_message (dict): ArchivesSpace response or None if an error was encountered and logged
+        """
+        create_message = self.aspace_client.post(f'{repo_uri}/{record_type}', json=object_json).json()
+        if 'error' in create_message:
+            record_error('create_object() - Create failed due to following error', create_message)
+        else:
+            return create_message
+
+    def update_suppression(self, object_uri, suppression):
+        """
+        Suppresses or unsuppresses the given object_uri in ArchivesSpace
+
+        Args:
+            object_uri (str): the original object's URI for posting to the client
+            suppression (bool): to suppress the object, set to True. To unsuppress, set to False
+
+        Returns:
+            update_message (dict): ArchivesSpace response or None if an error was encountered and logged
+        """
+        suppress_message = self.aspace_client.post(f'{object_uri}/suppressed',
+                                                   params={"suppressed": suppression}).json()
+        if 'error' in suppress_message:
+            record_error('update_suppression() - Suppression failed due to following error', suppress_message)
+        else:
+            return suppress_message
+
+    def search_objects(self, query, obj_type=None, repo_id=None):
+        """
+        Searches ArchivesSpace for the given payload and optional repo and returns the results list.
+
+        Args:
+            query (dict): a valid ArchivesSpace json query
+            obj_type (int): an *optional* object type (e.g. 'top_container', 'resource', etc.) to filter search results by
+            repo_id (int): an *optional* repo_id to search in
+
+        Returns:
+            result (list): ArchivesSpace response or None
+        """
+        type_filter = '' if obj_type is None else f'&type[]={obj_type}'
+        if repo_id:
+            search_results = self.aspace_client.get(f'/repositories/{repo_id}/search?aq={json.dumps(query)}{type_filter}&page=1').json()
+        else:
+            search_results = self.aspace_client.get(f'/search?aq={json.dumps(query)}{type_filter}&page=1').json()
+        if 'error' in search_results:
+            record_error('search_object() - Search failed due to following error', search_results)
+        else:
+            if len(search_results['results']) > 0:
+                return search_results['results']
+
+    def delete_object(self, object_uri):
+        """
+        Deletes the given object from ArchivesSpace, given the object's URI. WARNING: deletions in ArchivesSpace are
+        permanent!
+
+        Args:
+            object_uri (str): the object's URI for deletion
+
+        Returns:
+            update_message (dict): ArchivesSpace response or None if an error was encountered and logged
+        """
+        delete_message = self.aspace_client.delete(f'{object_uri}').json()
+        if 'error' in delete_message:
+            record_error('delete_object() - Delete failed due to following error', delete_message)
+        else:
+            return delete_message
+
+
+class ThrottleProfile:
+
+    def __init__(self, windows=(), requests_per_second=None, max_in_flight=None):
+        """
+        Limits the requests made to ArchivesSpace by time of day, so bulk jobs are gentle while ArchivesSpace serves
+        public discovery and staff work, and run flat out at night. The limits are looked up again before every
+        request, so a long job speeds up and slows down by itself as it crosses from one window to the next. The
+        limits apply to each client throttled with the profile, so divide them by the number of worker processes.
+
+        Args:
+            windows (list): the time windows, each a dict with start and end local times as HH:MM (a window ending
+                before it starts runs past midnight), optional days as weekday numbers (0 is Monday), and the
+                requests_per_second and max_in_flight allowed in the window. The first window containing the time is
+                used
+            requests_per_second (float): the most requests started each second outside the windows, default is None
+                (no limit)
+            max_in_flight (int): the most requests running at once outside the windows, default is None (no limit)
+        """
+        self.windows = [dict(window, start=clock_minutes(window['start']), end=clock_minutes(window['end']))
+                        for window in windows]
+        self.default_limits = (requests_per_second, max_in_flight)
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.next_request_time = 0.0
+
+    def current_limits(self, now=None):
+        """
+        Gets the limits of the window containing the given time
+
+        Args:
+            now (time.struct_time): the local time to look up, default is the current time
+
+        Returns:
+            requests_per_second (float): the most requests started each second, or None for no limit
+            max_in_flight (int): the most requests running at once, or None for no limit
+        """
+        now = now or time.localtime()
+        now_minutes = now.tm_hour * 60 + now.tm_min
+        for window in self.windows:
+            if window['start'] <= window['end']:
+                in_window = window['start'] <= now_minutes < window['end']
+            else:
+                in_window = now_minutes >= window['start'] or now_minutes < window['end']
+            if in_window and now.tm_wday in window.get('days', range(7)):
+                return window.get('requests_per_second'), window.get('max_in_flight')
+        return self.default_limits
+
+    def acquire(self):
+        """
+        Waits until a request may start under the limits of the current window
+        """
+        with self.condition:
+            requests_per_second, max_in_flight = self.current_limits()
+            while max_in_flight is not None and self.in_flight >= max_in_flight:
+                self.condition.wait(timeout=60)  # Wake up now and then in case a new window allows more requests
+                requests_per_second, max_in_flight = self.current_limits()
+            self.in_flight += 1
+            start_time = max(self.next_request_time, time.monotonic())
+            self.next_request_time = start_time + (1 / requests_per_second if requests_per_second else 0)
+        time.sleep(max(start_time - time.monotonic(), 0))
+
+    def release(self):
+        """
+        Frees the place of a finished request
+        """
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def throttle(self, request_function):
+        """
+        Wraps a function that makes requests, such as requests.Session.request, so every call keeps to the profile
+
+        Args:
+            request_function (function): the function to throttle
+
+        Returns:
+            throttled_function (function): the function waiting for acquire() before each call
+        """
+        def throttled_function(*args, **kwargs):
+            self.acquire()
+            try:
+                return request_function(*args, **kwargs)
+            finally:
+                self.release()
+        return throttled_function
+
+
+def client_login(as_api, as_un, as_pw):
+    """
+    Login to the ArchivesSnake client and return client
+
+    Args:
+        as_api (str): ArchivesSpace API URL
+        as_un (str): ArchivesSpace username - admin rights preferred
+        as_pw (str): ArchivesSpace password
+
+    Returns:
+        client (ASnake.client object): client object from ASnake.client to allow to connect to the ASpace API
+    """
+    from asnake.client import ASnakeClient
+    from asnake.client.web_client import ASnakeAuthError
+
+    client = ASnakeClient(baseurl=as_api, username=as_un, password=as_pw)
+
+    try:
+        client.authorize()
+    except ASnakeAuthError as e:
+        print(f'ERROR authorizing ASnake client: {e}')
+        logger.error(f'ERROR authorizing ASnake client: {e}')
+        return ASnakeAuthError
+    else:
+        return client
+
+
+def clock_minutes(clock_time):
+    """
+    Converts a time of day to the number of minutes since midnight
+
+    Args:
+        clock_time (str): the time as HH:MM
+
+    Returns:
+        minutes (int): the number of minutes since midnight
+    """
+    hours, minutes = clock_time.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def read_throttle_profile(profile_path):
+    """
+    Reads a ThrottleProfile from a JSON file, such as
+    {"windows": [{"start": "08:00", "end": "18:00", "days": [0, 1, 2, 3, 4], "requests_per_second": 2,
+    "max_in_flight": 2}], "requests_per_second": 20, "max_in_flight": 8}
+
+    Args:
+        profile_path (str): filepath of the JSON throttle profile
+
+    Returns:
+        throttle_profile (ThrottleProfile): the profile, or None if the file could not be read
+    """
+    try:
+        with open(profile_path, 'r', encoding='UTF-8') as profile_file:
+            profile = json.load(profile_file)
+        return ThrottleProfile(profile.get('windows', ()), profile.get('requests_per_second'),
+                               profile.get('max_in_flight'))
+    except (OSError, ValueError, KeyError) as profile_error:
+        record_error(f'read_throttle_profile() - Unable to read throttle profile {profile_path}', profile_error)
+
+
+def check_url(url):
+    """
+    Args:
+        url (str): uri to be checked
+
+    Returns:
+        status (str): status of the request
+    """
+    import requests
+
+    try:
+        response = requests.head(url)
+        if response.status_code == 200:
+            return True
+        else:
+            logger.error(f'ERROR with requested url: {url}.  Status code: {response.status_code}.')
+            print(f'ERROR with requested url: {url}.  Status code: {response.status_code}.')
+    except requests.exceptions.RequestException as e:
+        logger.error(f'ERROR fetching uri: {e}')
+        print(f'ERROR fetching uri: {e}')
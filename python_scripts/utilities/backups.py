@@ -0,0 +1,633 @@
+#!/usr/bin/env python
+# Writing, indexing and reading jsonl backups, and writing xml and parquet files
+import gzip
+import io
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+import zlib
+
+from functools import partial
+from loguru import logger
+from pathlib import Path
+from python_scripts.utilities.logs import record_error
+
+
+class BackupWriter:
+
+    def __init__(self, filepath, flush_records=100, flush_seconds=5.0, fsync='close', compression=None, index=True):
+        """
+        Appends JSON data to a jsonlines backup file like write_to_file(), but keeps the file open and writes buffered
+        records to disk in batches. Use as a context manager so the last records are written when the job ends. Writes
+        are locked, so one writer can be shared by concurrent workers. Use flush_records=1, or call flush(), when each
+        record must be on disk before its object is changed. A backup that cannot be opened or written to raises an
+        error after logging it, so a job does not go on changing objects without their backups.
+
+        Backups ending in .gz or .zst are compressed, with each batch written as its own gzip member or zstd frame, so a
+        batch can be read without decompressing the rest of the file. Read them back with read_backup(). The URI of
+        each record is added to the backup's index file for looking records up with BackupLookup.
+
+        Args:
+            filepath (str): the path of the file being written to
+            flush_records (int): write the buffered records to disk once this many are waiting, default is 100
+            flush_seconds (float): write the buffered records to disk once this many seconds have passed since the last
+                write to disk, default is 5
+            fsync (str): when to ask the operating system to save the file to the storage device - 'never', 'flush'
+                (every time buffered records are written), or 'close' (once, when the writer is closed), default is
+                'close'
+            compression (str): 'gzip', 'zstd', or None for plain jsonlines, default is None (taken from the filepath
+                extension)
+            index (bool): if False, do not write an index file, for files that are only read from start to end, default
+                is True
+        """
+        import jsonlines
+
+        if fsync not in ('never', 'flush', 'close'):
+            record_error('BackupWriter() - fsync option not valid', fsync)
+            raise ValueError(fsync)
+        self.filepath = filepath
+        self.flush_records = flush_records
+        self.flush_seconds = flush_seconds
+        self.fsync = fsync
+        self.compression = compression or backup_compression(filepath)
+        self.index = index
+        self.lock = threading.Lock()
+        self.backup_file = None
+        self.line_buffer = io.StringIO()
+        self.jsonl_writer = jsonlines.Writer(self.line_buffer)
+        self.invalid_line_error = jsonlines.InvalidLineError
+        self.buffered_records = 0
+        self.buffered_data = []
+        self.records_written = 0
+        self.last_flush = time.monotonic()
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        """
+        Opens the backup file for appending
+        """
+        try:
+            self.backup_file = open(self.filepath, 'ab')
+        except (FileNotFoundError, PermissionError, OSError) as write_file_error:
+            record_error('BackupWriter.open() - Unable to open or access jsonl file', write_file_error)
+            raise
+
+    def write(self, write_data):
+        """
+        Buffers JSON data to be written to the backup file, writing the buffer to disk if it is full or old enough
+
+        Args:
+            write_data (dict): the data to be written to the backup file
+        """
+        with self.lock:
+            if self.backup_file is None:
+                record_error('BackupWriter.write() - Backup file is not open, unable to write data', self.filepath)
+                raise ValueError(f'Backup file {self.filepath} is not open')
+            try:
+                self.jsonl_writer.write(write_data)
+            except self.invalid_line_error as bad_write_error:
+                record_error('BackupWriter.write() - Unable to write data to file', bad_write_error)
+                raise
+            self.buffered_records += 1
+            if self.index:
+                self.buffered_data.append(write_data)
+            self.records_written += 1
+            if (self.buffered_records >= self.flush_records or
+                    time.monotonic() - self.last_flush >= self.flush_seconds):
+                self._flush()
+
+    def flush(self):
+        """
+        Writes the buffered records to disk
+        """
+        with self.lock:
+            if self.backup_file is not None:
+                self._flush()
+
+    def _flush(self):
+        if self.buffered_records:
+            frame_offset = self.backup_file.tell()
+            frame = compress_frame(self.line_buffer.getvalue().encode('utf-8'), self.compression)
+            self.backup_file.write(frame)
+            self.backup_file.flush()
+            if self.fsync == 'flush':
+                os.fsync(self.backup_file.fileno())
+            if self.index:
+                write_backup_index(self.filepath, self.buffered_data, frame_offset, len(frame))
+            self.line_buffer.seek(0)
+            self.line_buffer.truncate()
+        self.buffered_records = 0
+        self.buffered_data = []
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        """
+        Writes the buffered records to disk and closes the backup file
+        """
+        with self.lock:
+            if self.backup_file is None:
+                return
+            self._flush()
+            if self.fsync == 'close':
+                os.fsync(self.backup_file.fileno())
+            self.backup_file.close()
+            self.backup_file = None
+
+
+class BackupLookup:
+
+    def __init__(self, filepath):
+        """
+        Looks up records in a plain, gzip, or zstd jsonlines backup by URI using the backup's index file, reading only
+        the part of the backup that holds the record. The backup is memory-mapped, so looking up a few records in a
+        large backup does not read the whole file. If the backup has no index file, one is built first.
+
+        Args:
+            filepath (str): the path of the backup file
+        """
+        self.filepath = filepath
+        self.compression = backup_format(filepath)
+        if not os.path.isfile(backup_index_path(filepath)):
+            build_backup_index(filepath)
+        self.index = read_backup_index(filepath)
+        self.backup_file = open(filepath, 'rb')
+        self.backup_map = mmap.mmap(self.backup_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_record(self, uri, lock_version=None):
+        """
+        Gets the backed up JSON data of a record
+
+        Args:
+            uri (str): the URI of the record
+            lock_version (int): the lock_version of the backup to return, default is None (the latest backup of the
+                record)
+
+        Returns:
+            record (dict): the JSON data of the record, or None if it is not in the backup
+        """
+        entries = self.index.get(uri, [])
+        if lock_version is not None:
+            entries = [entry for entry in entries if entry[3] == lock_version]
+        if not entries:
+            return None
+        return self.read_entry(entries[-1])
+
+    def read_entry(self, entry):
+        """
+        Gets the backed up JSON data of a record from one of its entries in the backup's index
+
+        Args:
+            entry (tuple): the (frame offset, frame length, line number, lock_version) index entry of the backup
+
+        Returns:
+            record (dict): the JSON data of the record
+        """
+        frame_offset, frame_length, line_number, _ = entry
+        frame = decompress_frame(self.backup_map[frame_offset:frame_offset + frame_length], self.compression)
+        return json.loads(frame.splitlines()[line_number])
+
+    def get_records(self, uris):
+        """
+        Gets the backed up JSON data of several records
+
+        Args:
+            uris (list): the URIs of the records
+
+        Returns:
+            records (dict): URI as key and the JSON data of the latest backup of the record as value, for each URI
+                found in the backup
+        """
+        records = {}
+        for uri in uris:
+            record = self.get_record(uri)
+            if record is not None:
+                records[uri] = record
+        return records
+
+    def close(self):
+        """
+        Closes the memory map and the backup file
+        """
+        self.backup_map.close()
+        self.backup_file.close()
+
+
+def write_to_file(filepath, write_data):
+    """
+    Writes or appends JSON data to a specified file using jsonlines. Files ending in .gz or .zst are compressed, with
+    the data appended as a new gzip member or zstd frame. The URI of the data is added to the file's index for
+    looking it up with BackupLookup
+    Args:
+        filepath (str): the path of the file being written to
+        write_data (str): the data to be written on the given filepath
+    """
+    import jsonlines
+    from jsonlines import InvalidLineError
+
+    compression = backup_compression(filepath)
+    frame_offset = os.path.getsize(filepath) if os.path.isfile(filepath) else 0
+    if compression:
+        line_buffer = io.StringIO()
+        try:
+            jsonlines.Writer(line_buffer).write(write_data)
+        except InvalidLineError as bad_write_error:
+            record_error('write_to_file() - Unable to write data to file', bad_write_error)
+            return
+        try:
+            with open(filepath, 'ab') as org_data_file:
+                org_data_file.write(compress_frame(line_buffer.getvalue().encode('utf-8'), compression))
+        except (FileNotFoundError, PermissionError, OSError) as write_file_error:
+            record_error('write_to_file() - Unable to open or access jsonl file', write_file_error)
+            return
+    else:
+        try:
+            with jsonlines.open(filepath, mode='a') as org_data_file:
+                try:
+                    org_data_file.write(write_data)
+                except InvalidLineError as bad_write_error:
+                    record_error('write_to_file() - Unable to write data to file', bad_write_error)
+                    return
+            org_data_file.close()
+        except (FileNotFoundError, PermissionError, OSError) as write_file_error:
+            record_error('write_to_file() - Unable to open or access jsonl file', write_file_error)
+            return
+    write_backup_index(filepath, [write_data], frame_offset, os.path.getsize(filepath) - frame_offset)
+
+
+def backup_compression(filepath):
+    """
+    Gets the compression to use for a backup file from its extension
+
+    Args:
+        filepath (str): the path of the backup file
+
+    Returns:
+        compression (str): 'gzip' for .gz files, 'zstd' for .zst files, or None for any other file
+    """
+    suffix = Path(filepath).suffix.lower()
+    if suffix == '.gz':
+        return 'gzip'
+    if suffix == '.zst':
+        return 'zstd'
+
+
+def compress_frame(data, compression):
+    """
+    Compresses data as a single, independently readable gzip member or zstd frame
+
+    Args:
+        data (bytes): the data to compress
+        compression (str): 'gzip', 'zstd', or None to leave the data uncompressed
+
+    Returns:
+        frame (bytes): the compressed data
+    """
+    if compression == 'gzip':
+        return gzip.compress(data)
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def backup_format(filepath):
+    """
+    Gets the compression of a backup file from the first bytes of the file
+
+    Args:
+        filepath (str): the path of the backup file
+
+    Returns:
+        compression (str): 'gzip', 'zstd', or None for a plain (or empty) file
+    """
+    with open(filepath, 'rb') as magic_reader:
+        magic_bytes = magic_reader.read(4)
+    if magic_bytes[:2] == b'\x1f\x8b':
+        return 'gzip'
+    if magic_bytes == b'\x28\xb5\x2f\xfd':
+        return 'zstd'
+
+
+def decompress_frame(frame, compression):
+    """
+    Decompresses a single gzip member or zstd frame written by compress_frame()
+
+    Args:
+        frame (bytes): the compressed data
+        compression (str): 'gzip', 'zstd', or None if the data is not compressed
+
+    Returns:
+        data (bytes): the decompressed data
+    """
+    if compression == 'gzip':
+        return gzip.decompress(frame)
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj().decompress(frame)
+    return frame
+
+
+def open_backup(filepath):
+    """
+    Opens a jsonlines backup file for reading text, decompressing gzip and zstd backups while they are read. The
+    compression is detected from the start of the file, not the extension
+
+    Args:
+        filepath (str): the path of the backup file
+
+    Returns:
+        backup_reader (io.TextIOBase): the backup file's text, one JSON record per line
+    """
+    compression = backup_format(filepath)
+    if compression == 'gzip':
+        return gzip.open(filepath, 'rt', encoding='utf-8')
+    if compression == 'zstd':
+        import zstandard
+        zstd_reader = zstandard.ZstdDecompressor().stream_reader(open(filepath, 'rb'), read_across_frames=True)
+        return io.TextIOWrapper(zstd_reader, encoding='utf-8')
+    return open(filepath, 'r', encoding='utf-8')
+
+
+def iter_backup_frames(filepath, chunk_size=1048576):
+    """
+    Reads a backup file one frame at a time - each line of a plain backup, or each gzip member or zstd frame of a
+    compressed backup
+
+    Args:
+        filepath (str): the path of the backup file
+        chunk_size (int): the number of bytes to read from a compressed backup at a time, default is 1 MiB
+
+    Returns:
+        frames (generator): yields the byte offset and length of each frame in the backup and its decompressed data
+    """
+    compression = backup_format(filepath)
+    if compression == 'zstd':
+        import zstandard
+        new_decompressor = zstandard.ZstdDecompressor().decompressobj
+    else:
+        new_decompressor = partial(zlib.decompressobj, 31)
+    with open(filepath, 'rb') as backup_reader:
+        if compression is None:
+            frame_offset = 0
+            for line in backup_reader:
+                yield frame_offset, len(line), line
+                frame_offset += len(line)
+            return
+        decompressor, frame_data = new_decompressor(), []
+        frame_offset = chunk_offset = 0
+        chunk = b''
+        while True:
+            if not chunk:
+                chunk = backup_reader.read(chunk_size)
+                if not chunk:
+                    break
+            frame_data.append(decompressor.decompress(chunk))
+            if decompressor.eof:
+                frame_end = chunk_offset + len(chunk) - len(decompressor.unused_data)
+                yield frame_offset, frame_end - frame_offset, b''.join(frame_data)
+                chunk, chunk_offset, frame_offset = decompressor.unused_data, frame_end, frame_end
+                decompressor, frame_data = new_decompressor(), []
+            else:
+                chunk_offset += len(chunk)
+                chunk = b''
+
+
+def backup_index_path(filepath):
+    """
+    Gets the path of a backup file's index file
+
+    Args:
+        filepath (str): the path of the backup file
+
+    Returns:
+        index_path (str): the path of the index file, the backup's path with .idx added
+    """
+    return f'{filepath}.idx'
+
+
+def write_backup_index(filepath, records, frame_offset, frame_length):
+    """
+    Appends the records written to a backup file in a single frame to the backup's index file. Each index line holds a
+    record's URI, the byte offset and length of its frame, its line number within the frame, and its lock_version,
+    separated by tabs. Records without a URI are not indexed
+
+    Args:
+        filepath (str): the path of the backup file
+        records (list): the JSON data of the records in the frame, in the order they were written
+        frame_offset (int): the byte offset in the backup where the frame starts
+        frame_length (int): the number of bytes in the frame
+    """
+    index_lines = [f'{record["uri"]}\t{frame_offset}\t{frame_length}\t{line_number}\t'
+                   f'{record.get("lock_version", "")}\n'
+                   for line_number, record in enumerate(records) if isinstance(record, dict) and 'uri' in record]
+    if not index_lines:
+        return
+    try:
+        with open(backup_index_path(filepath), 'a', encoding='utf-8') as index_file:
+            index_file.writelines(index_lines)
+    except (FileNotFoundError, PermissionError, OSError) as index_file_error:
+        record_error('write_backup_index() - Unable to open or access index file', index_file_error)
+
+
+def build_backup_index(filepath):
+    """
+    Writes a new index file for an existing backup file, for backups written without one
+
+    Args:
+        filepath (str): the path of the backup file
+
+    Returns:
+        record_count (int): the number of records in the backup
+    """
+    Path(backup_index_path(filepath)).unlink(missing_ok=True)
+    record_count = 0
+    for frame_offset, frame_length, frame_data in iter_backup_frames(filepath):
+        records = [json.loads(line) for line in frame_data.splitlines() if line.strip()]
+        write_backup_index(filepath, records, frame_offset, frame_length)
+        record_count += len(records)
+    return record_count
+
+
+def merge_backups(part_paths, filepath):
+    """
+    Appends backup files written separately, such as one per worker process, to a single backup file and removes them.
+    Their frames are copied as they are, so plain and compressed backups can both be merged as long as all the files
+    use the same compression, and their index lines are moved over with the frame offsets shifted to match
+
+    Args:
+        part_paths (list): the paths of the backup files to merge, missing files are skipped
+        filepath (str): the path of the backup file to append them to
+
+    Returns:
+        merged_count (int): the number of backup files merged
+    """
+    merged_count = 0
+    with open(filepath, 'ab') as backup_file:
+        for part_path in part_paths:
+            if not os.path.isfile(part_path):
+                continue
+            base_offset = backup_file.tell()
+            with open(part_path, 'rb') as part_file:
+                shutil.copyfileobj(part_file, backup_file)
+            if os.path.isfile(backup_index_path(part_path)):
+                with open(backup_index_path(part_path), 'r', encoding='utf-8') as part_index, \
+                        open(backup_index_path(filepath), 'a', encoding='utf-8') as index_file:
+                    for index_line in part_index:
+                        uri, frame_offset, index_rest = index_line.split('\t', 2)
+                        index_file.write(f'{uri}\t{int(frame_offset) + base_offset}\t{index_rest}')
+                os.remove(backup_index_path(part_path))
+            os.remove(part_path)
+            merged_count += 1
+    return merged_count
+
+
+def read_backup_index(filepath):
+    """
+    Reads a backup's index file
+
+    Args:
+        filepath (str): the path of the backup file
+
+    Returns:
+        index (dict): URI as key and a list of (frame offset, frame length, line number, lock_version) tuples as value,
+            one for each time the record was backed up, in the order they were written
+    """
+    index = {}
+    with open(backup_index_path(filepath), 'r', encoding='utf-8') as index_file:
+        for index_line in index_file:
+            uri, frame_offset, frame_length, line_number, lock_version = index_line.rstrip('\n').split('\t')
+            index.setdefault(uri, []).append((int(frame_offset), int(frame_length), int(line_number),
+                                              int(lock_version) if lock_version else None))
+    return index
+
+
+def read_backup(filepath):
+    """
+    Reads the records from a plain, gzip, or zstd jsonlines backup file one at a time
+
+    Args:
+        filepath (str): the path of the backup file
+
+    Returns:
+        records (generator): yields the JSON data of each record in the backup
+    """
+    try:
+        backup_reader = open_backup(filepath)
+    except (FileNotFoundError, PermissionError, OSError) as read_file_error:
+        record_error('read_backup() - Unable to open or access jsonl file', read_file_error)
+        return
+    with backup_reader:
+        for line in backup_reader:
+            if line.strip():
+                yield json.loads(line)
+
+
+# With time/need this could be generalized and merged with the above if we wanted to make
+# write_to_file less jsonlines specific
+def write_to_xml_file(file_path, xml_data):
+    """
+    Writes to an XML file
+    Args:
+        filepath (str): the path of the file being written to
+        xml_data (str): the xml to be written
+    """
+    try:
+        with open(file_path, 'w') as file:
+            file.write(xml_data)
+            logger.info(f"Successfully wrote XML file to {file_path}")
+            print(f"Successfully wrote XML file to {file_path}")
+    except IOError as e:
+        logger.info(f'Error writing file: {e}')
+        print(f'Error writing file: {e}')
+
+
+def arrow_batches(column_names, row_batches):
+    """
+    Turns batches of query results into pyarrow tables that all share the schema of the first batch, with columns that
+    were empty in the first batch stored as strings
+
+    Args:
+        column_names (list): the column names of the results
+        row_batches (generator): the results as lists of tuples
+
+    Returns:
+        batch_tables (generator): yields a pyarrow.Table for each batch
+    """
+    import pyarrow as pa
+
+    schema = None
+    for rows in row_batches:
+        batch_table = pa.Table.from_pylist([dict(zip(column_names, row)) for row in rows])
+        if schema is None:
+            schema = pa.schema([pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field
+                                for field in batch_table.schema])
+        yield batch_table.cast(schema)
+
+
+def write_to_parquet(filepath, column_names, row_batches):
+    """
+    Writes batches of query results to a Parquet file with one row group per batch. The schema is taken from the first
+    batch, with columns that were empty in the first batch stored as strings
+
+    Args:
+        filepath (str): the path of the Parquet file being written to
+        column_names (list): the column names of the results
+        row_batches (generator): the results as lists of tuples
+
+    Returns:
+        row_count (int): the number of rows written
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    row_count = 0
+    parquet_writer = None
+    try:
+        for batch_table in arrow_batches(column_names, row_batches):
+            if parquet_writer is None:
+                parquet_writer = pq.ParquetWriter(filepath, batch_table.schema)
+            parquet_writer.write_table(batch_table)
+            row_count += batch_table.num_rows
+        if parquet_writer is None:
+            pq.write_table(pa.table({column_name: pa.array([], pa.string()) for column_name in column_names}),
+                           filepath)
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+    return row_count
+
+
+def load_snapshot_table(snapshot_dir, table_name, columns=None):
+    """
+    Loads a table exported by snapshot_tables.py from its Parquet file into a pandas DataFrame
+
+    Args:
+        snapshot_dir (str): path to the snapshot directory
+        table_name (str): the name of the ArchivesSpace database table
+        columns (list): an *optional* list of the columns to load, default is None (all columns)
+
+    Returns:
+        table_data (pandas.DataFrame): the table's rows as of the snapshot
+    """
+    import pandas
+
+    snapshot_file = Path(snapshot_dir, f'{table_name}.parquet')
+    if not snapshot_file.exists():
+        record_error('load_snapshot_table() - No snapshot found for table', str(snapshot_file))
+        raise FileNotFoundError(snapshot_file)
+    return pandas.read_parquet(snapshot_file, columns=columns)
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# Reading, validating and grouping the rows of csv input files
+import csv
+import heapq
+import itertools
+import json
+import os
+import tempfile
+
+from loguru import logger
+from python_scripts.utilities.logs import record_error
+
+
+# Column types for read_validated_csv() schemas - the pattern a value must match and the function that converts it
+csv_column_types = {
+    'text': (r'.*\S.*', str.strip),
+    'int': (r'\s*-?\d+\s*', int),
+    'uri': (r'\s*/?(?:repositories/\d+/)?[a-z_]+(?:/[a-z_]+)*/\d+\s*', str.strip)
+}
+
+
+def read_csv(csv_file, encoding_type='UTF-8'):
+    """
+    Args:
+        csv_file (str): filepath for the subjects csv
+        encoding_type (str): the encoding type you want to use for the file provided
+
+    Returns:
+        csv_dict (generator): the rows of the csv as dictionaries, read one at a time. The file is closed once all the
+            rows have been read
+    """
+    try:
+        open_csv = open(csv_file, 'r', encoding=encoding_type, newline='')
+    except IOError as csverror:
+        logger.error(f'ERROR reading csv file: {csverror}')
+        print(f'ERROR reading csv file: {csverror}')
+    else:
+        return csv_rows(open_csv)
+
+
+def count_csv_rows(csv_file, encoding_type='UTF-8'):
+    """
+    Counts the rows of a csv file, not counting the header row, so progress can be reported against the total
+
+    Args:
+        csv_file (str): filepath for the csv
+        encoding_type (str): the encoding type you want to use for the file provided
+
+    Returns:
+        row_count (int): the number of rows, or None if the file could not be read
+    """
+    try:
+        with open(csv_file, 'r', encoding=encoding_type, newline='') as open_csv:
+            return max(sum(1 for _ in csv.reader(open_csv)) - 1, 0)
+    except (IOError, csv.Error) as csv_error:
+        record_error('count_csv_rows() - Unable to count rows of csv file', csv_error)
+
+
+def csv_rows(open_csv):
+    """
+    Reads the rows of an open csv file as dictionaries and closes the file when done
+
+    Args:
+        open_csv (io.TextIOBase): the open csv file
+
+    Returns:
+        csv_dict (generator): yields each row of the csv as a dictionary
+    """
+    with open_csv:
+        yield from csv.DictReader(open_csv)
+
+
+def validate_csv(csv_file, schema, encoding_type='UTF-8', chunk_size=10000):
+    """
+    Checks every row of a csv against a schema before any of it is used, reading it in chunks with pandas
+
+    Args:
+        csv_file (str): filepath for the csv
+        schema (dict): column name as key and column type from csv_column_types as value - add ? to the end of a type
+            (ex. 'int?') to allow empty values
+        encoding_type (str): the encoding type you want to use for the file provided
+        chunk_size (int): the number of rows to check at a time, default is 10000
+
+    Returns:
+        csv_errors (list): a message for each missing column and each bad value, empty if the csv is valid
+    """
+    import pandas
+
+    try:
+        csv_columns = pandas.read_csv(csv_file, nrows=0, encoding=encoding_type).columns
+        missing_columns = [column for column in schema if column not in csv_columns]
+        if missing_columns:
+            return [f'missing column(s): {", ".join(missing_columns)}']
+        csv_errors = []
+        for csv_chunk in pandas.read_csv(csv_file, usecols=list(schema), dtype=str, keep_default_na=False,
+                                         encoding=encoding_type, chunksize=chunk_size):
+            for column, column_type in schema.items():
+                pattern = csv_column_types[column_type.rstrip('?')][0]
+                valid_values = csv_chunk[column].str.fullmatch(pattern)
+                if column_type.endswith('?'):
+                    valid_values |= csv_chunk[column].str.strip() == ''
+                for row_index in csv_chunk.index[~valid_values]:
+                    # Row numbers count the header as row 1, like a spreadsheet
+                    csv_errors.append(f'row {row_index + 2}, {column}: {csv_chunk.at[row_index, column]!r} is not a '
+                                      f'valid {column_type.rstrip("?")}')
+        return csv_errors
+    except (IOError, UnicodeDecodeError, pandas.errors.ParserError, pandas.errors.EmptyDataError) as csverror:
+        return [f'unable to read csv file: {csverror}']
+
+
+def read_validated_csv(csv_file, schema, encoding_type='UTF-8'):
+    """
+    Checks a csv against a schema, reporting every bad row at once, then reads the rows one at a time with their values
+    converted to the column types. Run it before connecting to ArchivesSpace so a bad csv stops the script early
+
+    Args:
+        csv_file (str): filepath for the csv
+        schema (dict): column name as key and column type from csv_column_types as value - add ? to the end of a type
+            (ex. 'int?') to allow empty values, which are read as None
+        encoding_type (str): the encoding type you want to use for the file provided
+
+    Returns:
+        csv_dict (generator): the rows of the csv as dictionaries, or None if the csv is not valid
+    """
+    csv_errors = validate_csv(csv_file, schema, encoding_type)
+    if csv_errors:
+        for csv_error in csv_errors:
+            record_error(f'read_validated_csv() - {csv_file}', csv_error)
+        return None
+    validated_rows = read_csv(csv_file, encoding_type)
+    if validated_rows is not None:
+        return converted_csv_rows(validated_rows, schema)
+
+
+def converted_csv_rows(validated_rows, schema):
+    """
+    Converts the values of validated csv rows to their column types
+
+    Args:
+        validated_rows (generator): the rows of a csv that passed validate_csv()
+        schema (dict): column name as key and column type from csv_column_types as value
+
+    Returns:
+        csv_dict (generator): yields each row with the schema's columns converted
+    """
+    for row in validated_rows:
+        for column, column_type in schema.items():
+            if column_type.endswith('?') and not row[column].strip():
+                row[column] = None
+            else:
+                row[column] = csv_column_types[column_type.rstrip('?')][1](row[column])
+        yield row
+
+
+def group_rows(rows, row_key, max_rows_in_memory=100000):
+    """
+    Groups rows by the record they change, so each record can be fetched and posted once for all of its rows. Rows are
+    sorted by key in memory, or, when there are more than max_rows_in_memory, sorted in runs that are written to
+    temporary files and merged back together, so inputs larger than memory can be grouped
+
+    Args:
+        rows (iterable): the rows to group, ex. from read_csv(), which must be JSON serializable
+        row_key (function): returns the key to group a row by, ex. lambda row: row['uri']. Rows with a key of None are
+            grouped under an empty string
+        max_rows_in_memory (int): the number of rows to sort in memory at a time, default is 100000
+
+    Returns:
+        row_groups (generator): yields each key, in key order, with a list of its rows in their original order
+    """
+    row_batch, run_files = [], []
+    try:
+        for row_number, row in enumerate(rows):
+            key = row_key(row)
+            row_batch.append(('' if key is None else str(key), row_number, row))
+            if len(row_batch) >= max_rows_in_memory:
+                run_files.append(write_sorted_run(row_batch))
+                row_batch = []
+        row_batch.sort(key=lambda keyed_row: keyed_row[:2])
+        sorted_rows = row_batch
+        if run_files:
+            sorted_rows = heapq.merge(*(read_sorted_run(run_file) for run_file in run_files), row_batch,
+                                      key=lambda keyed_row: keyed_row[:2])
+        for key, keyed_rows in itertools.groupby(sorted_rows, key=lambda keyed_row: keyed_row[0]):
+            yield key, [row for _, _, row in keyed_rows]
+    finally:
+        for run_file in run_files:
+            os.remove(run_file)
+
+
+def write_sorted_run(row_batch):
+    """
+    Sorts a batch of keyed rows and writes them to a temporary jsonl file for group_rows()
+
+    Args:
+        row_batch (list): (key, row number, row) tuples
+
+    Returns:
+        run_file (str): the path of the temporary file
+    """
+    row_batch.sort(key=lambda keyed_row: keyed_row[:2])
+    with tempfile.NamedTemporaryFile('w', suffix='.jsonl', encoding='utf-8', delete=False) as run_writer:
+        for keyed_row in row_batch:
+            run_writer.write(json.dumps(keyed_row) + '\n')
+    return run_writer.name
+
+
+def read_sorted_run(run_file):
+    """
+    Reads the keyed rows back from a file written by write_sorted_run()
+
+    Args:
+        run_file (str): the path of the temporary file
+
+    Returns:
+        keyed_rows (generator): yields each (key, row number, row) tuple in sorted order
+    """
+    with open(run_file, 'r', encoding='utf-8') as run_reader:
+        for line in run_reader:
+            yield tuple(json.loads(line))
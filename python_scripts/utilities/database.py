@@ -0,0 +1,399 @@
+#!/usr/bin/env python
+# Querying the ArchivesSpace database, with a cache of query results, and a local SQLite copy of records
+import hashlib
+import json
+import pickle
+import re
+import sqlite3
+
+from pathlib import Path
+from python_scripts.utilities.logs import record_error
+
+
+class ASpaceDatabase:
+
+    def __init__(self, as_db_un, as_db_pw, as_db_host, as_db_name, as_db_port, cache_dir=None):
+        """
+        Handles the connection to and data retrieval from the ArchivesSpace database
+
+        Args:
+            as_db_un (str): the username for the account to connect to the ArchivesSpace database
+            as_db_pw (str): the password for the account to connect to the ArchivesSpace database
+            as_db_host (str): the hostname for the ArchivesSpace database
+            as_db_name (str): the name of the ArchivesSpace database
+            as_db_port (int): the port number of the ArchivesSpace database
+            cache_dir (str): an *optional* directory for caching query results on disk, default is None (no caching)
+        """
+        self.aspace_username = as_db_un
+        self.aspace_password = as_db_pw
+        self.aspace_host = as_db_host
+        self.aspace_name = as_db_name
+        self.aspace_port = as_db_port
+        self.cache_dir = cache_dir
+        if self.cache_dir:
+            Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+        self.connection, self.cursor = self.connect_db()
+
+    def connect_db(self):
+        """
+        Connects to the ArchivesSpace test database with credentials provided in local secrets.py file
+
+        Returns:
+             test_connect (mysql.connection): The connection to the database
+             test_cursor (mysql.connection.cursor): The cursor of results for the database
+        """
+        import mysql.connector as mysql
+        from mysql.connector import errorcode
+
+        try:
+            self.connection = mysql.connect(user=self.aspace_username,
+                                            password=self.aspace_password,
+                                            host=self.aspace_host,
+                                            database=self.aspace_name,
+                                            port=self.aspace_port)
+        except mysql.Error as error:
+            if error.errno == errorcode.ER_ACCESS_DENIED_ERROR:
+                record_error('connect_db() - Failed to authorize username/password', error)
+                raise error
+            elif error.errno == errorcode.ER_BAD_DB_ERROR:
+                record_error('connect_db() - Database does not exist', error)
+                raise error
+            else:
+                record_error('connect_db() - Other error when connecting to the database', error)
+                raise error
+        else:
+            self.cursor = self.connection.cursor()
+            return self.connection, self.cursor
+
+    def query_database(self, statement, parameters=None, use_cache=True):
+        """
+        Runs a query on the database. If the instance has a cache_dir, the results are cached on disk and reused until
+        one of the tables the statement reads from is modified
+
+        Args:
+            statement (str): The MySQL statement to run against the database
+            parameters (tuple, dict): *optional* values for the placeholders in the statement, default is None
+            use_cache (bool): if False, always run the statement against the database, default is True
+
+        Returns:
+            results (list): Results of the returned query as a list of tuples
+        """
+        import mysql.connector as mysql
+
+        cache_file, table_versions = None, None
+        if self.cache_dir and use_cache and normalize_statement(statement).upper().startswith('SELECT'):
+            table_versions = self.table_versions(statement)
+            if table_versions is not None:
+                cache_file = Path(self.cache_dir, f'{query_cache_key(statement, parameters)}.pickle')
+                cached_results = read_query_cache(cache_file, table_versions)
+                if cached_results is not None:
+                    return cached_results
+        try:
+            self.cursor.execute(statement, parameters)
+        except mysql.Error as error:
+            record_error('query_database() - SQL query was invalid', error)
+            raise error
+        else:
+            results = self.cursor.fetchall()
+        if cache_file:
+            write_query_cache(cache_file, table_versions, results)
+        return results
+
+    def stream_query(self, statement, parameters=None, batch_size=1000):
+        """
+        Runs a query on the database with its own unbuffered (server-side) cursor, so the rows are read from the server
+        in batches as they are consumed instead of being held in memory all at once
+
+        Args:
+            statement (str): The MySQL statement to run against the database
+            parameters (tuple, dict): *optional* values for the placeholders in the statement, default is None
+            batch_size (int): the number of rows to read from the server at a time, default is 1000
+
+        Returns:
+            column_names (list): the column names of the results
+            row_batches (generator): yields the results as lists of tuples of up to batch_size rows
+        """
+        import mysql.connector as mysql
+
+        stream_cursor = self.connection.cursor(buffered=False)
+        try:
+            stream_cursor.execute(statement, parameters)
+        except mysql.Error as error:
+            stream_cursor.close()
+            record_error('stream_query() - SQL query was invalid', error)
+            raise error
+        if stream_cursor.description is None:
+            stream_cursor.close()
+            return [], iter(())
+        column_names = [column[0] for column in stream_cursor.description]
+
+        def row_batches():
+            try:
+                while rows := stream_cursor.fetchmany(batch_size):
+                    yield rows
+            finally:
+                stream_cursor.close()
+
+        return column_names, row_batches()
+
+    def table_versions(self, statement):
+        """
+        Gets the last modification time of every table the statement reads from, using information_schema UPDATE_TIME
+        with MySQL 8's cache of table statistics turned off for the session, so the time is current rather than up to a
+        day old. Tables whose UPDATE_TIME is not set, because they have not been changed since the server started, use
+        MAX(system_mtime) instead, which reads the system_mtime index of ArchivesSpace's record tables rather than the
+        whole table. Any later change, deletions included, sets the table's UPDATE_TIME and so changes its version -
+        only a deletion followed by a server restart before the query is run again goes unnoticed.
+
+        Args:
+            statement (str): The MySQL statement to get the table versions for
+
+        Returns:
+            table_versions (dict): table name as key and modification time as value, or None if a table's version could
+                not be determined and the results should not be cached
+        """
+        import mysql.connector as mysql
+
+        tables = referenced_tables(statement)
+        if not tables:
+            return None
+        try:
+            self.cursor.execute('SET SESSION information_schema_stats_expiry = 0')
+        except mysql.Error:  # MySQL before 8.0 and MariaDB do not cache table statistics
+            pass
+        placeholders = ', '.join(['%s'] * len(tables))
+        self.cursor.execute('SELECT TABLE_NAME, UPDATE_TIME FROM information_schema.tables '
+                            f'WHERE TABLE_SCHEMA = %s AND TABLE_NAME IN ({placeholders})',
+                            (self.aspace_name, *tables))
+        table_versions = {table_name: update_time for table_name, update_time in self.cursor.fetchall()}
+        for table in tables:
+            if table_versions.get(table) is None:
+                try:
+                    self.cursor.execute(f'SELECT MAX(system_mtime) FROM `{table}`')
+                except mysql.Error:
+                    return None
+                table_versions[table] = self.cursor.fetchone()[0]
+        return table_versions
+
+    def close_connection(self):
+        """
+        Closes the cursor and connection to the ArchivesSpace database
+        """
+        self.cursor.close()
+        self.connection.close()
+
+
+class LocalRecordStore:
+
+    def __init__(self, store_path):
+        """
+        Keeps a local SQLite copy of ArchivesSpace record JSON, kept up to date by sync_records.py, so read-heavy jobs
+        can work from disk instead of the API
+
+        Args:
+            store_path (str): the filepath of the SQLite database file, created if it does not exist
+        """
+        self.store_path = store_path
+        self.connection = sqlite3.connect(store_path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS records (uri TEXT PRIMARY KEY, record_type TEXT, '
+                                'repo_id INTEGER, object_id INTEGER, lock_version INTEGER, system_mtime TEXT, '
+                                'json TEXT)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS records_type_repo ON records (record_type, repo_id)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS sync_state (record_type TEXT, repo_id INTEGER, '
+                                'last_mtime TEXT, last_sync TEXT, PRIMARY KEY (record_type, repo_id))')
+        self.connection.commit()
+
+    def save_records(self, record_type, repo_id, records):
+        """
+        Inserts or replaces records in the store
+
+        Args:
+            record_type (str): the type of the records (resources, archival_objects, digital_objects, etc.)
+            repo_id (int): the repository ID of the records, 0 for records that do not belong to a repository
+            records (list): the JSON metadata of the records
+        """
+        self.connection.executemany('INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                    [(record['uri'], record_type, repo_id, int(record['uri'].split('/')[-1]),
+                                      record.get('lock_version'), record.get('system_mtime'), json.dumps(record))
+                                     for record in records])
+        self.connection.commit()
+
+    def delete_records(self, record_type, repo_id, object_ids):
+        """
+        Removes records from the store, for records deleted in ArchivesSpace
+
+        Args:
+            record_type (str): the type of the records
+            repo_id (int): the repository ID of the records
+            object_ids (list): the ArchivesSpace IDs of the records to remove
+        """
+        self.connection.executemany('DELETE FROM records WHERE record_type = ? AND repo_id = ? AND object_id = ?',
+                                    [(record_type, repo_id, object_id) for object_id in object_ids])
+        self.connection.commit()
+
+    def get_record(self, uri):
+        """
+        Gets a record's JSON metadata from the store
+
+        Args:
+            uri (str): the record's URI
+
+        Returns:
+            record (dict): the JSON metadata for the record, or None if it is not in the store
+        """
+        row = self.connection.execute('SELECT json FROM records WHERE uri = ?', (uri,)).fetchone()
+        if row:
+            return json.loads(row[0])
+
+    def iter_records(self, record_type, repo_id=None):
+        """
+        Iterates over the stored records of a type, optionally only those in one repository
+
+        Args:
+            record_type (str): the type of the records
+            repo_id (int): an *optional* repository ID to limit the records to
+
+        Returns:
+            records (generator): yields the JSON metadata of each record
+        """
+        if repo_id is None:
+            rows = self.connection.execute('SELECT json FROM records WHERE record_type = ? ORDER BY uri',
+                                           (record_type,))
+        else:
+            rows = self.connection.execute('SELECT json FROM records WHERE record_type = ? AND repo_id = ? '
+                                           'ORDER BY uri', (record_type, repo_id))
+        for row in rows:
+            yield json.loads(row[0])
+
+    def stored_ids(self, record_type, repo_id):
+        """
+        Gets the ArchivesSpace IDs of all stored records of a type in a repository
+
+        Args:
+            record_type (str): the type of the records
+            repo_id (int): the repository ID of the records
+
+        Returns:
+            object_ids (set): the ArchivesSpace IDs of the stored records
+        """
+        rows = self.connection.execute('SELECT object_id FROM records WHERE record_type = ? AND repo_id = ?',
+                                       (record_type, repo_id))
+        return {row[0] for row in rows}
+
+    def last_mtime(self, record_type, repo_id):
+        """
+        Gets the modification time the last sync of a record type and repository reached
+
+        Args:
+            record_type (str): the type of the records
+            repo_id (int): the repository ID of the records
+
+        Returns:
+            last_mtime (str): the last modification time synced, or None if it has never been synced
+        """
+        row = self.connection.execute('SELECT last_mtime FROM sync_state WHERE record_type = ? AND repo_id = ?',
+                                      (record_type, repo_id)).fetchone()
+        if row:
+            return row[0]
+
+    def set_last_mtime(self, record_type, repo_id, last_mtime, last_sync):
+        """
+        Records the modification time a sync of a record type and repository reached
+
+        Args:
+            record_type (str): the type of the records
+            repo_id (int): the repository ID of the records
+            last_mtime (str): the latest modification time synced
+            last_sync (str): when the sync ran
+        """
+        self.connection.execute('INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)',
+                                (record_type, repo_id, last_mtime, last_sync))
+        self.connection.commit()
+
+    def close(self):
+        """
+        Closes the connection to the store
+        """
+        self.connection.close()
+
+
+def normalize_statement(statement):
+    """
+    Collapses whitespace and removes the trailing semicolon of an SQL statement so that the same query written in
+    different ways gets the same cache key
+
+    Args:
+        statement (str): the SQL statement to normalize
+
+    Returns:
+        normalized_statement (str): the statement with single spaces and no trailing semicolon
+    """
+    return ' '.join(statement.split()).rstrip(';').strip()
+
+
+def query_cache_key(statement, parameters=None):
+    """
+    Creates the cache key for an SQL statement and its parameters
+
+    Args:
+        statement (str): the SQL statement
+        parameters (tuple, dict): the values for the placeholders in the statement, default is None
+
+    Returns:
+        cache_key (str): the sha256 hex digest of the normalized statement and the parameters
+    """
+    key_data = json.dumps([normalize_statement(statement), parameters], sort_keys=True, default=str)
+    return hashlib.sha256(key_data.encode('utf-8')).hexdigest()
+
+
+def referenced_tables(statement):
+    """
+    Finds the names of the tables an SQL statement reads from in its FROM and JOIN clauses
+
+    Args:
+        statement (str): the SQL statement
+
+    Returns:
+        tables (list): the sorted, unique table names referenced by the statement
+    """
+    table_names = re.findall(r'\b(?:FROM|JOIN)\s+`?(\w+)`?', statement, re.IGNORECASE)
+    return sorted({table_name for table_name in table_names if table_name.lower() != 'information_schema'})
+
+
+def read_query_cache(cache_file, table_versions):
+    """
+    Reads cached query results if they were cached when the tables had the given versions
+
+    Args:
+        cache_file (Path): the cache file for the query
+        table_versions (dict): the current modification times of the tables the query reads from
+
+    Returns:
+        results (list): the cached query results, or None if there is no valid cache entry
+    """
+    try:
+        with open(cache_file, 'rb') as cache_reader:
+            cache_entry = pickle.load(cache_reader)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return None
+    if cache_entry['table_versions'] == table_versions:
+        return cache_entry['results']
+
+
+def write_query_cache(cache_file, table_versions, results):
+    """
+    Writes query results and the table versions they were read at to the cache file
+
+    Args:
+        cache_file (Path): the cache file for the query
+        table_versions (dict): the modification times of the tables the query reads from
+        results (list): the query results to cache
+    """
+    temp_file = Path(f'{cache_file}.tmp')
+    try:
+        with open(temp_file, 'wb') as cache_writer:
+            pickle.dump({'table_versions': table_versions, 'results': results}, cache_writer)
+        temp_file.replace(cache_file)
+    except (PermissionError, OSError) as cache_error:
+        record_error('write_query_cache() - Unable to write query cache file', cache_error)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# Logging for the scripts - the log file and console settings, and recording errors
+from loguru import logger
+from pathlib import Path
+
+
+# Console and log settings changed by setup_logging() - quiet stops echo() printing anything but errors, and messages
+# longer than payload_length are cut short in the console and the log
+log_settings = {'quiet': False, 'payload_length': None}
+
+
+def setup_logging(log_name, log_dir='./logs', level='INFO', quiet=False, payload_length=1000):
+    """
+    Sets up a script's daily log file with a sink that writes from a background thread, so the script's loops do not
+    wait for the disk, and sets how much goes to the console and the log. Messages longer than payload_length, such as
+    the JSON of a whole record, are cut short - full records belong in the backup files, not the log. Messages logged
+    with logger.bind(full_payload=True), such as the dry run updates updates_from_logs.py replays, are kept whole
+
+    Args:
+        log_name (str): the start of the log filename, usually the script name
+        log_dir (str): the directory of the log files, default is ./logs
+        level (str): the lowest loguru level written to the log, such as DEBUG, INFO or WARNING, default is INFO
+        quiet (bool): if True, echo() prints only errors and progress reports to the console
+        payload_length (int): the most characters of a message kept, or None to keep whole messages, default is 1000
+    """
+    log_settings.update(quiet=quiet, payload_length=payload_length)
+    logger.remove()
+    logger.configure(patcher=truncate_record)
+    logger.add(str(Path(log_dir, f'{log_name}_{{time:YYYY-MM-DD}}.log')), format="{time}-{level}: {message}",
+               level=level, enqueue=True)
+
+
+def truncate_record(record):
+    """
+    Cuts a loguru record's message short with truncate_payload(), unless it was logged with
+    logger.bind(full_payload=True)
+
+    Args:
+        record (dict): the loguru record
+    """
+    if not record['extra'].get('full_payload'):
+        record.update(message=truncate_payload(record['message']))
+
+
+def truncate_payload(message):
+    """
+    Cuts a message short at the payload_length set by setup_logging()
+
+    Args:
+        message (any): the message, converted to a string
+
+    Returns:
+        message (str): the message, ending with the number of characters cut if it was too long
+    """
+    message = str(message)
+    payload_length = log_settings['payload_length']
+    if payload_length and len(message) > payload_length:
+        return f'{message[:payload_length]}... ({len(message) - payload_length} more characters)'
+    return message
+
+
+def echo(message, error=False):
+    """
+    Prints a message to the console, cut short at the payload_length set by setup_logging(), unless quiet mode is on
+    and it is not an error
+
+    Args:
+        message (any): the message to print
+        error (bool): if True, print the message in quiet mode too
+    """
+    if error or not log_settings['quiet']:
+        print(truncate_payload(message))
+
+
+def record_error(message, status_input):
+    """
+    Prints and logs an error message and the code/parameters causing the error
+
+    Args:
+        message (str): message to prefix the error code
+        status_input (str, tuple, bool): error code or input parameters producing the error
+    """
+    try:
+        echo(f'{message}: {status_input}', error=True)
+        logger.error(f'{message}: {status_input}')
+    except TypeError as input_error:
+        print(f'record_error() - Input is invalid for recording error: {input_error}')
+        logger.error(f'record_error() - Input is invalid for recording error: {input_error}')
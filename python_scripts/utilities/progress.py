@@ -0,0 +1,707 @@
+#!/usr/bin/env python
+# Journals, ledgers and work queues that let scripts resume, and progress and outcome reports
+import hashlib
+import heapq
+import itertools
+import json
+import sqlite3
+import threading
+import time
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from loguru import logger
+from python_scripts.utilities.backups import BackupWriter, read_backup
+from python_scripts.utilities.logs import record_error
+
+
+class ProgressJournal:
+
+    # Statuses that mean a row needs no more work - rows with any other status are tried again when resuming
+    finished_statuses = ('posted', 'unchanged')
+
+    def __init__(self, journal_path, resume=False):
+        """
+        Keeps a durable SQLite record of the status of each input row of a bulk script, keyed by row_hash(), so a run
+        that stops part way can be resumed without trimming the input. Each status is committed as soon as it is
+        recorded. Statuses are 'fetched' once a row's record has been read and backed up, then 'posted' or
+        'unchanged' when the row is finished, or 'failed' or 'not found' when it should be tried again.
+
+        Args:
+            journal_path (str): the filepath of the SQLite journal file, created if it does not exist
+            resume (bool): if True, the rows a previous run finished are reported as finished by is_finished() so
+                they can be skipped, otherwise every row is worked on again, default is False
+        """
+        self.journal_path = journal_path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(journal_path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS row_progress (row_hash TEXT PRIMARY KEY, uri TEXT, '
+                                'status TEXT, updated TEXT)')
+        self.connection.commit()
+        self.finished_rows = self.rows_with_status(self.finished_statuses) if resume else set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def rows_with_status(self, statuses):
+        """
+        Gets the hashes of the rows with any of the given statuses
+
+        Args:
+            statuses (tuple): the statuses to look for
+
+        Returns:
+            row_hashes (set): the hashes of the rows with those statuses
+        """
+        with self.lock:
+            rows = self.connection.execute(f'SELECT row_hash FROM row_progress WHERE status IN '
+                                           f'({", ".join("?" * len(statuses))})', tuple(statuses)).fetchall()
+        return {row[0] for row in rows}
+
+    def is_finished(self, row_key):
+        """
+        Checks whether a previous run finished a row
+
+        Args:
+            row_key (str): the row's hash from row_hash()
+
+        Returns:
+            finished (bool): True if resuming and the row had a finished status when the journal was opened
+        """
+        return row_key in self.finished_rows
+
+    def mark(self, row_key, uri, status):
+        """
+        Records the status of a row
+
+        Args:
+            row_key (str): the row's hash from row_hash()
+            uri (str): the URI of the row's record, or None if it is not known
+            status (str): the row's status
+        """
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO row_progress VALUES (?, ?, ?, ?)',
+                                    (row_key, uri, status, time.strftime('%Y-%m-%d %H:%M:%S')))
+            self.connection.commit()
+
+    def status_counts(self):
+        """
+        Counts the rows with each status
+
+        Returns:
+            status_counts (dict): the number of rows with each status
+        """
+        with self.lock:
+            return dict(self.connection.execute('SELECT status, COUNT(*) FROM row_progress GROUP BY status'))
+
+    def close(self):
+        """
+        Closes the connection to the journal
+        """
+        with self.lock:
+            self.connection.close()
+
+
+class ChangeLedger:
+
+    def __init__(self, ledger_path, environment):
+        """
+        Keeps a local SQLite ledger of the changes update scripts have applied, as (environment, URI, fingerprint,
+        lock_version) entries, so a rerun of the same input can skip the rows whose change is already applied without
+        fetching their records. Call refresh() before a run to find the ledger's records that were changed since their
+        change was applied, whose rows are fetched and checked again.
+
+        Args:
+            ledger_path (str): the filepath of the SQLite ledger file, created if it does not exist
+            environment (str): the ArchivesSpace instance the changes were applied to, such as its API URL
+        """
+        self.ledger_path = ledger_path
+        self.environment = environment
+        self.lock = threading.Lock()
+        self.current_versions = {}
+        self.connection = sqlite3.connect(ledger_path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS change_ledger (environment TEXT, uri TEXT, '
+                                'fingerprint TEXT, lock_version INTEGER, applied INTEGER, '
+                                'PRIMARY KEY (environment, uri, fingerprint))')
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def refresh(self, local_aspace, batch_size=100):
+        """
+        Gets the current lock_version of the ledger's records that were modified in ArchivesSpace since the earliest
+        change of their record type was applied. One modified_since request for each record type in each repository
+        narrows the ledger down to those records, which include the records the changes themselves posted, and they
+        are fetched in batches with one id_set request each to compare their lock_version with the ledger's. A record
+        whose lock_version still matches the ledger's has not changed since, so its rows are skipped without fetching
+        it again.
+
+        Args:
+            local_aspace (ASpaceAPI): an instance of the ASpace API for connecting to the client
+            batch_size (int): the number of records to fetch per request, default is 100
+        """
+        with self.lock:
+            ledger_rows = self.connection.execute('SELECT uri, applied FROM change_ledger WHERE environment = ?',
+                                                  (self.environment,)).fetchall()
+        earliest_applied = {}
+        ledger_ids = {}
+        for uri, applied in ledger_rows:
+            parent_uri, object_id = uri.rstrip('/').rsplit('/', 1)
+            earliest_applied[parent_uri] = min(applied, earliest_applied.get(parent_uri, applied))
+            ledger_ids.setdefault(parent_uri, set()).add(object_id)
+        current_versions = {}
+        for parent_uri, applied in earliest_applied.items():
+            repo_uri, _, record_type = parent_uri.rpartition('/')
+            modified_ids = local_aspace.get_modified_ids(record_type, applied, repo_uri)
+            if modified_ids is None:  # Could not check, so check every record of the type
+                check_ids = sorted(ledger_ids[parent_uri])
+            else:
+                check_ids = sorted(ledger_ids[parent_uri] & {str(object_id) for object_id in modified_ids})
+            # Records that cannot be fetched keep a lock_version of None, so their rows are fetched again
+            current_versions.update((f'{parent_uri}/{object_id}', None) for object_id in check_ids)
+            for batch_start in range(0, len(check_ids), batch_size):
+                records = local_aspace.get_object_set(record_type, check_ids[batch_start:batch_start + batch_size],
+                                                      repo_uri)
+                for record in records or []:
+                    current_versions[record['uri']] = record.get('lock_version')
+        self.current_versions = current_versions
+
+    def is_applied(self, uri, fingerprint, lock_version=None):
+        """
+        Checks whether a change is already applied to a record
+
+        Args:
+            uri (str): the record's URI
+            fingerprint (str): the change's fingerprint
+            lock_version (int): the record's current lock_version if it has been fetched, otherwise the lock_version
+                refresh() found for the record is used, default is None
+
+        Returns:
+            applied (bool): True if the ledger has the change and the record has not changed since it was applied
+        """
+        with self.lock:
+            ledger_row = self.connection.execute('SELECT lock_version FROM change_ledger WHERE environment = ? AND '
+                                                 'uri = ? AND fingerprint = ?',
+                                                 (self.environment, uri, fingerprint)).fetchone()
+        if ledger_row is None:
+            return False
+        if lock_version is None:
+            if uri not in self.current_versions:  # Not modified since the earliest change of its type was applied
+                return True
+            lock_version = self.current_versions[uri]
+        return lock_version is not None and ledger_row[0] == lock_version
+
+    def record(self, uri, fingerprint, lock_version):
+        """
+        Records that a change has been applied to a record
+
+        Args:
+            uri (str): the record's URI
+            fingerprint (str): the change's fingerprint
+            lock_version (int): the record's lock_version with the change applied
+        """
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO change_ledger VALUES (?, ?, ?, ?, ?)',
+                                    (self.environment, uri, fingerprint, lock_version, int(time.time())))
+            self.connection.commit()
+
+    def close(self):
+        """
+        Closes the connection to the ledger
+        """
+        with self.lock:
+            self.connection.close()
+
+
+class WorkQueue:
+
+    def __init__(self, queue_path, lease_seconds=600):
+        """
+        Shares the input rows of one job between workers on several hosts through a SQLite file on a shared volume,
+        without a broker service. The rows are loaded once as numbered chunks. Each worker claims a chunk, which leases
+        it to that worker for lease_seconds. A chunk whose lease runs out, because its worker stopped or lost its
+        connection, can be claimed again by another worker. A chunk is only marked done by the worker holding its
+        current lease, so each chunk's completion is recorded exactly once. A chunk may still be worked on twice if its
+        lease runs out part way, so use a ProgressJournal or ChangeLedger to make repeated rows harmless.
+
+        The shared volume must support the file locking SQLite relies on, such as a local disk or SMB share.
+
+        Args:
+            queue_path (str): the filepath of the SQLite queue file, created if it does not exist
+            lease_seconds (float): how long a claimed chunk stays leased to its worker without renew(), default is 600
+        """
+        self.queue_path = queue_path
+        self.lease_seconds = lease_seconds
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(queue_path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS queue_info (source TEXT, chunk_count INTEGER, '
+                                'loaded TEXT)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS chunks (chunk_id INTEGER PRIMARY KEY, rows TEXT, '
+                                'status TEXT, worker TEXT, lease_expires REAL, attempt INTEGER, completed TEXT, '
+                                'results TEXT)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def load(self, rows, source, chunk_size=100):
+        """
+        Loads the input rows into the queue as chunks, unless another worker already loaded them. Every worker can
+        call load() with the same input, and only the first one stores it
+
+        Args:
+            rows (iterable): the input rows, such as the rows returned by read_csv()
+            source (str): the name of the input, such as the CSV's filename, checked against the input already loaded
+            chunk_size (int): the number of rows in each chunk, default is 100
+
+        Returns:
+            chunk_count (int): the number of chunks in the queue, or None if it holds a different input
+        """
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                queue_info = self.connection.execute('SELECT source, chunk_count FROM queue_info').fetchone()
+                if queue_info is None:
+                    chunk_count = 0
+                    row_iterator = iter(rows)
+                    while chunk_rows := list(itertools.islice(row_iterator, chunk_size)):
+                        self.connection.execute('INSERT INTO chunks VALUES (?, ?, ?, NULL, NULL, 0, NULL, NULL)',
+                                                (chunk_count, json.dumps(chunk_rows, default=str), 'pending'))
+                        chunk_count += 1
+                    self.connection.execute('INSERT INTO queue_info VALUES (?, ?, ?)',
+                                            (source, chunk_count, time.strftime('%Y-%m-%d %H:%M:%S')))
+                    queue_info = (source, chunk_count)
+                self.connection.execute('COMMIT')
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+        if queue_info[0] != source:
+            record_error(f'WorkQueue.load() - Queue already holds a different input, not {source}', queue_info[0])
+            return None
+        return queue_info[1]
+
+    def claim(self, worker_id):
+        """
+        Leases the next chunk that is waiting, or whose lease has run out, to a worker
+
+        Args:
+            worker_id (str): the name of the worker, such as its hostname and process ID
+
+        Returns:
+            claimed_chunk (tuple): the chunk ID, the lease attempt number and the chunk's rows, or None if no chunk is
+                available
+        """
+        now = time.time()
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                chunk = self.connection.execute("SELECT chunk_id, attempt, rows FROM chunks WHERE status = 'pending' "
+                                                "OR (status = 'leased' AND lease_expires < ?) ORDER BY chunk_id "
+                                                "LIMIT 1", (now,)).fetchone()
+                if chunk is not None:
+                    self.connection.execute("UPDATE chunks SET status = 'leased', worker = ?, lease_expires = ?, "
+                                            "attempt = ? WHERE chunk_id = ?",
+                                            (worker_id, now + self.lease_seconds, chunk[1] + 1, chunk[0]))
+                self.connection.execute('COMMIT')
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+        if chunk is not None:
+            return chunk[0], chunk[1] + 1, json.loads(chunk[2])
+
+    def renew(self, chunk_id, worker_id, attempt):
+        """
+        Extends a worker's lease on a chunk it is still working on
+
+        Args:
+            chunk_id (int): the ID of the chunk
+            worker_id (str): the name of the worker
+            attempt (int): the lease attempt number returned by claim()
+
+        Returns:
+            renewed (bool): True if the worker still held the lease, False if it ran out and was claimed by another
+        """
+        with self.lock:
+            renewed = self.connection.execute("UPDATE chunks SET lease_expires = ? WHERE chunk_id = ? AND "
+                                              "status = 'leased' AND worker = ? AND attempt = ?",
+                                              (time.time() + self.lease_seconds, chunk_id, worker_id, attempt))
+        return renewed.rowcount == 1
+
+    def complete(self, chunk_id, worker_id, attempt, results=None):
+        """
+        Marks a chunk done, only if the worker still holds its lease, so a chunk is completed exactly once
+
+        Args:
+            chunk_id (int): the ID of the chunk
+            worker_id (str): the name of the worker
+            attempt (int): the lease attempt number returned by claim()
+            results (dict): the chunk's results to store, such as its status counts, default is None
+
+        Returns:
+            completed (bool): True if the completion was recorded, False if the lease had passed to another worker
+        """
+        with self.lock:
+            completed = self.connection.execute("UPDATE chunks SET status = 'done', completed = ?, results = ? WHERE "
+                                                "chunk_id = ? AND status = 'leased' AND worker = ? AND attempt = ?",
+                                                (time.strftime('%Y-%m-%d %H:%M:%S'), json.dumps(results), chunk_id,
+                                                 worker_id, attempt))
+        return completed.rowcount == 1
+
+    def release(self, chunk_id, worker_id, attempt):
+        """
+        Gives up a worker's lease on a chunk so another worker can claim it straight away
+
+        Args:
+            chunk_id (int): the ID of the chunk
+            worker_id (str): the name of the worker
+            attempt (int): the lease attempt number returned by claim()
+        """
+        with self.lock:
+            self.connection.execute("UPDATE chunks SET status = 'pending', worker = NULL, lease_expires = NULL WHERE "
+                                    "chunk_id = ? AND status = 'leased' AND worker = ? AND attempt = ?",
+                                    (chunk_id, worker_id, attempt))
+
+    def status_counts(self):
+        """
+        Counts the chunks with each status
+
+        Returns:
+            status_counts (dict): the number of chunks pending, leased and done
+        """
+        with self.lock:
+            return dict(self.connection.execute('SELECT status, COUNT(*) FROM chunks GROUP BY status'))
+
+    def results(self):
+        """
+        Adds up the results stored with the completed chunks
+
+        Returns:
+            total_results (Counter): the sum of the results of every completed chunk
+        """
+        total_results = Counter()
+        with self.lock:
+            for (chunk_results,) in self.connection.execute("SELECT results FROM chunks WHERE status = 'done'"):
+                total_results.update(json.loads(chunk_results) or {})
+        return total_results
+
+    def close(self):
+        """
+        Closes the connection to the queue
+        """
+        with self.lock:
+            self.connection.close()
+
+
+class RepositoryProgress:
+
+    def __init__(self, repository):
+        """
+        Keeps count of the records processed and the results and errors collected for a single repository while it is
+        worked on by fan_out_repositories()
+
+        Args:
+            repository (dict): the repository information, as returned by ASpaceAPI.get_repo_info()
+        """
+        self.repository = repository
+        self.repo_code = repository.get('repo_code', repository.get('uri'))
+        self.processed = 0
+        self.results = []
+        self.errors = []
+
+    def add_result(self, result):
+        """
+        Counts a processed record and keeps its result, if there is one
+
+        Args:
+            result (any): the result of processing a record - None results are counted but not kept
+        """
+        self.processed += 1
+        if result is not None:
+            self.results.append(result)
+
+    def add_error(self, message, status_input):
+        """
+        Counts a processed record that failed, keeps the error and records it with the repository code as a prefix
+
+        Args:
+            message (str): message to prefix the error code
+            status_input (str, tuple, bool): error code or input parameters producing the error
+        """
+        self.processed += 1
+        self.errors.append((message, status_input))
+        record_error(f'{self.repo_code} - {message}', status_input)
+
+
+class ProgressReporter:
+
+    def __init__(self, name, total_rows=None, report_seconds=10, stages=None, smoothing=0.3):
+        """
+        Reports how far a script has got through its input rows: the rows done, the rows per second since the last
+        report and as a moving average, the errors, the estimated time left, and the number of items waiting at each
+        stage. Reports are printed and logged at most every report_seconds, however fast rows are done, so reporting
+        never holds up the script. Call finish() at the end to log the throughput of the whole run.
+
+        Args:
+            name (str): the name of the script or job shown in each report
+            total_rows (int): the number of input rows, for the percentage done and time left, default is None
+                (unknown)
+            report_seconds (float): the time between reports, default is 10
+            stages (dict): the queues between a script's stages by stage name, such as {'post': post_queue}, whose
+                sizes are reported, default is None
+            smoothing (float): the weight of the latest rate in the moving average, default is 0.3
+        """
+        self.name = name
+        self.total_rows = total_rows
+        self.report_seconds = report_seconds
+        self.stages = stages or {}
+        self.smoothing = smoothing
+        self.lock = threading.Lock()
+        self.rows_done = 0
+        self.errors = 0
+        self.average_rate = None
+        self.start_time = time.monotonic()
+        self.last_report_time = self.start_time
+        self.last_report_rows = 0
+
+    def update(self, rows=1, errors=0):
+        """
+        Counts rows done, reporting progress if it has been report_seconds since the last report
+
+        Args:
+            rows (int): the number of rows done, default is 1
+            errors (int): the number of those rows that failed, default is 0
+        """
+        with self.lock:
+            self.rows_done += rows
+            self.errors += errors
+            now = time.monotonic()
+            if now - self.last_report_time < self.report_seconds:
+                return
+            progress_report = self.progress_report(now)
+        logger.info(progress_report)
+        print(progress_report)
+
+    def progress_report(self, now):
+        """
+        Works out the rates since the last report and describes the progress, called with the lock held
+
+        Args:
+            now (float): the time.monotonic() time of the report
+
+        Returns:
+            progress_report (str): the rows done, rates, errors, time left and stage sizes
+        """
+        current_rate = (self.rows_done - self.last_report_rows) / max(now - self.last_report_time, 1e-9)
+        if self.average_rate is None:
+            self.average_rate = current_rate
+        else:
+            self.average_rate = self.smoothing * current_rate + (1 - self.smoothing) * self.average_rate
+        self.last_report_time, self.last_report_rows = now, self.rows_done
+        progress_report = f'{self.name}: {self.rows_done}'
+        if self.total_rows:
+            progress_report += f'/{self.total_rows} rows ({self.rows_done / self.total_rows:.1%})'
+        else:
+            progress_report += ' rows'
+        progress_report += (f', {current_rate:.1f} rows/s now, {self.average_rate:.1f} rows/s average, '
+                            f'{self.errors} errors')
+        if self.total_rows and self.average_rate > 0:
+            progress_report += f', {format_duration((self.total_rows - self.rows_done) / self.average_rate)} left'
+        if self.stages:
+            progress_report += ', waiting: ' + ', '.join(f'{stage_name} {stage_queue.qsize()}'
+                                                         for stage_name, stage_queue in self.stages.items())
+        return progress_report
+
+    def finish(self, details=None):
+        """
+        Prints and logs the throughput of the whole run
+
+        Args:
+            details (any): anything to add to the end of the summary, such as the script's status counts, default is
+                None
+
+        Returns:
+            summary (str): the rows done, errors, time taken and average rows per second
+        """
+        elapsed = time.monotonic() - self.start_time
+        summary = (f'{self.name} finished {self.rows_done} rows in {elapsed:.2f}s '
+                   f'({self.rows_done / max(elapsed, 1e-9):.1f} rows/s, {self.errors} errors)')
+        if details is not None:
+            summary += f': {details}'
+        logger.info(summary)
+        print(summary)
+        return summary
+
+
+class OutcomeLog:
+
+    def __init__(self, filepath, flush_records=1000, flush_seconds=5.0):
+        """
+        Writes one JSON line per input row with the row's outcome, so the failures of a large run can be counted and
+        sorted with summarize_outcomes() instead of searched for in the text log. Each line has the time, URI, stage,
+        status, latency in seconds, HTTP status code and error class of the row, plus any details given, such as the
+        job name and row number. Lines are buffered and written in batches by a BackupWriter, and files ending in .gz or
+        .zst are compressed. Use as a context manager so the last lines are written when the job ends.
+
+        Args:
+            filepath (str): the path of the outcome log, appended to if it exists
+            flush_records (int): write the buffered lines to disk once this many are waiting, default is 1000
+            flush_seconds (float): write the buffered lines to disk once this many seconds have passed since the last
+                write to disk, default is 5
+        """
+        self.filepath = filepath
+        self.backup_writer = BackupWriter(filepath, flush_records, flush_seconds, fsync='never', index=False)
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        """
+        Opens the outcome log for appending
+        """
+        self.backup_writer.open()
+
+    def record(self, uri, stage, status, latency=None, http_status=None, error_class=None, **details):
+        """
+        Buffers the outcome of one input row
+
+        Args:
+            uri (str): the URI of the row's record, or None if the row is not valid
+            stage (str): the stage the row finished at, such as queue, fetch or post
+            status (str): the row's outcome, such as posted, unchanged or failed
+            latency (float): the seconds the row took, default is None
+            http_status (int): the HTTP status code of the row's last response from ArchivesSpace, default is None
+            error_class (str): the class of the error the row failed with, default is None
+            **details: anything else to add to the line, such as job and row
+        """
+        self.backup_writer.write({'time': round(time.time(), 3), 'uri': uri, 'stage': stage, 'status': status,
+                                  'latency': None if latency is None else round(latency, 4),
+                                  'http_status': http_status, 'error_class': error_class, **details})
+
+    def close(self):
+        """
+        Writes the buffered lines to disk and closes the outcome log
+        """
+        self.backup_writer.close()
+
+
+def fan_out_repositories(repositories, repo_job, max_workers=4):
+    """
+    Runs repo_job for every repository concurrently, with no more than max_workers repositories being worked on at once,
+    then merges the results of all the repositories once they have finished
+
+    Args:
+        repositories (list): the repositories to work on, as returned by ASpaceAPI.get_repo_info()
+        repo_job (function): called as repo_job(repository, progress) with the repository dict and its
+            RepositoryProgress, which the job uses to record each record's result or error
+        max_workers (int): the maximum number of repositories worked on at the same time, default is 4
+
+    Returns:
+        merged_results (list): the results of all repositories, in the same order as the repositories given
+        repo_progress (dict): the RepositoryProgress of each repository, keyed by repository URI
+    """
+    repo_progress = {repository['uri']: RepositoryProgress(repository) for repository in repositories}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        repo_futures = {executor.submit(repo_job, repository, repo_progress[repository['uri']]): repository['uri']
+                        for repository in repositories}
+        for repo_future in as_completed(repo_futures):
+            progress = repo_progress[repo_futures[repo_future]]
+            try:
+                repo_future.result()
+            except Exception as repo_error:
+                progress.add_error('fan_out_repositories() - Repository job stopped due to following error',
+                                   repo_error)
+            print(f'{progress.repo_code}: processed {progress.processed}, errors {len(progress.errors)}')
+            logger.info(f'{progress.repo_code}: processed {progress.processed}, errors {len(progress.errors)}')
+    merged_results = []
+    for progress in repo_progress.values():
+        merged_results.extend(progress.results)
+    return merged_results, repo_progress
+
+
+def format_duration(seconds):
+    """
+    Formats a number of seconds as hours, minutes and seconds
+
+    Args:
+        seconds (float): the number of seconds
+
+    Returns:
+        duration (str): the duration as H:MM:SS
+    """
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02}:{seconds:02}'
+
+
+def row_hash(row):
+    """
+    Gets a hash of an input row's values, used to key the row in a ProgressJournal
+
+    Args:
+        row (dict): the input row, such as a row returned by read_csv()
+
+    Returns:
+        row_hash (str): the SHA-256 hex digest of the row's values
+    """
+    return hashlib.sha256(json.dumps(row, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def summarize_outcomes(outcome_paths, slowest_count=10):
+    """
+    Adds up one or more outcome logs written by OutcomeLog in a single pass. Rows are streamed rather than loaded, but
+    the count and last status of every distinct URI are kept in memory to find the retried URIs, so memory grows with
+    the number of records in the logs rather than the number of rows
+
+    Args:
+        outcome_paths (list): the paths of the outcome logs
+        slowest_count (int): the number of slowest rows to keep, default is 10
+
+    Returns:
+        summary (dict): the number of rows, the count of each status, a histogram of errors by stage, error class and
+            HTTP status code, the slowest rows as (latency, URI) pairs with '' for rows without a URI, and the URIs
+            recorded more than once by reruns or retries, with how many of them ended in failure
+    """
+    status_counts = Counter()
+    error_counts = Counter()
+    uri_counts = Counter()
+    last_statuses = {}
+    slowest_rows = []
+    row_count = 0
+    for outcome_path in outcome_paths:
+        for outcome in read_backup(outcome_path):
+            row_count += 1
+            status_counts[outcome['status']] += 1
+            if outcome.get('error_class') is not None:
+                error_counts[(outcome['stage'], outcome['error_class'], outcome.get('http_status'))] += 1
+            if outcome.get('uri'):
+                uri_counts[outcome['uri']] += 1
+                last_statuses[outcome['uri']] = outcome['status']
+            if outcome.get('latency') is not None:
+                # Rows without a URI are kept as '' so rows with the same latency can still be compared
+                if len(slowest_rows) < slowest_count:
+                    heapq.heappush(slowest_rows, (outcome['latency'], outcome.get('uri') or ''))
+                elif outcome['latency'] > slowest_rows[0][0]:
+                    heapq.heapreplace(slowest_rows, (outcome['latency'], outcome.get('uri') or ''))
+    retried_uris = [uri for uri, uri_count in uri_counts.items() if uri_count > 1]
+    return {'rows': row_count,
+            'statuses': dict(status_counts.most_common()),
+            'errors': error_counts.most_common(),
+            'slowest': sorted(slowest_rows, reverse=True),
+            'retried_uris': len(retried_uris),
+            'retries': sum(uri_counts[uri] - 1 for uri in retried_uris),
+            'retried_uris_still_failing': sum(last_statuses[uri] == 'failed' for uri in retried_uris)}
@@ -1,3 +1,5 @@
+-- Counts the digital objects with agents, dates, extents, languages, notes, or subjects outside the excluded repositories.
+-- Run with python_scripts/repeatable/run_sql_report.py and -p excluded_repo_ids=11,23,50,52, or replace :excluded_repo_ids when running in a SQL client.
 SELECT 
   COUNT(*) 
 FROM 
@@ -47,4 +49,4 @@ FROM
       date.label_id != 2727
   ) AS T 
 WHERE 
-  T.repo_id NOT IN (11, 23, 50, 52)
+  T.repo_id NOT IN (:excluded_repo_ids)
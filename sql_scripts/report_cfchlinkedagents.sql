@@ -1,4 +1,5 @@
--- Retrieves all agent_persons that are linked to in the CFCH repository. Updating this script to another repository is possible by changing the ao.repo_id code to the desired repository.
+-- Retrieves all agent_persons that are linked to in the CFCH repository (repo_id 21). Updating this script to another repository is possible by changing the :repo_id parameter to the desired repository.
+-- Run with python_scripts/repeatable/run_sql_report.py and -p repo_id=21, or replace :repo_id with the repository id when running in a SQL client.
 
 SELECT
     name_person.sort_name AS agent_name, name_person.agent_person_id AS agent_id, evname.value AS name_source, evrole.value AS role
@@ -17,7 +18,7 @@ FROM
 		JOIN
 	agent_record_identifier AS recordid ON recordid.id = rel.role_id
 WHERE
-    ao.repo_id = 21
+    ao.repo_id = :repo_id
 GROUP BY name_person.id
 
 -- To get the above to work properly, you'll need to run this query before running the above: SET SESSION sql_mode=(SELECT REPLACE(@@sql_mode, 'ONLY_FULL_GROUP_BY', ''));
\ No newline at end of file
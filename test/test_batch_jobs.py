@@ -0,0 +1,342 @@
+# This script consists of unittests for batch_jobs.py
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from python_scripts.batch_jobs import *
+from python_scripts.one_time_scripts.updates_from_logs import read_update_logs
+from python_scripts.utilities import (ChangeLedger, OutcomeLog, ProgressJournal, WorkQueue, log_settings, read_backup,
+                                      read_backup_index, setup_logging)
+
+
+class BatchClient:
+    """Serves records from a dict and records the posts made, standing in for ASpaceAPI"""
+
+    def __init__(self, records, failing_uris=(), modified_ids=()):
+        self.records = records
+        self.failing_uris = failing_uris
+        self.modified_ids = modified_ids
+        self.gets = []
+        self.posts = []
+        self.lock = threading.Lock()
+
+    def get_object(self, record_type, object_id, repo_uri=''):
+        with self.lock:
+            self.gets.append(f'{repo_uri}/{record_type}/{object_id}')
+        return self.records.get(f'{repo_uri}/{record_type}/{object_id}')
+
+    def get_modified_ids(self, record_type, modified_since=None, repo_uri=''):
+        return list(self.modified_ids)
+
+    def get_object_set(self, record_type, object_ids, repo_uri=''):
+        object_uris = [f'{repo_uri}/{record_type}/{object_id}' for object_id in object_ids]
+        return [self.records[object_uri] for object_uri in object_uris if object_uri in self.records]
+
+    def update_object(self, object_uri, updated_json):
+        if object_uri in self.failing_uris:
+            return None
+        with self.lock:
+            self.posts.append((object_uri, updated_json))
+        return {'status': 'Updated', 'uri': object_uri, 'lock_version': updated_json.get('lock_version', 0) + 1}
+
+
+class ShardClient:
+    """Serves generated archival objects to each worker process of a ShardedBatchJob, standing in for ASpaceAPI"""
+
+    def __init__(self, aspace_api, aspace_un, aspace_pw):
+        self.session = (aspace_api, aspace_un, os.getpid())
+
+    def get_object(self, record_type, object_id, repo_uri=''):
+        if int(object_id) < 50:
+            return {'uri': f'{repo_uri}/{record_type}/{object_id}', 'publish': int(object_id) % 2 == 0,
+                    'lock_version': 0}
+
+    def update_object(self, object_uri, updated_json):
+        return {'status': 'Updated', 'uri': object_uri, 'lock_version': 1}
+
+
+def publish_false(record_json, row):
+    return dict(record_json, publish=False)
+
+
+class TestBatchJob(unittest.TestCase):
+
+    def setUp(self):
+        self.job_dir = tempfile.TemporaryDirectory()
+        self.backup_path = os.path.join(self.job_dir.name, 'original_data.jsonl')
+        self.records = {f'/repositories/2/archival_objects/{object_id}':
+                        {'uri': f'/repositories/2/archival_objects/{object_id}', 'publish': object_id % 2 == 0,
+                         'lock_version': 0}
+                        for object_id in range(50)}
+        self.rows = [{'uri': f'/repositories/2/archival_objects/{object_id}'} for object_id in range(52)]
+
+    def tearDown(self):
+        self.job_dir.cleanup()
+
+    def test_run(self):
+        """Tests that changed records are backed up and posted, and unchanged or missing records are counted"""
+        test_client = BatchClient(self.records)
+        with contextlib.redirect_stdout(io.StringIO()):
+            status_counts = BatchJob(test_client, publish_false, backup_path=self.backup_path).run(self.rows)
+        self.assertEqual(status_counts, {'posted': 25, 'unchanged': 25, 'not found': 2})
+        self.assertEqual(sorted(uri for uri, _ in test_client.posts),
+                         sorted(f'/repositories/2/archival_objects/{object_id}' for object_id in range(0, 50, 2)))
+        self.assertTrue(all(updated_json['publish'] is False for _, updated_json in test_client.posts))
+        self.assertEqual(sorted(record['uri'] for record in read_backup(self.backup_path)),
+                         sorted(uri for uri, _ in test_client.posts))
+
+    def test_backup_before_post(self):
+        """Tests that each original is on disk before its record is posted, and a row whose original cannot be backed
+        up fails without being journaled as fetched or posted"""
+        journal_path = os.path.join(self.job_dir.name, 'rows.csv.progress.sqlite')
+        self.records['/repositories/2/archival_objects/2']['extents'] = {'not JSON'}
+        test_client = BatchClient(self.records)
+        backed_up_uris = []
+
+        def update_object(object_uri, updated_json):
+            backed_up_uris.append([record['uri'] for record in read_backup(self.backup_path)])
+            return BatchClient.update_object(test_client, object_uri, updated_json)
+
+        test_client.update_object = update_object
+        with contextlib.redirect_stdout(io.StringIO()), ProgressJournal(journal_path) as journal:
+            status_counts = BatchJob(test_client, publish_false, backup_path=self.backup_path, journal=journal,
+                                     post_workers=1).run(self.rows[:6])
+            self.assertEqual(journal.status_counts(), {'posted': 2, 'failed': 1, 'unchanged': 3})
+        self.assertEqual(status_counts, {'posted': 2, 'failed': 1, 'unchanged': 3})
+        self.assertEqual(sorted(uri for uri, _ in test_client.posts),
+                         ['/repositories/2/archival_objects/0', '/repositories/2/archival_objects/4'])
+        self.assertTrue(all(uri in uris for (uri, _), uris in zip(test_client.posts, backed_up_uris)))
+
+    def test_failed_posts(self):
+        """Tests that failed posts and transform errors are counted as failed"""
+        test_client = BatchClient(self.records, failing_uris={'/repositories/2/archival_objects/0'})
+
+        def transform(record_json, row):
+            if record_json['uri'].endswith('/2'):
+                raise KeyError('publish')
+            return publish_false(record_json, row)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            status_counts = BatchJob(test_client, transform, fetch_workers=2, post_workers=3).run(self.rows[:4])
+        self.assertEqual(status_counts, {'failed': 2, 'unchanged': 2})
+        self.assertEqual(test_client.posts, [])
+
+    def test_dry_run(self):
+        """Tests that a dry run does not post or write a backup"""
+        test_client = BatchClient(self.records)
+        with contextlib.redirect_stdout(io.StringIO()):
+            status_counts = BatchJob(test_client, publish_false, backup_path=self.backup_path,
+                                     dry_run=True).run(self.rows)
+        self.assertEqual(status_counts['dry run'], 25)
+        self.assertEqual(test_client.posts, [])
+        self.assertFalse(os.path.exists(self.backup_path))
+
+    def test_dry_run_log(self):
+        """Tests that the updates a dry run logs are written whole, however long, and can be replayed"""
+        self.records['/repositories/2/archival_objects/0']['title'] = 'x' * 2000
+        setup_logging('update_refids', self.job_dir.name, payload_length=100)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                BatchJob(BatchClient(self.records), publish_false, dry_run=True).run(self.rows[:1])
+            logger.complete()
+            test_updates = list(read_update_logs([self.job_dir.name]))
+        finally:
+            logger.remove()
+            logger.configure(patcher=None)
+            log_settings.update(quiet=False, payload_length=None)
+        self.assertEqual([json.loads(payload) for _, _, payload in test_updates],
+                         [dict(self.records['/repositories/2/archival_objects/0'], publish=False)])
+
+    def test_row_weight(self):
+        """Tests that rows standing for several CSV rows are counted as that many rows in progress reports"""
+        test_client = BatchClient(self.records)
+        record_rows = [{'uri': row['uri'], 'rows': [row, row]} for row in self.rows[:10]]
+        batch_job = BatchJob(test_client, publish_false, row_weight=lambda record_row: len(record_row['rows']))
+        with contextlib.redirect_stdout(io.StringIO()):
+            batch_job.run(record_rows, 20)
+        self.assertEqual(batch_job.progress.rows_done, 20)
+
+    def test_after_post(self):
+        """Tests that after_post is called for each posted record and its failures are counted"""
+        test_client = BatchClient(self.records)
+        after_posts = []
+
+        def after_post(local_aspace, updated_json, row):
+            after_posts.append(row['uri'])
+            return None if row['uri'].endswith('/0') else {'status': 'Suppressed'}
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            status_counts = BatchJob(test_client, publish_false, after_post=after_post).run(self.rows[:6])
+        self.assertEqual(status_counts, {'posted': 2, 'failed': 1, 'unchanged': 3})
+        self.assertEqual(len(after_posts), 3)
+
+    def test_resume(self):
+        """Tests that a resumed job skips the rows the journal has as finished without fetching them"""
+        journal_path = os.path.join(self.job_dir.name, 'rows.csv.progress.sqlite')
+        test_client = BatchClient(self.records, failing_uris={'/repositories/2/archival_objects/0'})
+        with contextlib.redirect_stdout(io.StringIO()), ProgressJournal(journal_path) as journal:
+            BatchJob(test_client, publish_false, journal=journal).run(self.rows[:6])
+        test_client = BatchClient(self.records)
+        with contextlib.redirect_stdout(io.StringIO()), ProgressJournal(journal_path, resume=True) as journal:
+            status_counts = BatchJob(test_client, publish_false, journal=journal).run(self.rows[:6])
+        self.assertEqual(status_counts, {'already finished': 5, 'posted': 1})
+        self.assertEqual([uri for uri, _ in test_client.posts], ['/repositories/2/archival_objects/0'])
+
+    def test_ledger(self):
+        """Tests that a rerun skips the rows whose change the ledger has as applied without fetching their records,
+        unless their record was modified since"""
+        ledger_path = os.path.join(self.job_dir.name, 'change_ledger.sqlite')
+        test_client = BatchClient(self.records)
+        with contextlib.redirect_stdout(io.StringIO()), ChangeLedger(ledger_path, 'https://staging/api') as ledger:
+            BatchJob(test_client, publish_false, ledger=ledger).run(self.rows[:6])
+        for uri, updated_json in test_client.posts:
+            self.records[uri] = dict(updated_json, lock_version=1)
+        self.records['/repositories/2/archival_objects/1']['lock_version'] = 7
+        test_client = BatchClient(self.records, modified_ids=[1])
+        with contextlib.redirect_stdout(io.StringIO()), ChangeLedger(ledger_path, 'https://staging/api') as ledger:
+            status_counts = BatchJob(test_client, publish_false, ledger=ledger).run(self.rows[:6])
+        self.assertEqual(status_counts, {'already applied': 5, 'unchanged': 1})
+        self.assertEqual(test_client.gets, ['/repositories/2/archival_objects/1'])
+        test_client = BatchClient(self.records)
+        with contextlib.redirect_stdout(io.StringIO()), ChangeLedger(ledger_path, 'https://prod/api') as ledger:
+            status_counts = BatchJob(test_client, publish_false, ledger=ledger).run(self.rows[:6])
+        self.assertEqual(len(test_client.gets), 6)
+
+    def test_outcome_log(self):
+        """Tests that the outcome of every row is written to the outcome log with its stage and error class"""
+        outcome_path = os.path.join(self.job_dir.name, 'outcomes.jsonl')
+        test_client = BatchClient(self.records, failing_uris={'/repositories/2/archival_objects/0'})
+        with contextlib.redirect_stdout(io.StringIO()), OutcomeLog(outcome_path) as outcome_log:
+            BatchJob(test_client, publish_false, name='test_job', outcome_log=outcome_log).run(self.rows[48:])
+        outcomes = {outcome['uri']: outcome for outcome in read_backup(outcome_path)}
+        self.assertEqual({uri: (outcome['stage'], outcome['status'], outcome['error_class'])
+                          for uri, outcome in outcomes.items()},
+                         {'/repositories/2/archival_objects/48': ('post', 'posted', None),
+                          '/repositories/2/archival_objects/49': ('fetch', 'unchanged', None),
+                          '/repositories/2/archival_objects/50': ('fetch', 'not found', 'NotFound'),
+                          '/repositories/2/archival_objects/51': ('fetch', 'not found', 'NotFound')})
+        self.assertTrue(all(outcome['job'] == 'test_job' for outcome in outcomes.values()))
+        self.assertEqual(sorted(outcome['row'] for outcome in outcomes.values()), [1, 2, 3, 4])
+
+    def test_run_queue(self):
+        """Tests that a worker runs every chunk in a work queue, including one whose worker stopped part way, and
+        records each chunk's status counts"""
+        queue_path = os.path.join(self.job_dir.name, 'rows.csv.queue.sqlite')
+        test_client = BatchClient(self.records)
+        with WorkQueue(queue_path, lease_seconds=0) as stopped_queue:
+            stopped_queue.load(self.rows, 'rows.csv', chunk_size=10)
+            stopped_queue.claim('host1-1')
+        with contextlib.redirect_stdout(io.StringIO()), WorkQueue(queue_path) as work_queue:
+            worker_counts = BatchJob(test_client, publish_false).run_queue(work_queue, 'host2-1')
+            self.assertEqual(work_queue.status_counts(), {'done': 6})
+            self.assertEqual(work_queue.results(), {'posted': 25, 'unchanged': 25, 'not found': 2})
+        self.assertEqual(worker_counts, {'posted': 25, 'unchanged': 25, 'not found': 2})
+        self.assertEqual(len(test_client.gets), 52)
+
+
+class TestShardedBatchJob(unittest.TestCase):
+
+    def setUp(self):
+        self.job_dir = tempfile.TemporaryDirectory()
+        self.backup_path = os.path.join(self.job_dir.name, 'original_data.jsonl.gz')
+        self.rows = [{'uri': f'/repositories/2/archival_objects/{object_id}'} for object_id in range(52)]
+
+    def tearDown(self):
+        self.job_dir.cleanup()
+
+    def test_run(self):
+        """Tests that rows are split between processes and their status counts and backups are merged"""
+        with contextlib.redirect_stdout(io.StringIO()):
+            status_counts = ShardedBatchJob(('https://staging/api', 'user', 'password'), publish_false,
+                                            backup_path=self.backup_path, processes=3,
+                                            api_class=ShardClient).run(self.rows)
+        self.assertEqual(status_counts, {'posted': 25, 'unchanged': 25, 'not found': 2})
+        self.assertEqual(sorted(record['uri'] for record in read_backup(self.backup_path)),
+                         sorted(f'/repositories/2/archival_objects/{object_id}' for object_id in range(0, 50, 2)))
+        self.assertEqual(len(read_backup_index(self.backup_path)), 25)
+        with open(self.backup_path, 'rb') as backup_file:
+            self.assertEqual(backup_file.read(2), b'\x1f\x8b')
+        self.assertEqual(sorted(os.listdir(self.job_dir.name)),
+                         ['original_data.jsonl.gz', 'original_data.jsonl.gz.idx'])
+
+    def test_shard_number(self):
+        """Tests that every row for a record is sent to the same process whether or not its URI has a leading slash"""
+        sharded_job = ShardedBatchJob(('https://staging/api', 'user', 'password'), publish_false, processes=3)
+        self.assertEqual(sharded_job.shard_number({'uri': 'repositories/2/archival_objects/7'}),
+                         sharded_job.shard_number({'uri': '/repositories/2/archival_objects/7'}))
+        self.assertEqual({sharded_job.shard_number(row) for row in self.rows}, {0, 1, 2})
+
+
+class CountingClient(BatchClient):
+    """Serves records like BatchClient, keeping count of the most calls in flight at once"""
+
+    def __init__(self, records):
+        super().__init__(records)
+        self.in_flight = 0
+        self.most_in_flight = 0
+
+    def get_object(self, record_type, object_id, repo_uri=''):
+        with self.lock:
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        time.sleep(0.001)
+        with self.lock:
+            self.in_flight -= 1
+        return super().get_object(record_type, object_id, repo_uri)
+
+
+class TestSharedBudget(unittest.TestCase):
+
+    def test_next_job(self):
+        """Tests that a free slot goes to the waiting job furthest below its share for its priority"""
+        budget = SharedBudget(max_in_flight=4)
+        budget.add_job('suppress_objects', priority=2)
+        budget.add_job('update_refids')
+        budget.waiting.update(['suppress_objects', 'update_refids'])
+        self.assertEqual(budget.next_job(), 'suppress_objects')
+        budget.in_flight.update({'suppress_objects': 2, 'update_refids': 1})
+        self.assertEqual(budget.next_job(), 'suppress_objects')
+        budget.in_flight['suppress_objects'] += 1
+        self.assertEqual(budget.next_job(), 'update_refids')
+        budget.waiting['update_refids'] -= 1
+        self.assertEqual(budget.next_job(), 'suppress_objects')
+
+    def test_rate_limit(self):
+        """Tests that calls start no faster than the rate limit"""
+        budget = SharedBudget(requests_per_second=100)
+        budget.add_job('update_refids')
+        start_time = time.perf_counter()
+        for _ in range(5):
+            budget.acquire('update_refids')
+            budget.release('update_refids')
+        self.assertGreaterEqual(time.perf_counter() - start_time, 0.04)
+        self.assertEqual(budget.request_counts, {'update_refids': 5})
+
+
+class TestJobScheduler(unittest.TestCase):
+
+    def test_run(self):
+        """Tests that jobs run at once share the in-flight limit and each job's outcomes and calls are counted"""
+        test_client = CountingClient({f'/repositories/2/archival_objects/{object_id}':
+                                      {'uri': f'/repositories/2/archival_objects/{object_id}', 'publish': True}
+                                      for object_id in range(40)})
+        scheduler = JobScheduler(test_client, max_in_flight=3)
+        scheduler.add('first_job', publish_false, [{'uri': f'/repositories/2/archival_objects/{object_id}'}
+                                                   for object_id in range(20)], priority=2)
+        scheduler.add('second_job', publish_false, [{'uri': f'/repositories/2/archival_objects/{object_id}'}
+                                                    for object_id in range(20, 42)])
+        self.assertIsNone(scheduler.add('second_job', publish_false, []))
+        with contextlib.redirect_stdout(io.StringIO()):
+            job_counts = scheduler.run()
+        self.assertEqual(job_counts, {'first_job': {'posted': 20}, 'second_job': {'posted': 20, 'not found': 2}})
+        self.assertEqual(scheduler.budget.request_counts, {'first_job': 40, 'second_job': 42})
+        self.assertLessEqual(test_client.most_in_flight, 3)
+        self.assertEqual(sum(scheduler.budget.in_flight.values()), 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,99 @@
+# This script consists of unittests for delete_dometadata.py
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from python_scripts.one_time_scripts.delete_dometadata import *
+from python_scripts.utilities import RepositoryProgress, read_backup
+
+
+class CandidateDatabase:
+    """Runs queries on an in-memory SQLite copy of the tables the candidate query reads, standing in for
+    ASpaceDatabase"""
+
+    def __init__(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.statements = []
+        self.connection.executescript(
+            'CREATE TABLE repository (id INTEGER, repo_code TEXT);'
+            'CREATE TABLE digital_object (id INTEGER, repo_id INTEGER);'
+            'CREATE TABLE enumeration_value (id INTEGER, value TEXT);'
+            'CREATE TABLE date (digital_object_id INTEGER, label_id INTEGER);'
+            'CREATE TABLE note (digital_object_id INTEGER);'
+            'CREATE TABLE extent (digital_object_id INTEGER);'
+            'CREATE TABLE lang_material (digital_object_id INTEGER);'
+            'CREATE TABLE linked_agents_rlshp (digital_object_id INTEGER);'
+            'CREATE TABLE subject_rlshp (digital_object_id INTEGER);'
+            "INSERT INTO repository VALUES (2, 'NMAI'), (3, 'Test'), (4, 'CFCH');"
+            "INSERT INTO enumeration_value VALUES (1, 'digitized'), (2, 'creation');"
+            'INSERT INTO digital_object VALUES (1, 2), (2, 2), (3, 2), (4, 2), (5, 3), (6, 4), (7, 4);'
+            'INSERT INTO date VALUES (1, 2), (2, 1), (7, NULL);'
+            'INSERT INTO note VALUES (3), (3), (5);'
+            'INSERT INTO subject_rlshp VALUES (6);')
+
+    def query_database(self, statement, parameters=None):
+        self.statements.append((statement, parameters))
+        return self.connection.execute(statement.replace('%s', '?'), parameters or ()).fetchall()
+
+
+class CandidateClient:
+    """Serves digital objects from a dict and records the objects fetched and posted, standing in for ArchivesSpace"""
+
+    def __init__(self, digital_objects):
+        self.digital_objects = digital_objects
+        self.fetched_uris = []
+        self.posts = []
+
+    def get_object(self, record_type, object_id, repo_uri=''):
+        self.fetched_uris.append(f'{repo_uri}/{record_type}/{object_id}')
+        return self.digital_objects.get(f'{repo_uri}/{record_type}/{object_id}')
+
+    def update_object(self, object_uri, updated_json):
+        self.posts.append((object_uri, updated_json))
+        return {'status': 'Updated', 'uri': object_uri}
+
+
+class TestFindCandidates(unittest.TestCase):
+
+    def test_candidate_query(self):
+        """Tests that the candidate query finds the digital objects with data to delete, not counting digitized dates,
+        outside the excluded repositories, with the repository codes passed as query parameters"""
+        test_database = CandidateDatabase()
+        with contextlib.redirect_stdout(io.StringIO()):
+            test_repositories = find_candidates(test_database, ['Test', 'TRAINING'])
+        self.assertEqual(test_database.statements, [candidate_query(['Test', 'TRAINING'])])
+        self.assertEqual(test_database.statements[0][1], ('Test', 'TRAINING'))
+        self.assertEqual(test_repositories,
+                         [{'uri': '/repositories/2', 'repo_code': 'NMAI', 'digital_object_ids': [1, 3]},
+                          {'uri': '/repositories/4', 'repo_code': 'CFCH', 'digital_object_ids': [6, 7]}])
+
+    def test_only_candidates_fetched(self):
+        """Tests that only the candidate digital objects are fetched, and that they are backed up and posted without
+        the data to delete"""
+        digital_objects = {f'/repositories/2/digital_objects/{do_id}':
+                           {'uri': f'/repositories/2/digital_objects/{do_id}', 'title': f'Object {do_id}',
+                            'dates': [{'label': 'digitized'}], 'notes': []}
+                           for do_id in range(1, 5)}
+        digital_objects['/repositories/2/digital_objects/1']['dates'].append({'label': 'creation'})
+        digital_objects['/repositories/2/digital_objects/3']['notes'].append({'content': ['Note']})
+        test_client = CandidateClient(digital_objects)
+        with tempfile.TemporaryDirectory() as backup_dir, contextlib.redirect_stdout(io.StringIO()):
+            test_repositories = find_candidates(CandidateDatabase(), ['Test', 'TRAINING'])
+            backup_path = os.path.join(backup_dir, 'delete_dometadata_original_data.jsonl')
+            with BackupWriter(backup_path, flush_records=1) as backup_writer:
+                delete_repository_metadata(test_client, backup_writer, test_repositories[0],
+                                           RepositoryProgress(test_repositories[0]))
+            backed_up_uris = [record['uri'] for record in read_backup(backup_path)]
+        self.assertEqual(test_client.fetched_uris, ['/repositories/2/digital_objects/1',
+                                                    '/repositories/2/digital_objects/3'])
+        self.assertEqual(backed_up_uris, test_client.fetched_uris)
+        self.assertEqual([(uri, updated_json['dates'], updated_json['notes']) for uri, updated_json in test_client.posts],
+                         [('/repositories/2/digital_objects/1', [{'label': 'digitized'}], []),
+                          ('/repositories/2/digital_objects/3', [{'label': 'digitized'}], [])])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,53 @@
+# This script consists of unittests for measure_import_time.py
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from python_scripts.repeatable.measure_import_time import *
+
+# Packages that are slow to import and must only be imported by the functions that use them
+heavy_packages = ['asnake', 'jsonlines', 'mysql', 'pandas', 'pyarrow', 'requests', 'openpyxl']
+
+
+class TestImportTimes(unittest.TestCase):
+
+    def test_lean_imports(self):
+        """Tests that importing utilities.py and batch_jobs.py does not import any of the heavy packages"""
+        for module_name in default_modules:
+            total_seconds, package_times = import_times(module_name, runs=1)
+            self.assertIsNotNone(total_seconds)
+            self.assertIn(module_name, package_times)
+            self.assertEqual([package for package in heavy_packages if package in package_times], [])
+
+    def test_lazy_submodules(self):
+        """Tests that importing python_scripts.utilities only imports its submodules once their names are used"""
+        _, package_times = import_times('python_scripts.utilities', runs=1)
+        self.assertEqual([module for module in package_times if module.startswith('python_scripts.utilities.')], [])
+
+    def test_slowest_packages(self):
+        """Tests that only top-level packages other than the module's own package and the interpreter's startup packages
+        are listed, slowest first"""
+        package_times = {'loguru': 60000, 'loguru._logger': 40000, 'python_scripts': 100, 'json': 2000,
+                         '_json': 500, 'dotenv': 10000, 'site': 90000}
+        self.assertEqual(slowest_packages(package_times, 'python_scripts.utilities', 2, {'site'}),
+                         [('loguru', 0.06), ('dotenv', 0.01)])
+
+    def test_baseline(self):
+        """Tests that saved import times are compared with later runs and slower modules are reported"""
+        with tempfile.TemporaryDirectory() as baseline_dir:
+            baseline_path = os.path.join(baseline_dir, 'import_times.json')
+            with contextlib.redirect_stdout(io.StringIO()):
+                module_seconds, _ = main(['python_scripts.utilities'], runs=1, baseline_path=baseline_path, save=True)
+                with open(baseline_path, 'r') as baseline_file:
+                    self.assertEqual(json.load(baseline_file), module_seconds)
+                with open(baseline_path, 'w') as baseline_file:
+                    json.dump({'python_scripts.utilities': 0.001}, baseline_file)
+                _, slower_modules = main(['python_scripts.utilities'], runs=1, baseline_path=baseline_path)
+        self.assertEqual(slower_modules, ['python_scripts.utilities'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+# This script consists of unittests for restore_from_backup.py
+import csv
+import os
+import tempfile
+import unittest
+
+from python_scripts.repeatable.restore_from_backup import *
+from python_scripts.utilities import BackupWriter, write_to_file
+
+
+class RestoreResponse:
+    """Stands in for a requests response holding JSON data"""
+
+    def __init__(self, response_json):
+        self.response_json = response_json
+
+    def json(self):
+        return self.response_json
+
+
+class RestoreClient:
+    """Serves records from a dict and records the posts made, standing in for ASpaceAPI and its aspace_client. The
+    records in changing_uris are changed by someone else once, just before the next post to them, which then fails
+    with a 409 status like an ArchivesSpace lock_version conflict"""
+
+    def __init__(self, records, failing_uris=(), changing_uris=()):
+        self.records = records
+        self.failing_uris = failing_uris
+        self.changing_uris = list(changing_uris)
+        self.aspace_client = self
+        self.posts = []
+        self.status_code = None
+
+    def last_status_code(self):
+        return self.status_code
+
+    def get(self, object_uri):
+        if object_uri in self.failing_uris:
+            raise ConnectionError(f'Unable to connect to {object_uri}')
+        return RestoreResponse(self.records.get(object_uri, {'error': 'Record not found'}))
+
+    def update_object(self, object_uri, updated_json):
+        self.posts.append((object_uri, updated_json))
+        if object_uri in self.changing_uris:
+            self.changing_uris.remove(object_uri)
+            self.records[object_uri]['lock_version'] += 1
+            self.status_code = 409
+            return None
+        self.status_code = 200
+        return {'status': 'Updated', 'uri': object_uri, 'lock_version': updated_json['lock_version'] + 1}
+
+    def create_object(self, record_type, object_json, repo_uri=''):
+        self.posts.append((f'{repo_uri}/{record_type}', object_json))
+        return {'status': 'Created', 'uri': f'{repo_uri}/{record_type}/100', 'lock_version': 0}
+
+
+class TestSplitUri(unittest.TestCase):
+
+    def test_repository_uri(self):
+        """Tests splitting the URI of an object that belongs to a repository"""
+        self.assertEqual(split_uri('/repositories/2/archival_objects/5'),
+                         ('/repositories/2', 'archival_objects', '5'))
+
+    def test_global_uri(self):
+        """Tests splitting the URI of an object that does not belong to a repository"""
+        self.assertEqual(split_uri('/agents/people/5'), ('', 'agents/people', '5'))
+
+
+class TestRestoreAction(unittest.TestCase):
+
+    def test_actions(self):
+        """Tests the restore action for unchanged, changed, changed again, and deleted records"""
+        original_json = {'uri': '/locations/1', 'lock_version': 3}
+        self.assertEqual(restore_action(original_json, {'lock_version': 3}), 'unchanged')
+        self.assertEqual(restore_action(original_json, {'lock_version': 4}), 'restore')
+        self.assertEqual(restore_action(original_json, {'lock_version': 6}), 'conflict')
+        self.assertEqual(restore_action(original_json, {'lock_version': 6}, overwrite=True), 'restore')
+        self.assertEqual(restore_action(original_json, None), 'deleted')
+        self.assertEqual(restore_action(original_json, None, recreate=True), 'recreate')
+
+
+class TestRestoreRecord(unittest.TestCase):
+
+    def setUp(self):
+        self.original_json = {'uri': '/repositories/2/archival_objects/5', 'title': 'Original', 'lock_version': 3,
+                              'system_mtime': '2024-01-01T00:00:00Z'}
+
+    def test_restore(self):
+        """Tests that the original JSON is posted over a changed record at its current lock_version"""
+        restore_client = RestoreClient({self.original_json['uri']: {'title': 'Changed', 'lock_version': 4}})
+        journal_entry = restore_record(restore_client, self.original_json)
+        self.assertEqual(journal_entry, {'uri': self.original_json['uri'], 'status': 'restored', 'lock_version': 4})
+        self.assertEqual(restore_client.posts, [(self.original_json['uri'], dict(self.original_json, lock_version=4))])
+
+    def test_overwrite(self):
+        """Tests that a record changed again since the backup is left as a conflict unless overwrite is given"""
+        restore_client = RestoreClient({self.original_json['uri']: {'title': 'Changed again', 'lock_version': 6}})
+        self.assertEqual(restore_record(restore_client, self.original_json)['status'], 'conflict')
+        self.assertEqual(restore_client.posts, [])
+        journal_entry = restore_record(restore_client, self.original_json, overwrite=True)
+        self.assertEqual(journal_entry['status'], 'restored')
+        self.assertEqual(restore_client.posts, [(self.original_json['uri'], dict(self.original_json, lock_version=6))])
+
+    def test_changed_before_post(self):
+        """Tests that a record changed between the GET and the POST is fetched and posted again only with overwrite"""
+        object_uri = self.original_json['uri']
+        restore_client = RestoreClient({object_uri: {'title': 'Changed', 'lock_version': 4}},
+                                       changing_uris=[object_uri])
+        self.assertEqual(restore_record(restore_client, self.original_json)['status'], 'conflict')
+        restore_client = RestoreClient({object_uri: {'title': 'Changed', 'lock_version': 4}},
+                                       changing_uris=[object_uri])
+        journal_entry = restore_record(restore_client, self.original_json, overwrite=True)
+        self.assertEqual(journal_entry, {'uri': object_uri, 'status': 'restored', 'lock_version': 5})
+        self.assertEqual(restore_client.posts, [(object_uri, dict(self.original_json, lock_version=4)),
+                                                (object_uri, dict(self.original_json, lock_version=5))])
+
+    def test_recreate(self):
+        """Tests that a deleted record is only recreated when recreate is given, without its system fields"""
+        restore_client = RestoreClient({})
+        self.assertEqual(restore_record(restore_client, self.original_json)['status'], 'deleted')
+        self.assertEqual(restore_client.posts, [])
+        journal_entry = restore_record(restore_client, self.original_json, recreate=True)
+        self.assertEqual(journal_entry, {'uri': self.original_json['uri'], 'status': 'recreated', 'lock_version': None,
+                                         'new_uri': '/repositories/2/archival_objects/100'})
+        self.assertEqual(restore_client.posts, [('/repositories/2/archival_objects', {'title': 'Original'})])
+
+    def test_skip(self):
+        """Tests that unchanged records and dry runs post nothing"""
+        restore_client = RestoreClient({self.original_json['uri']: {'title': 'Original', 'lock_version': 3}})
+        self.assertEqual(restore_record(restore_client, self.original_json)['status'], 'unchanged')
+        restore_client.records[self.original_json['uri']]['lock_version'] = 4
+        self.assertEqual(restore_record(restore_client, self.original_json, dry_run=True)['status'], 'restore')
+        self.assertEqual(restore_client.posts, [])
+
+    def test_error(self):
+        """Tests that a failed post or request is journaled as an error"""
+        restore_client = RestoreClient({self.original_json['uri']: {'title': 'Changed', 'lock_version': 4}})
+        restore_client.update_object = lambda object_uri, updated_json: None
+        self.assertEqual(restore_record(restore_client, self.original_json)['status'], 'error')
+        restore_client.failing_uris = [self.original_json['uri']]
+        journal_entry = restore_record(restore_client, self.original_json)
+        self.assertEqual(journal_entry['status'], 'error')
+        self.assertIn('Unable to connect', journal_entry['message'])
+
+
+class TestBackupRecords(unittest.TestCase):
+
+    def setUp(self):
+        self.backup_dir = tempfile.TemporaryDirectory()
+        self.backup_path = os.path.join(self.backup_dir.name, 'original_data.jsonl.gz')
+        with BackupWriter(self.backup_path, flush_records=2) as backup_writer:
+            for object_id in range(4):
+                backup_writer.write({'uri': f'/locations/{object_id}', 'lock_version': 0})
+            backup_writer.write(None)
+        write_to_file(self.backup_path, {'uri': '/locations/1', 'lock_version': 1})
+
+    def tearDown(self):
+        self.backup_dir.cleanup()
+
+    def test_first_backup_only(self):
+        """Tests that each record is restored once, to its first backup, and records without a URI are skipped"""
+        test_records = list(backup_records(self.backup_path))
+        self.assertEqual([record['uri'] for record in test_records],
+                         [f'/locations/{object_id}' for object_id in range(4)])
+        self.assertTrue(all(record['lock_version'] == 0 for record in test_records))
+
+    def test_selected_uris(self):
+        """Tests restoring only the URIs listed in a CSV"""
+        uris_path = os.path.join(self.backup_dir.name, 'uris.csv')
+        with open(uris_path, 'w', encoding='UTF-8', newline='') as uris_file:
+            csv.writer(uris_file).writerows([['uri'], ['/locations/1'], ['/locations/3']])
+        self.assertEqual(list(backup_records(self.backup_path, read_validated_csv(uris_path, {'uri': 'uri'}))),
+                         [{'uri': '/locations/1', 'lock_version': 0}, {'uri': '/locations/3', 'lock_version': 0}])
+
+    def test_selected_uris_without_slash(self):
+        """Tests that listed URIs without a leading slash are found in the backup"""
+        self.assertEqual(list(backup_records(self.backup_path, [{'uri': 'locations/2'}])),
+                         [{'uri': '/locations/2', 'lock_version': 0}])
+
+    def test_selected_uris_without_lock_version(self):
+        """Tests that a listed URI is restored to its first backup even when that backup has no lock_version"""
+        write_to_file(self.backup_path, {'uri': '/locations/4', 'title': 'First'})
+        write_to_file(self.backup_path, {'uri': '/locations/4', 'title': 'Second', 'lock_version': 1})
+        self.assertEqual(list(backup_records(self.backup_path, [{'uri': '/locations/4'}])),
+                         [{'uri': '/locations/4', 'title': 'First'}])
+
+    def test_read_journal(self):
+        """Tests that only records with a finished status are skipped on the next run"""
+        journal_path = os.path.join(self.backup_dir.name, 'original_data.jsonl.gz.restore.jsonl')
+        with jsonlines.open(journal_path, mode='w') as journal_writer:
+            journal_writer.write_all([{'uri': '/locations/0', 'status': 'restored'},
+                                      {'uri': '/locations/1', 'status': 'conflict'},
+                                      {'uri': '/locations/2', 'status': 'error'},
+                                      {'uri': '/locations/3', 'status': 'unchanged'}])
+        self.assertEqual(read_journal(journal_path), {'/locations/0', '/locations/3'})
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,58 @@
+# This script consists of unittests for run_sql_report.py
+import csv
+import os
+import tempfile
+import unittest
+
+from python_scripts.repeatable.run_sql_report import *
+
+
+class TestParseParameters(unittest.TestCase):
+
+    def test_single_and_list_values(self):
+        """Tests that single values are kept, whole numbers converted to int and comma values split into lists"""
+        test_parameters = parse_parameters(['repo_id=21', 'excluded_repo_ids=11,23,50,52', 'repo_code=NMAH-AF'])
+        self.assertEqual(test_parameters['repo_id'], 21)
+        self.assertEqual(test_parameters['excluded_repo_ids'], [11, 23, 50, 52])
+        self.assertEqual(test_parameters['repo_code'], 'NMAH-AF')
+
+    def test_bad_parameter(self):
+        """Tests that a parameter without a value raises a ValueError"""
+        with self.assertRaises(ValueError):
+            parse_parameters(['repo_id'])
+
+
+class TestBindParameters(unittest.TestCase):
+
+    def test_list_parameter(self):
+        """Tests that list parameters are expanded into one placeholder per value"""
+        test_statement, test_parameters = bind_parameters('SELECT id FROM repository WHERE id NOT IN (:repo_ids)',
+                                                          {'repo_ids': [11, 23]})
+        self.assertEqual(test_statement, 'SELECT id FROM repository WHERE id NOT IN (%(repo_ids_0)s, %(repo_ids_1)s)')
+        self.assertEqual(test_parameters, {'repo_ids_0': 11, 'repo_ids_1': 23})
+
+    def test_no_parameters(self):
+        """Tests that SQL without placeholders is returned unchanged, including time literals and % wildcards"""
+        test_sql = 'SELECT id FROM user WHERE username LIKE "z-%" AND system_mtime > "2024-01-01 10:30:00"'
+        self.assertEqual(bind_parameters(test_sql, {}), (test_sql, None))
+
+    def test_missing_parameter(self):
+        """Tests that a placeholder without a value raises a KeyError"""
+        with self.assertRaises(KeyError):
+            bind_parameters('SELECT id FROM archival_object WHERE repo_id = :repo_id', {})
+
+
+class TestWriteCsv(unittest.TestCase):
+
+    def test_batches(self):
+        """Tests that every batch is written below a header row"""
+        with tempfile.TemporaryDirectory() as output_dir:
+            output_file = os.path.join(output_dir, 'report.csv')
+            row_count = write_csv(output_file, ['id', 'name'], iter([[(1, 'a'), (2, 'b')], [(3, 'c')]]))
+            self.assertEqual(row_count, 3)
+            with open(output_file, 'r', encoding='UTF-8') as report_file:
+                self.assertEqual(list(csv.reader(report_file)), [['id', 'name'], ['1', 'a'], ['2', 'b'], ['3', 'c']])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,58 @@
+# This script consists of unittests for schedule_jobs.py
+import contextlib
+import csv
+import io
+import os
+import tempfile
+import unittest
+
+from python_scripts.repeatable.schedule_jobs import *
+
+
+class TestScheduledScripts(unittest.TestCase):
+
+    def setUp(self):
+        self.csv_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.csv_dir.cleanup()
+
+    def write_csv(self, csv_rows):
+        csv_path = os.path.join(self.csv_dir.name, 'rows.csv')
+        with open(csv_path, 'w', encoding='UTF-8', newline='') as csv_file:
+            csv.writer(csv_file).writerows(csv_rows)
+        return csv_path
+
+    def test_update_fileuri(self):
+        """Tests that an update_fileuri job updates the digital object of each row"""
+        rows, job_options = scheduled_scripts['update_fileuri'](self.write_csv(
+            [['repo_id', 'digital_object_id', 'updated_file_uri'], ['2', '5', 'https://example.com/5.jpg']]))
+        self.assertEqual([job_options['row_uri'](row) for row in rows], ['/repositories/2/digital_objects/5'])
+        self.assertIs(job_options['transform'], update_file_uri)
+
+    def test_update_subjects(self):
+        """Tests that an update_subjects job updates the subject of each row and rejects an invalid CSV"""
+        rows, job_options = scheduled_scripts['update_subjects'](self.write_csv(
+            [['aspace_subject_id', 'new_title', 'new_scope_note', 'new_EMu_ID'], ['7', 'Baskets', '', '123']]))
+        self.assertEqual([job_options['row_uri'](row) for row in rows], ['/subjects/7'])
+        self.assertIs(job_options['transform'], build_subject)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertIsNone(scheduled_scripts['update_subjects'](self.write_csv(
+                [['aspace_subject_id', 'new_title', 'new_scope_note', 'new_EMu_ID'], ['seven', '', '', '123']]))[0])
+
+    def test_strip_whitespace(self):
+        """Tests that a strip_whitespace job groups the rows for the same record and counts each row in progress"""
+        rows, job_options = scheduled_scripts['strip_whitespace'](self.write_csv(
+            [['id', 'repo_id', 'field_1', 'field_2'], ['5', '2', 'title', ''], ['5', '2', 'file_versions', 'file_uri'],
+             ['6', '2', 'title', '']]), object_type='digital_objects')
+        records = list(rows)
+        self.assertEqual([(record['uri'], job_options['row_weight'](record)) for record in records],
+                         [('/repositories/2/digital_objects/5', 2), ('/repositories/2/digital_objects/6', 1)])
+        self.assertEqual(job_options['change_parameters'], {'object_type': 'digital_objects'})
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertIsNone(scheduled_scripts['strip_whitespace'](self.write_csv([['id'], ['five']]),
+                                                                    object_type='digital_objects')[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
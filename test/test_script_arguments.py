@@ -0,0 +1,37 @@
+# This script consists of unittests for the command line arguments of every script
+import contextlib
+import importlib
+import io
+import sys
+import unittest
+
+from pathlib import Path
+from unittest import mock
+
+# The scripts folder, searched for every script with a parseArguments() function
+scripts_dir = Path(__file__).resolve().parents[1] / 'python_scripts'
+
+
+class TestParseArguments(unittest.TestCase):
+
+    def test_help(self):
+        """Tests that the argument parser of every script can be built, so no two arguments share an option string"""
+        for script_path in sorted(scripts_dir.rglob('*.py')):
+            if 'def parseArguments' not in script_path.read_text(encoding='UTF-8'):
+                continue
+            module_name = '.'.join(script_path.relative_to(scripts_dir.parent).with_suffix('').parts)
+            with self.subTest(script=module_name):
+                try:
+                    script = importlib.import_module(module_name)
+                except ModuleNotFoundError as import_error:
+                    self.skipTest(f'{import_error.name} is not installed')
+                with mock.patch.object(sys, 'argv', [script_path.name, '--help']), \
+                        contextlib.redirect_stdout(io.StringIO()) as help_text, \
+                        self.assertRaises(SystemExit) as parser_exit:
+                    script.parseArguments()
+                self.assertEqual(parser_exit.exception.code, 0)
+                self.assertIn('usage:', help_text.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -45,5 +45,17 @@ class TestStripWhitespace(unittest.TestCase):
         test_response = strip_whitespace(sample_json, 'missing', '')
         self.assertIsNone(test_response)
 
+    def test_strip_record(self):
+        """Tests that every field listed for a record is stripped in a copy of the record"""
+        test_json = {"uri": "/repositories/2/resources/7", "title": "Test resource 7\n\n", "display_string": " Test "}
+        record_rows = {'uri': test_json['uri'], 'rows': [{'field_1': 'title', 'field_2': ''},
+                                                          {'field_1': 'missing', 'field_2': ''},
+                                                          {'field_1': 'display_string', 'field_2': ''}]}
+        test_response = strip_record(test_json, record_rows)
+        self.assertEqual((test_response['title'], test_response['display_string']), ('Test resource 7', 'Test'))
+        self.assertEqual(test_json['title'], 'Test resource 7\n\n')
+        self.assertIsNone(strip_record(test_json, {'uri': test_json['uri'],
+                                                   'rows': [{'field_1': 'missing', 'field_2': ''}]}))
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
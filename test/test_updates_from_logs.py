@@ -0,0 +1,147 @@
+# This script consists of unittests for updates_from_logs.py
+import contextlib
+import csv
+import gzip
+import io
+import os
+import tempfile
+import threading
+import unittest
+
+from python_scripts.one_time_scripts.updates_from_logs import *
+
+
+class ReplayClient:
+    """Records the order posts are made in, standing in for the ASnake client"""
+
+    def __init__(self, failing_rows=()):
+        self.posts = []
+        self.failing_rows = failing_rows
+        self.lock = threading.Lock()
+
+    def post(self, path, json):
+        if json.get('row') in self.failing_rows:
+            raise ConnectionError(path)
+        with self.lock:
+            self.posts.append((path, json.get('row')))
+        return self
+
+    def json(self):
+        return {'status': 'Updated'}
+
+
+class TestReplayUpdates(unittest.TestCase):
+
+    def setUp(self):
+        self.replay_dir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.replay_dir.name, 'updates.csv')
+        with open(self.csv_path, 'w', encoding='UTF-8', newline='') as csv_file:
+            csv_writer = csv.writer(csv_file)
+            csv_writer.writerow(['Path', 'JSON'])
+            for row_number in range(1, 201):
+                csv_writer.writerow([f'/repositories/2/archival_objects/{row_number % 7}', f'{{"row": {row_number}}}'])
+
+    def tearDown(self):
+        self.replay_dir.cleanup()
+
+    def test_path_order(self):
+        """Tests that every update is posted and updates to the same path are posted in the order they were logged"""
+        test_client = ReplayClient()
+        with contextlib.redirect_stdout(io.StringIO()):
+            status_counts = replay_updates(test_client, read_update_csv(self.csv_path), workers=4)
+        self.assertEqual(status_counts['posted'], 200)
+        for object_id in range(7):
+            path_rows = [row for path, row in test_client.posts
+                         if path == f'/repositories/2/archival_objects/{object_id}']
+            self.assertEqual(path_rows, sorted(path_rows))
+
+    def test_collapse(self):
+        """Tests that only the last update for each path is kept"""
+        test_updates = list(collapse_updates(lambda: read_update_csv(self.csv_path)))
+        self.assertEqual([row_number for row_number, _, _ in test_updates], list(range(194, 201)))
+
+    def test_resume(self):
+        """Tests that a failed post holds back later updates to its path until the next replay"""
+        checkpoint_path = os.path.join(self.replay_dir.name, 'updates.csv.checkpoint')
+        with contextlib.redirect_stdout(io.StringIO()):
+            first_counts = replay_updates(ReplayClient(failing_rows=(3,)), read_update_csv(self.csv_path),
+                                          checkpoint_path=checkpoint_path)
+            retry_client = ReplayClient()
+            second_counts = replay_updates(retry_client, read_update_csv(self.csv_path),
+                                           checkpoint_path=checkpoint_path)
+        self.assertEqual(first_counts['failed'], 1)
+        self.assertEqual([row for _, row in retry_client.posts], list(range(3, 201, 7)))
+        self.assertEqual(second_counts['already finished'], 200 - len(retry_client.posts))
+
+
+class TestReadUpdateLogs(unittest.TestCase):
+
+    def setUp(self):
+        self.log_dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.log_dir.name, 'strip_whitespace_2024-05-01.log'), 'w') as log_file:
+            log_file.write("2024-05-01T10:00:00.000000-0400-INFO: Running strip_whitespace.py script\n"
+                           "2024-05-01T10:00:01.000000-0400-INFO: \n"
+                           "archival_objects 5 would be updated with the following data:\n"
+                           "{'uri': '/repositories/2/archival_objects/5', 'title': 'Letter', 'publish': True}\n"
+                           "\n"
+                           "2024-05-01T12:00:00.000000-0400-INFO: \n"
+                           "Object /repositories/2/digital_objects/9 would be updated with the following data:\n"
+                           '    {"title": "Photograph"}\n'
+                           "\n")
+        with gzip.open(os.path.join(self.log_dir.name, 'update_fileuri_2024-04-30.log.gz'), 'wt') as log_file:
+            log_file.write("2024-04-30T09:00:00.000000-0400-INFO: \n"
+                           "Digital object 3 would be updated with the following data:\n"
+                           "    {'uri': '/repositories/2/digital_objects/3', 'file_versions': []}\n")
+
+    def tearDown(self):
+        self.log_dir.cleanup()
+
+    def test_updates(self):
+        """Tests reading updates logged as printed dictionaries and JSON from plain and gzipped logs in time order,
+        each identified by its log file, without the .gz extension, and line"""
+        log_dir = Path(self.log_dir.name).resolve()
+        test_updates = list(read_update_logs([self.log_dir.name]))
+        self.assertEqual([(entry_id, path) for entry_id, path, _ in test_updates],
+                         [(f'{log_dir}/update_fileuri_2024-04-30.log:1', '/repositories/2/digital_objects/3'),
+                          (f'{log_dir}/strip_whitespace_2024-05-01.log:2', '/repositories/2/archival_objects/5'),
+                          (f'{log_dir}/strip_whitespace_2024-05-01.log:6', '/repositories/2/digital_objects/9')])
+        self.assertEqual(json.loads(test_updates[1][2])['publish'], True)
+
+    def test_filters(self):
+        """Tests that the time window and script filters keep the IDs of the updates they let through"""
+        all_ids = {path: entry_id for entry_id, path, _ in read_update_logs([self.log_dir.name])}
+        test_updates = list(read_update_logs([self.log_dir.name], since='2024-05-01T11:00:00-04:00'))
+        self.assertEqual([entry_id for entry_id, _, _ in test_updates], [all_ids['/repositories/2/digital_objects/9']])
+        test_updates = list(read_update_logs([self.log_dir.name], script_names=['strip_whitespace']))
+        self.assertEqual([(entry_id, path) for entry_id, path, _ in test_updates],
+                         [(all_ids[path], path) for path in ('/repositories/2/archival_objects/5',
+                                                             '/repositories/2/digital_objects/9')])
+
+    def test_own_logs(self):
+        """Tests that the dry run messages in this script's own logs are only replayed when its logs are asked for"""
+        with open(os.path.join(self.log_dir.name, 'updates_from_logs_2024-05-02.log'), 'w') as log_file:
+            log_file.write("2024-05-02T09:00:00.000000-0400-INFO: \n"
+                           "Object /repositories/2/digital_objects/9 would be updated with the following data:\n"
+                           '    {"title": "Photograph"}\n')
+        self.assertEqual([Path(log_file).name for log_file in find_log_files([self.log_dir.name])],
+                         ['strip_whitespace_2024-05-01.log', 'update_fileuri_2024-04-30.log.gz'])
+        self.assertEqual([Path(log_file).name for log_file in find_log_files([self.log_dir.name],
+                                                                              script_names=['updates_from_logs'])],
+                         ['updates_from_logs_2024-05-02.log'])
+
+    def test_filtered_resume(self):
+        """Tests that a replay with different filters than the last one only skips the updates that were posted"""
+        checkpoint_path = os.path.join(self.log_dir.name, 'logs.checkpoint')
+        with contextlib.redirect_stdout(io.StringIO()):
+            first_counts = replay_updates(ReplayClient(), read_update_logs([self.log_dir.name],
+                                                                           script_names=['strip_whitespace']),
+                                          checkpoint_path=checkpoint_path)
+            retry_client = ReplayClient()
+            second_counts = replay_updates(retry_client, read_update_logs([self.log_dir.name]),
+                                           checkpoint_path=checkpoint_path)
+        self.assertEqual((first_counts['posted'], second_counts['already finished']), (2, 2))
+        self.assertEqual([path for path, _ in retry_client.posts], ['/repositories/2/digital_objects/3'])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -1,14 +1,22 @@
 # This script consists of unittests for shared utilities.py
 import contextlib
+import csv
 import io
 import json
 import os
+import queue
 import tempfile
+import threading
+import time
 import unittest
 
+from concurrent.futures import ThreadPoolExecutor
 from test.vcr_utils import vcr
 from dotenv import load_dotenv, find_dotenv
+from functools import partial
+from loguru import logger
 from pathlib import Path
+from python_scripts.one_time_scripts.delete_dometadata import delete_repository_metadata
 from python_scripts.utilities import *
 
 @vcr.use_cassette()
@@ -27,11 +35,13 @@ class TestArchivesSpaceClass(unittest.TestCase):
     def test_asnake_connection(self):
         """Tests a good connection to ArchivesSnake creates an ASnakeClient class for the aspace_client instance
         variable"""
+        from asnake.client import ASnakeClient
         self.assertIsInstance(local_aspace.aspace_client, ASnakeClient)
 
     @vcr.use_cassette
     def test_bad_connection(self):
         """Tests that a bad connection to the ArchivesSpace API raises an ASnakeAuthError"""
+        from asnake.client.web_client import ASnakeAuthError
         with self.assertRaises(ASnakeAuthError):
             ASpaceAPI(os.getenv('as_api'), "bad_user", "bad_password")
 
@@ -293,6 +303,7 @@ class TestASpaceDatabaseClass(unittest.TestCase):
     def test_bad_connection(self):
         """Tests that an error is raised with making a connection with a bad username and password using the database
         found in the secrets.py file"""
+        import mysql.connector as mysql
         with self.assertRaises(mysql.Error):
             ASpaceDatabase('bad_un', 'bad_pw', 'bad_host', os.getenv('db_name'),
                                int(os.getenv('db_port')))
@@ -306,12 +317,14 @@ class TestASpaceDatabaseClass(unittest.TestCase):
 
     def test_bad_query(self):
         """Tests that a badly formatted SQL query will raise a mysql.Error"""
+        import mysql.connector as mysql
         test_bad_query = ('SELECT nothing, username FROM user')
         with self.assertRaises(mysql.Error):
             test_dbconnection.query_database(test_bad_query)
 
     def test_invalid_query(self):
         """Tests that an invalid building location name (") returns an escaped error"""
+        import mysql.connector as mysql
         invalid_query_syntax = '"'
         test_query = ('SELECT location.id FROM location '
                          'WHERE '
@@ -322,19 +335,436 @@ class TestASpaceDatabaseClass(unittest.TestCase):
         self.assertEqual(mysql_error.msg, r'''You have an error in your SQL syntax; check the manual that corresponds to your MySQL server version for the right syntax to use near '"""' at line 1''')
 
 
+class TestQueryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def test_normalized_key(self):
+        """Tests that the same query written with different whitespace and a trailing semicolon gets the same key"""
+        self.assertEqual(query_cache_key('SELECT name,  username\n FROM user;'),
+                         query_cache_key('SELECT name, username FROM user'))
+        self.assertNotEqual(query_cache_key('SELECT name FROM user WHERE id = %s', (1,)),
+                            query_cache_key('SELECT name FROM user WHERE id = %s', (2,)))
+
+    def test_referenced_tables(self):
+        """Tests finding the tables in the FROM and JOIN clauses of a query, ignoring subqueries"""
+        test_query = ('SELECT T.id FROM (SELECT do.id FROM digital_object AS do '
+                      'JOIN note ON note.digital_object_id = do.id) AS T JOIN `repository` ON repository.id = T.id')
+        self.assertEqual(referenced_tables(test_query), ['digital_object', 'note', 'repository'])
+
+    def test_cached_query(self):
+        """Tests that a cached query writes a cache file and returns the same results when run again"""
+        cached_dbconnection = ASpaceDatabase(os.getenv('db_un'), os.getenv('db_pw'), os.getenv('db_host'),
+                                             os.getenv('db_name'), int(os.getenv('db_port')),
+                                             cache_dir=self.cache_dir.name)
+        test_query = 'SELECT name, username FROM user'
+        first_results = cached_dbconnection.query_database(test_query)
+        self.assertEqual(len(os.listdir(self.cache_dir.name)), 1)
+        second_results = cached_dbconnection.query_database(test_query)
+        self.assertEqual(first_results, second_results)
+        cached_dbconnection.close_connection()
+
+
+class TestThrottleProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.throttle_profile = ThrottleProfile(
+            [{'start': '08:00', 'end': '18:00', 'days': [0, 1, 2, 3, 4], 'requests_per_second': 2, 'max_in_flight': 1},
+             {'start': '22:00', 'end': '06:00', 'requests_per_second': None, 'max_in_flight': 16}],
+            requests_per_second=10, max_in_flight=4)
+
+    def test_current_limits(self):
+        """Tests the limits of business hours, weekends, a window running past midnight, and the default limits"""
+        def local_time(weekday, hour, minute=0):
+            return time.struct_time((2026, 10, 19 + weekday, hour, minute, 0, weekday, 292 + weekday, -1))
+
+        self.assertEqual(self.throttle_profile.current_limits(local_time(0, 9, 30)), (2, 1))
+        self.assertEqual(self.throttle_profile.current_limits(local_time(5, 9, 30)), (10, 4))
+        self.assertEqual(self.throttle_profile.current_limits(local_time(2, 18)), (10, 4))
+        self.assertEqual(self.throttle_profile.current_limits(local_time(2, 23, 15)), (None, 16))
+        self.assertEqual(self.throttle_profile.current_limits(local_time(3, 5, 59)), (None, 16))
+
+    def test_throttle(self):
+        """Tests that throttled calls keep to the rate and in-flight limits of the current window"""
+        throttle_profile = ThrottleProfile(requests_per_second=100, max_in_flight=1)
+        in_flight = []
+
+        def request():
+            in_flight.append(throttle_profile.in_flight)
+            time.sleep(0.001)
+
+        throttled_request = throttle_profile.throttle(request)
+        start_time = time.perf_counter()
+        request_threads = [threading.Thread(target=throttled_request) for _ in range(5)]
+        for request_thread in request_threads:
+            request_thread.start()
+        for request_thread in request_threads:
+            request_thread.join()
+        self.assertGreaterEqual(time.perf_counter() - start_time, 0.04)
+        self.assertEqual(in_flight, [1] * 5)
+        self.assertEqual(throttle_profile.in_flight, 0)
+
+    def test_read_throttle_profile(self):
+        """Tests reading a throttle profile from a JSON file, and that a missing file is logged and returns None"""
+        with tempfile.TemporaryDirectory() as profile_dir:
+            profile_path = os.path.join(profile_dir, 'throttle_profile.json')
+            with open(profile_path, 'w', encoding='UTF-8') as profile_file:
+                json.dump({'windows': [{'start': '08:00', 'end': '18:00', 'max_in_flight': 2}],
+                           'requests_per_second': 20}, profile_file)
+            throttle_profile = read_throttle_profile(profile_path)
+            self.assertEqual(throttle_profile.windows[0]['start'], 480)
+            self.assertEqual(throttle_profile.default_limits, (20, None))
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertIsNone(read_throttle_profile(os.path.join(profile_dir, 'missing.json')))
+
+
 class TestClientLogin(unittest.TestCase):
 
     def test_default_connection(self):
         """Test using default connection info found in secrets.py"""
+        from asnake.client import ASnakeClient
         self.assertIsInstance(local_aspace.aspace_client, ASnakeClient)
 
     @vcr.use_cassette
     def test_error_connection(self):
         """Test using garbage input for ASnakeAuthError return"""
+        from asnake.client.web_client import ASnakeAuthError
         not_aspace = client_login("https://www.cnn.com", "garbage", "garbage")
         self.assertEqual(not_aspace, ASnakeAuthError)
 
 
+class TestLocalRecordStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store_dir = tempfile.TemporaryDirectory()
+        self.record_store = LocalRecordStore(os.path.join(self.store_dir.name, 'records.sqlite'))
+
+    def tearDown(self):
+        self.record_store.close()
+        self.store_dir.cleanup()
+
+    def test_save_and_get(self):
+        """Tests that saved records can be read back by URI and by type and repository, and that saving a record again
+        replaces it"""
+        self.record_store.save_records('digital_objects', 2, [
+            {'uri': '/repositories/2/digital_objects/1', 'lock_version': 0, 'title': 'First'},
+            {'uri': '/repositories/2/digital_objects/2', 'lock_version': 0, 'title': 'Second'}])
+        self.record_store.save_records('digital_objects', 2, [
+            {'uri': '/repositories/2/digital_objects/1', 'lock_version': 1, 'title': 'First updated'}])
+        self.assertEqual(self.record_store.get_record('/repositories/2/digital_objects/1')['title'], 'First updated')
+        self.assertEqual(len(list(self.record_store.iter_records('digital_objects', 2))), 2)
+        self.assertEqual(self.record_store.stored_ids('digital_objects', 2), {1, 2})
+        self.assertIsNone(self.record_store.get_record('/repositories/2/digital_objects/3'))
+
+    def test_delete_and_sync_state(self):
+        """Tests removing records and recording the last modification time synced"""
+        self.record_store.save_records('resources', 2, [{'uri': '/repositories/2/resources/5'}])
+        self.record_store.delete_records('resources', 2, [5])
+        self.assertEqual(self.record_store.stored_ids('resources', 2), set())
+        self.assertIsNone(self.record_store.last_mtime('resources', 2))
+        self.record_store.set_last_mtime('resources', 2, '2024-05-01 10:00:00', '2024-05-01T10:05:00+00:00')
+        self.assertEqual(self.record_store.last_mtime('resources', 2), '2024-05-01 10:00:00')
+
+
+class TestProgressJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.journal_dir = tempfile.TemporaryDirectory()
+        self.journal_path = os.path.join(self.journal_dir.name, 'rows.csv.progress.sqlite')
+
+    def tearDown(self):
+        self.journal_dir.cleanup()
+
+    def test_resume(self):
+        """Tests that only rows finished by a previous run are skipped when resuming"""
+        test_rows = [{'uri': f'/locations/{object_id}'} for object_id in range(4)]
+        with ProgressJournal(self.journal_path) as journal:
+            for test_row, status in zip(test_rows, ['posted', 'unchanged', 'fetched', 'failed']):
+                journal.mark(row_hash(test_row), test_row['uri'], status)
+        with ProgressJournal(self.journal_path, resume=True) as journal:
+            self.assertEqual([journal.is_finished(row_hash(test_row)) for test_row in test_rows],
+                             [True, True, False, False])
+            self.assertEqual(journal.status_counts(), {'posted': 1, 'unchanged': 1, 'fetched': 1, 'failed': 1})
+        with ProgressJournal(self.journal_path) as journal:
+            self.assertFalse(journal.is_finished(row_hash(test_rows[0])))
+
+    def test_row_hash(self):
+        """Tests that row hashes do not depend on column order"""
+        self.assertEqual(row_hash({'uri': '/locations/1', 'repo_id': 2}),
+                         row_hash({'repo_id': 2, 'uri': '/locations/1'}))
+        self.assertNotEqual(row_hash({'uri': '/locations/1'}), row_hash({'uri': '/locations/2'}))
+
+
+class TestChangeLedger(unittest.TestCase):
+
+    class LedgerClient:
+        """Serves records with their modification times and honors modified_since, standing in for ASpaceAPI"""
+
+        def __init__(self, records):
+            self.records = records
+            self.requests = []
+            self.fetched_uris = []
+
+        def get_modified_ids(self, record_type, modified_since=None, repo_uri=''):
+            self.requests.append((repo_uri, record_type))
+            return [int(uri.rsplit('/', 1)[1]) for uri, (system_mtime, _) in self.records.items()
+                    if uri.rsplit('/', 1)[0] == f'{repo_uri}/{record_type}'
+                    and (modified_since is None or system_mtime >= modified_since)]
+
+        def get_object_set(self, record_type, object_ids, repo_uri=''):
+            object_uris = [f'{repo_uri}/{record_type}/{object_id}' for object_id in object_ids]
+            self.fetched_uris.extend(object_uris)
+            return [self.records[object_uri][1] for object_uri in object_uris if object_uri in self.records]
+
+    def setUp(self):
+        self.ledger_dir = tempfile.TemporaryDirectory()
+        self.ledger_path = os.path.join(self.ledger_dir.name, 'change_ledger.sqlite')
+
+    def tearDown(self):
+        self.ledger_dir.cleanup()
+
+    def test_applied_changes(self):
+        """Tests that recorded changes are applied only in their environment, for their fingerprint, and while their
+        record has not been modified since"""
+        with ChangeLedger(self.ledger_path, 'https://staging/api') as ledger:
+            for object_id in range(3):
+                ledger.record(f'/repositories/2/archival_objects/{object_id}', 'publish-false', 4)
+            ledger.record('/locations/1', 'owner-repo-2', 1)
+        posted = int(time.time())
+        test_client = self.LedgerClient({
+            '/repositories/2/archival_objects/0': (posted, {'uri': '/repositories/2/archival_objects/0',
+                                                            'lock_version': 4}),
+            '/repositories/2/archival_objects/1': (posted + 60, {'uri': '/repositories/2/archival_objects/1',
+                                                                 'lock_version': 5}),
+            '/repositories/2/archival_objects/2': (posted - 3600, {'uri': '/repositories/2/archival_objects/2',
+                                                                   'lock_version': 4}),
+            '/repositories/2/archival_objects/9': (posted + 60, {'uri': '/repositories/2/archival_objects/9',
+                                                                 'lock_version': 2}),
+            '/locations/1': (posted, {'uri': '/locations/1', 'lock_version': 1})})
+        with ChangeLedger(self.ledger_path, 'https://staging/api') as ledger:
+            ledger.refresh(test_client)
+            self.assertEqual(sorted(test_client.requests),
+                             [('', 'locations'), ('/repositories/2', 'archival_objects')])
+            self.assertEqual(sorted(test_client.fetched_uris), ['/locations/1', '/repositories/2/archival_objects/0',
+                                                                '/repositories/2/archival_objects/1'])
+            self.assertTrue(ledger.is_applied('/repositories/2/archival_objects/0', 'publish-false'))
+            self.assertFalse(ledger.is_applied('/repositories/2/archival_objects/1', 'publish-false'))
+            self.assertTrue(ledger.is_applied('/repositories/2/archival_objects/2', 'publish-false'))
+            self.assertTrue(ledger.is_applied('/repositories/2/archival_objects/1', 'publish-false', lock_version=4))
+            self.assertFalse(ledger.is_applied('/repositories/2/archival_objects/2', 'publish-false', lock_version=5))
+            self.assertFalse(ledger.is_applied('/repositories/2/archival_objects/0', 'publish-true'))
+            self.assertTrue(ledger.is_applied('/locations/1', 'owner-repo-2'))
+        with ChangeLedger(self.ledger_path, 'https://prod/api') as ledger:
+            self.assertFalse(ledger.is_applied('/locations/1', 'owner-repo-2'))
+
+
+class TestWorkQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.queue_dir = tempfile.TemporaryDirectory()
+        self.queue_path = os.path.join(self.queue_dir.name, 'rows.csv.queue.sqlite')
+        self.rows = [{'uri': f'/locations/{object_id}'} for object_id in range(5)]
+
+    def tearDown(self):
+        self.queue_dir.cleanup()
+
+    def test_load(self):
+        """Tests that only the first worker to load the input stores it and a different input is refused"""
+        with WorkQueue(self.queue_path) as first_queue, WorkQueue(self.queue_path) as second_queue:
+            self.assertEqual(first_queue.load(self.rows, 'rows.csv', chunk_size=2), 3)
+            self.assertEqual(second_queue.load(self.rows, 'rows.csv', chunk_size=2), 3)
+            self.assertEqual(second_queue.status_counts(), {'pending': 3})
+            self.assertIsNone(second_queue.load(self.rows, 'other_rows.csv'))
+
+    def test_complete_once(self):
+        """Tests that each chunk is claimed by one worker and its completion is only recorded once"""
+        with WorkQueue(self.queue_path) as work_queue:
+            work_queue.load(self.rows, 'rows.csv', chunk_size=2)
+            chunk_id, attempt, chunk_rows = work_queue.claim('host1-1')
+            self.assertEqual(chunk_rows, self.rows[:2])
+            self.assertEqual(work_queue.claim('host2-1')[0], chunk_id + 1)
+            self.assertTrue(work_queue.renew(chunk_id, 'host1-1', attempt))
+            self.assertTrue(work_queue.complete(chunk_id, 'host1-1', attempt, {'posted': 2}))
+            self.assertFalse(work_queue.complete(chunk_id, 'host1-1', attempt, {'posted': 2}))
+            self.assertEqual(work_queue.results(), {'posted': 2})
+            self.assertEqual(work_queue.status_counts(), {'done': 1, 'leased': 1, 'pending': 1})
+
+    def test_expired_lease(self):
+        """Tests that a chunk whose lease ran out is claimed by another worker and the first worker cannot complete
+        it, and that a released chunk can be claimed straight away"""
+        with WorkQueue(self.queue_path, lease_seconds=0) as work_queue:
+            work_queue.load(self.rows, 'rows.csv', chunk_size=5)
+            chunk_id, first_attempt, _ = work_queue.claim('host1-1')
+            chunk_id, second_attempt, _ = work_queue.claim('host2-1')
+            self.assertEqual(second_attempt, first_attempt + 1)
+            self.assertFalse(work_queue.renew(chunk_id, 'host1-1', first_attempt))
+            self.assertFalse(work_queue.complete(chunk_id, 'host1-1', first_attempt))
+            work_queue.lease_seconds = 600
+            work_queue.release(chunk_id, 'host2-1', second_attempt)
+            chunk_id, third_attempt, _ = work_queue.claim('host3-1')
+            self.assertIsNone(work_queue.claim('host2-1'))
+            self.assertTrue(work_queue.complete(chunk_id, 'host3-1', third_attempt))
+
+
+class TestFanOutRepositories(unittest.TestCase):
+
+    def test_merged_results(self):
+        """Tests that results from every repository are merged in the order of the repositories given"""
+        test_repositories = [{'uri': f'/repositories/{repo_id}', 'repo_code': f'repo{repo_id}'} for repo_id in range(6)]
+
+        def repo_job(repository, progress):
+            for record_id in range(3):
+                progress.add_result(f'{repository["uri"]}/digital_objects/{record_id}')
+
+        test_results, test_progress = fan_out_repositories(test_repositories, repo_job, max_workers=3)
+        self.assertEqual(len(test_results), 18)
+        self.assertEqual(test_results[0], '/repositories/0/digital_objects/0')
+        self.assertEqual(test_results[-1], '/repositories/5/digital_objects/2')
+        self.assertEqual(test_progress['/repositories/4'].processed, 3)
+
+    def test_failed_repository(self):
+        """Tests that a repository job raising an error is recorded for that repository without stopping the others"""
+        test_repositories = [{'uri': '/repositories/2', 'repo_code': 'good'},
+                             {'uri': '/repositories/3', 'repo_code': 'bad'}]
+
+        def repo_job(repository, progress):
+            if repository['repo_code'] == 'bad':
+                raise ValueError('bad repository')
+            progress.add_result(repository['uri'])
+
+        f = io.StringIO()
+        with contextlib.redirect_stdout(f):
+            test_results, test_progress = fan_out_repositories(test_repositories, repo_job)
+        self.assertEqual(test_results, ['/repositories/2'])
+        self.assertEqual(len(test_progress['/repositories/2'].errors), 0)
+        self.assertEqual(len(test_progress['/repositories/3'].errors), 1)
+        self.assertTrue('bad - fan_out_repositories() - Repository job stopped due to following error: bad repository'
+                        in f.getvalue())
+
+    def test_delete_repository_metadata(self):
+        """Tests that delete_repository_metadata run on every repository counts each digital object and error against
+        its own repository and merges the URIs of the updated digital objects"""
+
+        class MetadataClient:
+            def __init__(self):
+                self.lock = threading.Lock()
+                self.posts = []
+
+            def get_object(self, record_type, object_id, repo_uri=''):
+                if repo_uri == '/repositories/4':
+                    raise ConnectionError(repo_uri)
+                if object_id == 2:
+                    return None
+                return {'uri': f'{repo_uri}/{record_type}/{object_id}', 'notes': [] if object_id == 6 else [{}]}
+
+            def update_object(self, object_uri, updated_json):
+                if object_uri.endswith('/5'):
+                    return None
+                with self.lock:
+                    self.posts.append(object_uri)
+                return {'status': 'Updated', 'uri': object_uri}
+
+        test_repositories = [{'uri': '/repositories/2', 'repo_code': 'NMAI', 'digital_object_ids': [1, 2, 3]},
+                             {'uri': '/repositories/3', 'repo_code': 'CFCH', 'digital_object_ids': [4, 5, 6]},
+                             {'uri': '/repositories/4', 'repo_code': 'NMAH', 'digital_object_ids': [7]}]
+        test_client = MetadataClient()
+        with tempfile.TemporaryDirectory() as backup_dir, contextlib.redirect_stdout(io.StringIO()):
+            with BackupWriter(os.path.join(backup_dir, 'original_data.jsonl'), flush_records=1) as backup_writer:
+                test_results, test_progress = fan_out_repositories(
+                    test_repositories, partial(delete_repository_metadata, test_client, backup_writer), max_workers=2)
+        self.assertEqual(test_results, ['/repositories/2/digital_objects/1', '/repositories/2/digital_objects/3',
+                                        '/repositories/3/digital_objects/4'])
+        self.assertEqual(sorted(test_client.posts), test_results)
+        self.assertEqual({repo_uri: (progress.processed, len(progress.errors))
+                          for repo_uri, progress in test_progress.items()},
+                         {'/repositories/2': (3, 1), '/repositories/3': (3, 1), '/repositories/4': (1, 1)})
+        self.assertEqual([message for message, _ in test_progress['/repositories/3'].errors],
+                         ['delete_repository_metadata() - Unable to update digital object'])
+
+
+class TestProgressReporter(unittest.TestCase):
+
+    def test_report_rate(self):
+        """Tests that progress is reported at most every report_seconds, with the rates, errors, time left and stage
+        sizes"""
+        test_queue = queue.Queue()
+        test_queue.put('row')
+        progress = ProgressReporter('update_refids', total_rows=100, report_seconds=60, stages={'post': test_queue})
+        with contextlib.redirect_stdout(io.StringIO()) as test_output:
+            for _ in range(10):
+                progress.update()
+        self.assertEqual(test_output.getvalue(), '')
+        progress.last_report_time -= 60
+        with contextlib.redirect_stdout(io.StringIO()) as test_output:
+            progress.update(errors=1)
+        self.assertRegex(test_output.getvalue(), r'^update_refids: 11/100 rows \(11\.0%\), [\d.]+ rows/s now, '
+                                                 r'[\d.]+ rows/s average, 1 errors, \d+:\d\d:\d\d left, waiting: post 1\n$')
+
+    def test_finish(self):
+        """Tests the throughput summary at the end of a run"""
+        progress = ProgressReporter('delete_objects')
+        progress.update(3, errors=1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = progress.finish({'posted': 2, 'failed': 1})
+        self.assertRegex(summary, r"^delete_objects finished 3 rows in [\d.]+s \([\d.]+ rows/s, 1 errors\): "
+                                  r"{'posted': 2, 'failed': 1}$")
+
+    def test_format_duration(self):
+        """Tests formatting seconds as hours, minutes and seconds"""
+        self.assertEqual(format_duration(3725.4), '1:02:05')
+        self.assertEqual(format_duration(59.6), '0:01:00')
+
+
+class TestSetupLogging(unittest.TestCase):
+
+    def setUp(self):
+        self.log_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        logger.remove()
+        logger.configure(patcher=None)
+        log_settings.update(quiet=False, payload_length=None)
+        self.log_dir.cleanup()
+
+    def test_truncated_log(self):
+        """Tests that the log file is written by the background sink and long messages are cut short"""
+        setup_logging('update_refids', self.log_dir.name, payload_length=20)
+        logger.info({'uri': '/repositories/2/archival_objects/1', 'publish': False})
+        logger.debug('Not written at INFO level')
+        logger.complete()
+        logger.remove()
+        log_filenames = os.listdir(self.log_dir.name)
+        self.assertEqual(len(log_filenames), 1)
+        self.assertTrue(log_filenames[0].startswith('update_refids_'))
+        with open(os.path.join(self.log_dir.name, log_filenames[0]), 'r', encoding='UTF-8') as log_file:
+            self.assertEqual(log_file.read().split(': ', 1)[1],
+                             "{'uri': '/repositori... (43 more characters)\n")
+
+    def test_full_payload(self):
+        """Tests that messages bound with full_payload are written whole"""
+        setup_logging('update_refids', self.log_dir.name, payload_length=20)
+        logger.bind(full_payload=True).info({'uri': '/repositories/2/archival_objects/1', 'publish': False})
+        logger.complete()
+        logger.remove()
+        log_filename = os.listdir(self.log_dir.name)[0]
+        with open(os.path.join(self.log_dir.name, log_filename), 'r', encoding='UTF-8') as log_file:
+            self.assertEqual(log_file.read().split(': ', 1)[1],
+                             "{'uri': '/repositories/2/archival_objects/1', 'publish': False}\n")
+
+    def test_quiet(self):
+        """Tests that echo() only prints errors in quiet mode"""
+        setup_logging('suppress_objects', self.log_dir.name, quiet=True)
+        with contextlib.redirect_stdout(io.StringIO()) as test_output:
+            echo({'status': 'Suppressed'})
+            record_error('suppress_object() - Unable to suppress object', '/repositories/2/resources/1')
+        self.assertEqual(test_output.getvalue(),
+                         'suppress_object() - Unable to suppress object: /repositories/2/resources/1\n')
+
+
 class TestReadCSV(unittest.TestCase):
 
     def test_good_csv(self):
@@ -350,6 +780,71 @@ class TestReadCSV(unittest.TestCase):
         self.assertRaises(FileNotFoundError)
         self.assertEqual(test_subjects, None)
 
+    def test_count_csv_rows(self):
+        """Tests counting the rows of a CSV file, not counting the header row"""
+        test_subjects = read_csv(str(Path('test/fixtures/mergesubjects_testdata.csv')))
+        self.assertEqual(count_csv_rows(str(Path('test/fixtures/mergesubjects_testdata.csv'))),
+                         sum(1 for _ in test_subjects))
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertIsNone(count_csv_rows(str(Path('./test_data/fake.csv'))))
+
+
+class TestReadValidatedCsv(unittest.TestCase):
+
+    def setUp(self):
+        self.csv_dir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.csv_dir.name, 'objects.csv')
+
+    def tearDown(self):
+        self.csv_dir.cleanup()
+
+    def write_test_csv(self, rows):
+        with open(self.csv_path, 'w', encoding='UTF-8', newline='') as csv_file:
+            csv.writer(csv_file).writerows([['uri', 'repo_id', 'title']] + rows)
+
+    def test_valid_csv(self):
+        """Tests that the rows of a valid csv are read with their values converted to the column types"""
+        self.write_test_csv([['/repositories/2/archival_objects/5', '2', 'Letter'],
+                             ['repositories/12/digital_objects/7', ' 12 ', '']])
+        test_rows = list(read_validated_csv(self.csv_path, {'uri': 'uri', 'repo_id': 'int', 'title': 'text?'}))
+        self.assertEqual(test_rows[0], {'uri': '/repositories/2/archival_objects/5', 'repo_id': 2, 'title': 'Letter'})
+        self.assertEqual(test_rows[1]['repo_id'], 12)
+        self.assertIsNone(test_rows[1]['title'])
+
+    def test_bad_rows(self):
+        """Tests that every bad value is reported and no rows are returned"""
+        self.write_test_csv([['/repositories/2/archival_objects/5', '2', 'Letter'],
+                             ['https://example.org/5', 'two', 'Letter'],
+                             ['/locations/3', '2', ' ']])
+        test_errors = validate_csv(self.csv_path, {'uri': 'uri', 'repo_id': 'int', 'title': 'text'})
+        self.assertEqual(test_errors, ["row 3, uri: 'https://example.org/5' is not a valid uri",
+                                       "row 3, repo_id: 'two' is not a valid int",
+                                       "row 4, title: ' ' is not a valid text"])
+        f = io.StringIO()
+        with contextlib.redirect_stdout(f):
+            self.assertIsNone(read_validated_csv(self.csv_path, {'uri': 'uri', 'repo_id': 'int', 'title': 'text'}))
+        self.assertIn("row 3, repo_id: 'two' is not a valid int", f.getvalue())
+
+    def test_missing_column(self):
+        """Tests that a column missing from the csv is reported"""
+        self.write_test_csv([['/repositories/2/archival_objects/5', '2', 'Letter']])
+        self.assertEqual(validate_csv(self.csv_path, {'uri': 'uri', 'ref_id': 'text'}), ['missing column(s): ref_id'])
+
+
+class TestGroupRows(unittest.TestCase):
+
+    def test_group_rows(self):
+        """Tests that rows are grouped by key in key order with each group's rows in their original order, both in
+        memory and when sorted in runs on disk"""
+        test_rows = [{'uri': f'/repositories/2/archival_objects/{row_number % 4}', 'row': row_number}
+                     for row_number in range(20)]
+        test_rows.append({'uri': None, 'row': 20})
+        for max_rows_in_memory in (100, 3):
+            test_groups = list(group_rows(iter(test_rows), lambda row: row['uri'], max_rows_in_memory))
+            self.assertEqual([key for key, _ in test_groups],
+                             [''] + [f'/repositories/2/archival_objects/{object_id}' for object_id in range(4)])
+            self.assertEqual([row['row'] for row in test_groups[2][1]], [1, 5, 9, 13, 17])
+
 
 class TestCheckUrl(unittest.TestCase):
 
@@ -372,8 +867,9 @@ class TestWriteToFile(unittest.TestCase):
         self.file_path = self.temp_file.name
 
     def tearDown(self):
-        if os.path.exists(self.file_path):
-            os.remove(self.file_path)
+        for test_file in (self.file_path, f'{self.file_path}.idx'):
+            if os.path.exists(test_file):
+                os.remove(test_file)
 
     @vcr.use_cassette
     def test_new_data(self):
@@ -422,6 +918,238 @@ class TestWriteToFile(unittest.TestCase):
             print(f.getvalue())
         self.assertTrue(r"""write_to_file() - Unable to open or access jsonl file: [Errno 2] No such file or directory: '../test_data/test_bad_filepath$&@.jID(#*&^%'""" in f.getvalue())
 
+class TestBackupWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.jsonl', delete=False)
+        self.file_path = self.temp_file.name
+        self.temp_file.close()
+
+    def tearDown(self):
+        for test_file in (self.file_path, f'{self.file_path}.idx'):
+            if os.path.exists(test_file):
+                os.remove(test_file)
+
+    def test_buffered_writes(self):
+        """Tests that records are held until flush_records is reached and all are written when the writer closes"""
+        with BackupWriter(self.file_path, flush_records=3, flush_seconds=60) as backup_writer:
+            backup_writer.write({'uri': '/repositories/2/digital_objects/1'})
+            backup_writer.write({'uri': '/repositories/2/digital_objects/2'})
+            self.assertEqual(os.path.getsize(self.file_path), 0)
+            backup_writer.write({'uri': '/repositories/2/digital_objects/3'})
+            self.assertGreater(os.path.getsize(self.file_path), 0)
+            backup_writer.write({'uri': '/repositories/2/digital_objects/4'})
+        with open(self.file_path, 'r') as test_reader:
+            test_uris = [json.loads(row_data)['uri'] for row_data in test_reader]
+        self.assertEqual(test_uris, [f'/repositories/2/digital_objects/{object_id}' for object_id in range(1, 5)])
+
+    def test_concurrent_writes(self):
+        """Tests that records written from several threads are each written whole on their own line"""
+        with BackupWriter(self.file_path, flush_records=7) as backup_writer:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                for object_id in range(200):
+                    executor.submit(backup_writer.write, {'id': object_id, 'title': 'x' * 5000})
+        with open(self.file_path, 'r') as test_reader:
+            test_ids = sorted(json.loads(row_data)['id'] for row_data in test_reader)
+        self.assertEqual(test_ids, list(range(200)))
+
+    def test_bad_file(self):
+        """Tests that a backup file that cannot be opened prints/logs an error and stops the job"""
+        test_filepath = str(Path('../test_data', 'test_bad_filepath$&@.jID(#*&^%'))
+        f = io.StringIO()
+        with contextlib.redirect_stdout(f), self.assertRaises(OSError):
+            with BackupWriter(test_filepath) as backup_writer:
+                backup_writer.write({'new': 'data'})
+        self.assertTrue('BackupWriter.open() - Unable to open or access jsonl file' in f.getvalue())
+
+    def test_closed_file(self):
+        """Tests that writing to a closed backup prints/logs an error and stops the job instead of dropping the data"""
+        f = io.StringIO()
+        with contextlib.redirect_stdout(f):
+            with BackupWriter(self.file_path) as backup_writer:
+                backup_writer.write({'uri': '/repositories/2/digital_objects/1'})
+            with self.assertRaises(ValueError):
+                backup_writer.write({'uri': '/repositories/2/digital_objects/2'})
+        self.assertTrue('BackupWriter.write() - Backup file is not open' in f.getvalue())
+
+    def test_flush_every_record(self):
+        """Tests that with flush_records=1 each record is on disk as soon as write() returns"""
+        with BackupWriter(self.file_path, flush_records=1, flush_seconds=60) as backup_writer:
+            backup_writer.write({'uri': '/repositories/2/digital_objects/1'})
+            with open(self.file_path, 'r') as test_reader:
+                self.assertEqual(json.loads(test_reader.readline())['uri'], '/repositories/2/digital_objects/1')
+
+
+class TestOutcomeLog(unittest.TestCase):
+
+    def setUp(self):
+        self.log_dir = tempfile.TemporaryDirectory()
+        self.outcome_path = os.path.join(self.log_dir.name, 'outcomes.jsonl')
+
+    def tearDown(self):
+        self.log_dir.cleanup()
+
+    def test_record(self):
+        """Tests that each outcome is written as one JSON line with its stage, status, latency and details, and
+        without an index file"""
+        with OutcomeLog(self.outcome_path, flush_records=2) as outcome_log:
+            outcome_log.record('/repositories/2/archival_objects/1', 'post', 'posted', latency=0.5, http_status=200,
+                               job='suppress_objects', row=1)
+            outcome_log.record('/repositories/2/archival_objects/2', 'fetch', 'not found', error_class='NotFound',
+                               http_status=404, job='suppress_objects', row=2)
+        outcomes = list(read_backup(self.outcome_path))
+        self.assertEqual([(outcome['stage'], outcome['status'], outcome['error_class']) for outcome in outcomes],
+                         [('post', 'posted', None), ('fetch', 'not found', 'NotFound')])
+        self.assertEqual((outcomes[0]['latency'], outcomes[0]['job'], outcomes[0]['row']), (0.5, 'suppress_objects', 1))
+        self.assertFalse(os.path.exists(f'{self.outcome_path}.idx'))
+
+    def test_summarize_outcomes(self):
+        """Tests that summarize_outcomes counts statuses and errors, keeps the slowest rows and counts retried URIs"""
+        with OutcomeLog(self.outcome_path) as outcome_log:
+            for object_id in range(20):
+                outcome_log.record(f'/repositories/2/archival_objects/{object_id}', 'post', 'posted',
+                                   latency=object_id / 10, http_status=200)
+            for object_id in range(3):
+                outcome_log.record(f'/repositories/2/archival_objects/{object_id}', 'post', 'failed', latency=0.1,
+                                   http_status=409, error_class='APIError')
+        summary = summarize_outcomes([self.outcome_path], slowest_count=2)
+        self.assertEqual(summary['rows'], 23)
+        self.assertEqual(summary['statuses'], {'posted': 20, 'failed': 3})
+        self.assertEqual(summary['errors'], [(('post', 'APIError', 409), 3)])
+        self.assertEqual(summary['slowest'], [(1.9, '/repositories/2/archival_objects/19'),
+                                              (1.8, '/repositories/2/archival_objects/18')])
+        self.assertEqual((summary['retried_uris'], summary['retries'], summary['retried_uris_still_failing']),
+                         (3, 3, 3))
+
+    def test_summarize_outcomes_without_uri(self):
+        """Tests that rows without a URI and with the same latency as other rows can be kept as the slowest rows"""
+        with OutcomeLog(self.outcome_path) as outcome_log:
+            outcome_log.record('/repositories/2/archival_objects/1', 'post', 'posted', latency=0.5)
+            for row_number in range(3):
+                outcome_log.record(None, 'queue', 'failed', latency=0.5, error_class='ValueError', row=row_number)
+        summary = summarize_outcomes([self.outcome_path], slowest_count=2)
+        self.assertEqual(summary['slowest'], [(0.5, '/repositories/2/archival_objects/1'), (0.5, '')])
+        self.assertEqual(summary['retried_uris'], 0)
+
+
+class TestCompressedBackups(unittest.TestCase):
+
+    def setUp(self):
+        self.backup_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.backup_dir.cleanup()
+
+    def test_gzip_backup(self):
+        """Tests that a .gz backup written in several batches and by write_to_file is compressed and read back whole"""
+        test_filepath = os.path.join(self.backup_dir.name, 'original_data.jsonl.gz')
+        with BackupWriter(test_filepath, flush_records=2) as backup_writer:
+            for object_id in range(5):
+                backup_writer.write({'id': object_id, 'title': 'x' * 1000})
+        write_to_file(test_filepath, {'id': 5, 'title': 'x' * 1000})
+        with open(test_filepath, 'rb') as test_reader:
+            self.assertEqual(test_reader.read(2), b'\x1f\x8b')
+        self.assertLess(os.path.getsize(test_filepath), 6000)
+        self.assertEqual([record['id'] for record in read_backup(test_filepath)], list(range(6)))
+
+    def test_plain_backup(self):
+        """Tests that read_backup reads an uncompressed jsonl backup"""
+        test_filepath = os.path.join(self.backup_dir.name, 'original_data.jsonl')
+        write_to_file(test_filepath, {'id': 1})
+        write_to_file(test_filepath, {'id': 2})
+        self.assertEqual(list(read_backup(test_filepath)), [{'id': 1}, {'id': 2}])
+
+
+class TestBackupLookup(unittest.TestCase):
+
+    def setUp(self):
+        self.backup_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.backup_dir.cleanup()
+
+    def write_test_backup(self, file_name):
+        test_filepath = os.path.join(self.backup_dir.name, file_name)
+        with BackupWriter(test_filepath, flush_records=3) as backup_writer:
+            for object_id in range(10):
+                backup_writer.write({'uri': f'/repositories/2/digital_objects/{object_id}', 'lock_version': 0})
+        write_to_file(test_filepath, {'uri': '/repositories/2/digital_objects/4', 'lock_version': 1})
+        return test_filepath
+
+    def test_lookup(self):
+        """Tests looking up records in plain and compressed backups by URI and lock_version"""
+        for file_name in ('original_data.jsonl', 'original_data.jsonl.gz'):
+            test_filepath = self.write_test_backup(file_name)
+            self.assertTrue(os.path.isfile(f'{test_filepath}.idx'))
+            with BackupLookup(test_filepath) as backup_lookup:
+                self.assertEqual(backup_lookup.get_record('/repositories/2/digital_objects/7')['lock_version'], 0)
+                self.assertEqual(backup_lookup.get_record('/repositories/2/digital_objects/4')['lock_version'], 1)
+                self.assertEqual(backup_lookup.get_record('/repositories/2/digital_objects/4', lock_version=0),
+                                 {'uri': '/repositories/2/digital_objects/4', 'lock_version': 0})
+                self.assertIsNone(backup_lookup.get_record('/repositories/2/digital_objects/10'))
+
+    def test_build_index(self):
+        """Tests that the index built for a backup without one matches the index written with the backup"""
+        test_filepath = self.write_test_backup('original_data.jsonl.gz')
+        written_index = read_backup_index(test_filepath)
+        os.remove(f'{test_filepath}.idx')
+        self.assertEqual(build_backup_index(test_filepath), 11)
+        self.assertEqual(read_backup_index(test_filepath), written_index)
+
+
+class TestMergeBackups(unittest.TestCase):
+
+    def setUp(self):
+        self.backup_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.backup_dir.cleanup()
+
+    def test_merge(self):
+        """Tests that merged backups can be read and looked up in the merged backup and the parts are removed"""
+        test_filepath = os.path.join(self.backup_dir.name, 'original_data.jsonl.gz')
+        write_to_file(test_filepath, {'uri': '/locations/0', 'lock_version': 0})
+        part_paths = [os.path.join(self.backup_dir.name, f'original_data.jsonl.shard{shard_number}.gz')
+                      for shard_number in range(3)]
+        for shard_number, part_path in enumerate(part_paths[:2]):
+            with BackupWriter(part_path, flush_records=2) as backup_writer:
+                for object_id in range(1 + shard_number * 3, 4 + shard_number * 3):
+                    backup_writer.write({'uri': f'/locations/{object_id}', 'lock_version': 0})
+        self.assertEqual(merge_backups(part_paths, test_filepath), 2)
+        self.assertEqual([record['uri'] for record in read_backup(test_filepath)],
+                         [f'/locations/{object_id}' for object_id in range(7)])
+        with BackupLookup(test_filepath) as backup_lookup:
+            for object_id in range(7):
+                self.assertEqual(backup_lookup.get_record(f'/locations/{object_id}')['uri'], f'/locations/{object_id}')
+        self.assertEqual(sorted(os.listdir(self.backup_dir.name)),
+                         ['original_data.jsonl.gz', 'original_data.jsonl.gz.idx'])
+
+
+class TestWriteToParquet(unittest.TestCase):
+
+    def setUp(self):
+        self.snapshot_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.snapshot_dir.cleanup()
+
+    def test_snapshot_table(self):
+        """Tests writing batches of rows to a Parquet file and loading them back as a snapshot table, including a
+        column that is empty in the first batch"""
+        test_batches = iter([[(1, None), (2, None)], [(3, 'NMAH')]])
+        row_count = write_to_parquet(os.path.join(self.snapshot_dir.name, 'location.parquet'), ['id', 'building'],
+                                     test_batches)
+        self.assertEqual(row_count, 3)
+        test_table = load_snapshot_table(self.snapshot_dir.name, 'location')
+        self.assertEqual(list(test_table['id']), [1, 2, 3])
+        self.assertEqual(test_table['building'][2], 'NMAH')
+
+    def test_missing_snapshot(self):
+        """Tests that loading a table that was not exported raises a FileNotFoundError"""
+        with self.assertRaises(FileNotFoundError):
+            load_snapshot_table(self.snapshot_dir.name, 'resource')
+
+
 class TestWriteToXmlFile(unittest.TestCase):
 
     def setUp(self):
@@ -429,8 +1157,9 @@ class TestWriteToXmlFile(unittest.TestCase):
         self.file_path = self.temp_file.name
 
     def tearDown(self):
-        if os.path.exists(self.file_path):
-            os.remove(self.file_path)
+        for test_file in (self.file_path, f'{self.file_path}.idx'):
+            if os.path.exists(test_file):
+                os.remove(test_file)
     
     def test_good_xml_file(self):
         """Tests writing a new xml file"""